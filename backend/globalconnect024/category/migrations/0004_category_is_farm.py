@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+FARM_CATEGORIES = ['farm products', 'food & grocery', 'agricultural']
+
+
+def flag_farm_categories(apps, schema_editor):
+    Category = apps.get_model('category', 'Category')
+    farm_ids = [
+        category.pk for category in Category.objects.only('id', 'name')
+        if any(cat in (category.name or '').lower() for cat in FARM_CATEGORIES)
+    ]
+    Category.objects.filter(pk__in=farm_ids).update(is_farm=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_alter_category_vendor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='is_farm',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(flag_farm_categories, migrations.RunPython.noop),
+    ]
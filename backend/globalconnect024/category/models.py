@@ -1,13 +1,60 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# Categories whose name contains one of these hold farm produce (tiered lot sizes and visibility)
+FARM_CATEGORIES = ['farm products', 'food & grocery', 'agricultural']
+
+
+def is_farm_category_name(category_name):
+    category_name = (category_name or '').lower()
+    return any(cat in category_name for cat in FARM_CATEGORIES)
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     icon = models.CharField(max_length=50, default="Tags")
     vendor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="categories", null=True, blank=True)
+    # Derived from the name on save, so farm/non-farm rules can run as joins instead of string matching
+    is_farm = models.BooleanField(default=False, editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        stored = Category.objects.filter(pk=self.pk).values_list('name', 'is_farm').first() if self.pk else None
+        self.is_farm = is_farm_category_name(self.name)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if stored is None:
+                return
+            was_name, was_farm = stored
+            if was_farm != self.is_farm:
+                self.update_product_visibility()
+            # Products only read the name — other edits leave them (and their caches) alone
+            if was_name != self.name:
+                self.refresh_products()
+
+    def update_product_visibility(self):
+        """Re-apply the farm visibility rules to this category's products after the flag flips."""
+        from products.models import FARM_VISIBILITY, Product
+        products = Product.objects.filter(category=self)
+        if not self.is_farm:
+            products.update(visible_to='consumers')
+            return
+        for vendor_type, visible_to in FARM_VISIBILITY.items():
+            products.filter(vendor__vendor_type=vendor_type).update(visible_to=visible_to)
+
+    def refresh_products(self):
+        # Category name is part of every product's search vector and payload — keep them in step
+        from django.utils import timezone
+        from products.cache import invalidate_catalog
+        from products.models import NextChangeSeq, Product, product_search_vector
+        if Product.objects.filter(category=self).update(
+            search_vector=product_search_vector(self.name),
+            change_seq=NextChangeSeq(),
+            updated_at=timezone.now(),
+        ):
+            invalidate_catalog()
 
     def __str__(self):
         return self.name
@@ -1,3 +1,83 @@
 from django.test import TestCase
 
-# Create your tests here.
+from products.models import Product
+from users.models import CustomUser
+from .models import Category
+
+
+class CategorySaveTests(TestCase):
+    """Category.save() touches its products only when they would change."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Household')
+        vendor = CustomUser.objects.create_user(
+            username='shop', email='shop@example.com', password='pw-12345678', role='vendor', vendor_type='farmer'
+        )
+        self.product = Product.objects.create(
+            vendor=vendor, name='Soap', description='d', category=self.category, farmer_price=50, stock=700
+        )
+
+    def stamp(self):
+        return Product.objects.values_list('updated_at', 'change_seq').get(pk=self.product.pk)
+
+    def test_save_without_changes_leaves_products_alone(self):
+        before = self.stamp()
+        self.category.description = 'Cleaning and kitchen'
+        self.category.save()
+        self.assertEqual(self.stamp(), before)
+
+    def test_rename_refreshes_products(self):
+        updated_at, change_seq = self.stamp()
+        self.category.name = 'Home & Kitchen'
+        self.category.save()
+        new_updated_at, new_change_seq = self.stamp()
+        self.assertGreater(new_change_seq, change_seq)
+        self.assertGreaterEqual(new_updated_at, updated_at)
+
+    def test_rename_into_a_farm_category_moves_visibility(self):
+        self.category.name = 'Farm Products'
+        self.category.save()
+        self.assertTrue(self.category.is_farm)
+        # Farmers' produce is listed for wholesalers
+        self.assertEqual(Product.objects.get(pk=self.product.pk).visible_to, 'wholesaler')
+
+
+class FarmFlagTests(TestCase):
+    """Category.is_farm is derived from the name and drives the products' farm rules."""
+
+    def setUp(self):
+        self.vendor = CustomUser.objects.create_user(
+            username='farm', email='farm@example.com', password='pw-12345678', role='vendor', vendor_type='farmer'
+        )
+
+    def test_flag_follows_the_name(self):
+        self.assertTrue(Category.objects.create(name='Fresh Food & Grocery').is_farm)
+        self.assertTrue(Category.objects.create(name='AGRICULTURAL inputs').is_farm)
+        self.assertFalse(Category.objects.create(name='Household').is_farm)
+
+    def test_farm_products_are_listed_one_tier_down(self):
+        category = Category.objects.create(name='Farm Products')
+        product = Product.objects.create(
+            vendor=self.vendor, name='Maize', description='d', category=category, farmer_price=40, stock=700
+        )
+        self.assertEqual(product.visible_to, 'wholesaler')
+        self.assertEqual(list(Product.objects.filter(category__is_farm=True)), [product])
+
+    def test_rename_out_of_farm_lists_products_for_consumers(self):
+        category = Category.objects.create(name='Farm Products')
+        product = Product.objects.create(
+            vendor=self.vendor, name='Maize', description='d', category=category, farmer_price=40, stock=700
+        )
+        category.name = 'Household'
+        category.save()
+        self.assertFalse(category.is_farm)
+        self.assertEqual(Product.objects.get(pk=product.pk).visible_to, 'consumers')
+
+    def test_is_farm_product_reads_the_joined_category(self):
+        category = Category.objects.create(name='Farm Products')
+        Product.objects.create(
+            vendor=self.vendor, name='Maize', description='d', category=category, farmer_price=40, stock=700
+        )
+        product = Product.objects.select_related('category').get()
+        with self.assertNumQueries(0):
+            self.assertTrue(product.is_farm_product())
@@ -0,0 +1,110 @@
+"""
+Conditional GET (ETag / Last-Modified) for catalog-style list endpoints.
+
+The validators are computed with ONE aggregate query over the effective
+queryset — COUNT(*) plus MAX() of the timestamp fields — before anything is
+serialized. If the client's If-None-Match / If-Modified-Since still matches,
+a 304 is returned and the serializer never runs.
+
+- The ETag hashes the queryset SQL (so role-specific scopes never share a tag),
+  the full request path (cursor, page size, filters), the row count and the
+  newest timestamp. Deletes change the count; edits change the timestamp.
+- Only the listed timestamp fields are watched. Data read from related rows
+  changes the tag only if that row bumps a watched timestamp: a category
+  rename touches its products' `updated_at` (Category.refresh_products), but
+  users have no timestamp, so a vendor / provider renaming themselves or
+  changing their phone or city keeps serving 304s until the listing itself
+  is edited.
+- Tags are weak (W/"...") since the body is a JSON rendering of the data.
+- Responses vary by Authorization because the visible rows depend on the user.
+"""
+
+import hashlib
+
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def queryset_validators(queryset, timestamp_fields=('updated_at',)):
+    """Return (count, last_modified) for `queryset` in a single query."""
+    maxima = {f'last_{i}': Max(field) for i, field in enumerate(timestamp_fields)}
+    result = queryset.order_by().aggregate(row_count=Count('pk', distinct=True), **maxima)
+    timestamps = [result[key] for key in maxima if result[key] is not None]
+    return result['row_count'], max(timestamps, default=None)
+
+
+def make_etag(request, queryset, count, last_modified):
+    try:
+        scope = str(queryset.query)
+    except EmptyResultSet:
+        scope = 'empty'
+    raw = '|'.join([
+        scope,
+        request.get_full_path(),
+        str(count),
+        last_modified.isoformat() if last_modified else '',
+    ])
+    return 'W/' + quote_etag(hashlib.sha1(raw.encode('utf-8')).hexdigest())
+
+
+def conditional_get(request, queryset, render, timestamp_fields=('updated_at',)):
+    """
+    Answer `request` with 304 if its validators still match `queryset`,
+    otherwise call `render()` and stamp the ETag / Last-Modified headers on it.
+    """
+    count, last_modified = queryset_validators(queryset, timestamp_fields)
+    etag = make_etag(request, queryset, count, last_modified)
+    last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if not_modified is None:
+        response = render()
+    else:
+        response = not_modified
+
+    return stamp_validators(response, etag, last_modified_ts)
+
+
+def stamp_validators(response, etag, last_modified_ts):
+    if response.status_code in (200, 304) and etag:
+        response['ETag'] = etag
+        if last_modified_ts is not None:
+            response['Last-Modified'] = http_date(last_modified_ts)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalListMixin:
+    """
+    ViewSet mixin: `list` and `retrieve` answer conditional GETs from an
+    aggregate over the filtered queryset. Set `conditional_timestamp_fields`
+    to the fields whose change should invalidate the response.
+    """
+    conditional_timestamp_fields = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return conditional_get(
+            request,
+            queryset,
+            lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs),
+            self.conditional_timestamp_fields,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Malformed lookup — let the regular retrieve produce the 404
+            return super().retrieve(request, *args, **kwargs)
+        return conditional_get(
+            request,
+            queryset,
+            lambda: super(ConditionalListMixin, self).retrieve(request, *args, **kwargs),
+            self.conditional_timestamp_fields,
+        )
@@ -0,0 +1,64 @@
+"""
+Sparse fieldsets for read endpoints.
+
+    ?fields=id,name,image,avg_rating   only these fields
+    ?omit=description,vendor_type      everything except these
+
+- Unselected fields are removed from the serializer before it runs, so their
+  SerializerMethodFields are never called.
+- Serializers declare which relations each field reads (`sparse_related`);
+  views join only the relations of the fields actually rendered.
+- Only applies to safe (read) requests — writes always see the full serializer.
+- Unknown names are ignored. `fields` and `omit` can be combined.
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_QUERY_PARAM = 'fields'
+OMIT_QUERY_PARAM = 'omit'
+
+
+def parse_field_list(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request, names):
+    """The subset of `names` the request asks for (all of them if it doesn't choose)."""
+    names = list(names)
+    if request is None or request.method not in SAFE_METHODS:
+        return names
+    only = parse_field_list(request.query_params.get(FIELDS_QUERY_PARAM))
+    omit = parse_field_list(request.query_params.get(OMIT_QUERY_PARAM))
+    return [name for name in names if (not only or name in only) and name not in omit]
+
+
+class SparseFieldsetsMixin:
+    """
+    Serializer mixin honouring ?fields= / ?omit=. Map field names to the
+    relations they read in `sparse_related` so views can build their
+    queryset with `with_related(queryset, request)`.
+    """
+    sparse_related = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        keep = set(requested_fields(request, self.fields))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def related_fields(cls, request):
+        relations = []
+        for name in requested_fields(request, cls.sparse_related):
+            for relation in cls.sparse_related[name]:
+                if relation not in relations:
+                    relations.append(relation)
+        return relations
+
+    @classmethod
+    def with_related(cls, queryset, request):
+        relations = cls.related_fields(request)
+        # select_related() with no arguments would follow every foreign key
+        return queryset.select_related(*relations) if relations else queryset
@@ -0,0 +1,115 @@
+"""
+Pooled HTTP clients for the external providers: Paystack, Africa's Talking,
+SendGrid and M-Pesa (Daraja).
+
+    from globalconnect024.http_clients import paystack
+    response = paystack.post('/transaction/initialize', json=payload)
+
+- One requests.Session per provider and process, so calls reuse keep-alive
+  connections instead of paying a TLS handshake each time. The underlying
+  urllib3 pool is thread-safe, so the background email/SMS threads share it.
+- Every call has a (connect, read) timeout — HTTP_CONNECT_TIMEOUT plus the
+  provider's read timeout — so a hung upstream can't pin a gunicorn worker.
+- Connection failures (nothing was sent yet) are retried for every method;
+  429/5xx answers and read errors only for idempotent methods (GET, HEAD,
+  PUT, DELETE, OPTIONS). Retries back off exponentially and are bounded by
+  HTTP_MAX_RETRIES. POSTs that reached the provider are never repeated.
+- Each call logs its provider, method, path, status and latency with the
+  [HTTP] prefix. Failed calls raise requests.RequestException as before.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_POOL_SIZE = 10
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'})
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ProviderClient:
+    """Keep-alive session, timeouts, retries and latency logging for one provider."""
+
+    def __init__(self, name, base_url, read_timeout=15, auth_headers=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.read_timeout = read_timeout
+        # Called per request so keys changed in settings (or tests) are picked up
+        self.auth_headers = auth_headers
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.build_session()
+        return self._session
+
+    def build_session(self):
+        retries = getattr(settings, 'HTTP_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=0.3,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            # A provider asking us to wait 60s must not hold a request worker for 60s
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        pool_size = getattr(settings, 'HTTP_POOL_SIZE', DEFAULT_POOL_SIZE)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def url(self, path):
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        url = self.url(path)
+        headers = dict(self.auth_headers()) if self.auth_headers else {}
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('timeout', (
+            getattr(settings, 'HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT), self.read_timeout
+        ))
+
+        started = time.monotonic()
+        label = f"{self.name} {method.upper()} {urlsplit(url).path}"
+        try:
+            response = self.session.request(method, url, headers=headers, **kwargs)
+        except requests.RequestException as e:
+            print(f"[HTTP] {label} failed after {(time.monotonic() - started) * 1000:.0f}ms: {e}")
+            raise
+        print(f"[HTTP] {label} -> {response.status_code} in {(time.monotonic() - started) * 1000:.0f}ms")
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+
+paystack = ProviderClient(
+    'paystack', 'https://api.paystack.co', read_timeout=15,
+    auth_headers=lambda: {'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}'},
+)
+africastalking = ProviderClient('africastalking', 'https://api.africastalking.com', read_timeout=15)
+sendgrid = ProviderClient('sendgrid', 'https://api.sendgrid.com', read_timeout=15)
+# Daraja is slow to answer STK pushes; give it longer before giving up
+mpesa = ProviderClient('mpesa', 'https://sandbox.safaricom.co.ke', read_timeout=30)
@@ -0,0 +1,136 @@
+"""
+Resized WebP / JPEG derivatives for uploaded product and service images.
+
+- Each upload is rendered at IMAGE_VARIANT_WIDTHS (never upscaled) in WebP and
+  JPEG. Files are named after a hash of the source bytes
+  (<upload_to>variants/<hash>-<width>.<ext>), so re-processing the same photo
+  reuses the files and they can be cached forever.
+- The map of generated files is stored on the row (`image_variants` JSON) with
+  the source name, so a replaced image is detected and re-processed.
+- Saving a new image only clears `image_variants`; a NULL map next to an
+  image marks the row as pending. `manage.py build_image_variants --watch`
+  renders pending rows as they appear, so uploads never wait for Pillow and
+  web processes never run it. Without --watch the command is a one-off
+  backfill of every out-of-date row.
+- An image Pillow can't read (corrupt, or a decompression bomb over
+  Image.MAX_IMAGE_PIXELS) is stored as failed and not retried until the
+  image changes or the backfill runs with --force.
+- Serializers expose `image_srcset`: {"webp": "<url> 160w, ...", "jpeg": ...}.
+"""
+
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+DEFAULT_WIDTHS = (160, 320, 640, 1024)
+FORMATS = {
+    # format -> (extension, Pillow save options)
+    'webp': ('webp', {'format': 'WEBP', 'quality': 78, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_widths():
+    return tuple(getattr(settings, 'IMAGE_VARIANT_WIDTHS', DEFAULT_WIDTHS))
+
+
+def is_current(image_field, variants):
+    """True if `variants` were generated from the file currently in `image_field`."""
+    return bool(variants) and variants.get('source') == image_field.name
+
+
+def build_variants(image_field):
+    """
+    Render every width/format of `image_field` into storage and return the
+    map to store in `image_variants`. Returns None if the file is missing or
+    is not an image Pillow can read (or will read: decompression bombs).
+    """
+    try:
+        with image_field.storage.open(image_field.name, 'rb') as f:
+            raw = f.read()
+        source = Image.open(io.BytesIO(raw))
+        source.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        print(f"[IMAGES] Cannot read {image_field.name}: {e}")
+        return None
+
+    source = ImageOps.exif_transpose(source)
+    digest = hashlib.sha1(raw).hexdigest()[:16]
+    folder = image_field.field.upload_to
+    if folder and not folder.endswith('/'):
+        folder += '/'
+
+    # Widths above the original would only add bytes; keep the original width instead
+    widths = sorted({min(width, source.width) for width in variant_widths()})
+
+    files = {name: {} for name in FORMATS}
+    for width in widths:
+        height = max(1, round(source.height * width / source.width))
+        resized = source.resize((width, height), Image.LANCZOS) if width != source.width else source
+        for name, (extension, options) in FORMATS.items():
+            path = f'{folder}variants/{digest}-{width}.{extension}'
+            if not default_storage.exists(path):
+                image = resized
+                if name == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA' if name == 'webp' and 'A' in image.getbands() else 'RGB')
+                buffer = io.BytesIO()
+                image.save(buffer, **options)
+                path = default_storage.save(path, ContentFile(buffer.getvalue()))
+            files[name][str(width)] = path
+
+    return {'source': image_field.name, 'width': source.width, 'files': files}
+
+
+def process_instance(model, pk):
+    """
+    Generate variants for one row and store them without going through save().
+    An unreadable image is stored as failed so it isn't picked up again.
+    Returns the variants, or None if there were none to build.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return None
+    variants = build_variants(instance.image)
+    stored = variants or {'source': instance.image.name, 'failed': True}
+    # Only store them if the image wasn't replaced in the meantime
+    updated = model.objects.filter(pk=pk, image=instance.image.name).update(
+        image_variants=stored, updated_at=timezone.now()
+    )
+    if variants and updated and hasattr(instance, 'image_variants_ready'):
+        instance.image_variants_ready()
+    return variants
+
+
+def pending(model):
+    """Rows whose image is waiting for variants (see queue_variants)."""
+    return model.objects.exclude(image='').exclude(image__isnull=True).filter(image_variants__isnull=True)
+
+
+def queue_variants(instance):
+    """Mark `instance` as pending for the variants worker if its image changed."""
+    if instance.image_variants is None or is_current(instance.image, instance.image_variants):
+        return
+    type(instance).objects.filter(pk=instance.pk).update(image_variants=None)
+    instance.image_variants = None
+
+
+def srcset(variants, request=None, image_field=None):
+    """{"webp": "url 160w, url 320w", "jpeg": ...} for a stored variants map, or None."""
+    if not variants or (image_field is not None and not is_current(image_field, variants)):
+        return None
+    result = {}
+    for name, files in variants.get('files', {}).items():
+        entries = []
+        for width, path in sorted(files.items(), key=lambda item: int(item[0])):
+            url = default_storage.url(path)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            entries.append(f'{url} {width}w')
+        result[name] = ', '.join(entries)
+    # Failed images have no files
+    return result or None
@@ -0,0 +1,143 @@
+"""
+Keyset (seek) pagination shared by the list endpoints.
+
+Instead of OFFSET, each page is fetched with a WHERE clause that starts right
+after the last row of the previous page, so the cost of a page depends only
+on the page size — never on how deep into the table the client has scrolled.
+
+- Default ordering is newest first: (-created_at, -id).
+- If an OrderingFilter already ordered the queryset, that ordering is used as
+  the key and `id` is appended as a tie-breaker so the key is always unique.
+- The cursor is an opaque base64 token holding the key values of the last row.
+  Each value is checked against its key field before it reaches the query, so
+  a tampered cursor is a 404, never a 500.
+- Key fields must be non-null.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 24
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*self.keys)
+        values = self.decode_cursor(request)
+        if values is not None:
+            values = self.clean_cursor(queryset, values)
+            queryset = queryset.filter(self.build_seek_filter(values))
+
+        # Fetch one extra row to learn whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        keys = list(queryset.query.order_by) or list(self.ordering)
+        keys = [key for key in keys if isinstance(key, str)]
+        if not any(key.lstrip('-') in ('id', 'pk') for key in keys):
+            # Tie-break in the same direction as the primary key field
+            keys.append('-id' if keys and keys[0].startswith('-') else 'id')
+        return tuple(keys)
+
+    def build_seek_filter(self, values):
+        """
+        (k1, k2, ..., kn) > (v1, v2, ..., vn) expanded into
+        k1 > v1 OR (k1 = v1 AND k2 > v2) OR ... — honouring each key's direction.
+        """
+        seek = Q()
+        for i, key in enumerate(self.keys):
+            field = key.lstrip('-')
+            lookup = 'lt' if key.startswith('-') else 'gt'
+            clause = Q(**{f'{field}__{lookup}': values[i]})
+            for prev_key, prev_value in zip(self.keys[:i], values[:i]):
+                clause &= Q(**{prev_key.lstrip('-'): prev_value})
+            seek |= clause
+        return seek
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def clean_cursor(self, queryset, values):
+        """Cursor values converted by their key fields; NotFound if any doesn't fit."""
+        query = queryset.query.chain()
+        cleaned = []
+        for key, value in zip(self.keys, values):
+            try:
+                field = query.resolve_ref(key.lstrip('-')).output_field
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError) as e:
+                raise NotFound(self.invalid_cursor_message) from e
+            except FieldError:
+                pass  # Not a resolvable column — the database will judge the value
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            cleaned.append(value)
+        return cleaned
+
+    def encode_cursor(self, instance):
+        values = [self._key_value(instance, key.lstrip('-')) for key in self.keys]
+        payload = json.dumps(values, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def _key_value(self, instance, field):
+        value = instance
+        for part in field.split('__'):
+            value = value[part] if isinstance(value, dict) else getattr(value, part)
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework.authtoken',
@@ -65,8 +66,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'users' / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process — the notification worker
+            # renders the same transactional emails over and over
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -118,6 +126,23 @@ else:
     }
 }
 
+# Cache: local memory by default; set CACHE_URL (e.g. dbcache://django_cache or
+# filecache:///var/tmp/django_cache) so catalog invalidations reach every worker
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', default=300)
+
+# How long checkout holds stock for an unpaid order (see orders/reservations.py)
+STOCK_RESERVATION_TTL_MINUTES = env.int('STOCK_RESERVATION_TTL_MINUTES', default=30)
+
+# Notification outbox worker (see orders/outbox.py)
+OUTBOX_WORKERS = env.int('OUTBOX_WORKERS', default=4)
+OUTBOX_MAX_ATTEMPTS = env.int('OUTBOX_MAX_ATTEMPTS', default=6)
+SMS_COALESCE_SECONDS = env.int('SMS_COALESCE_SECONDS', default=2)
+SMS_MAX_RECIPIENTS = env.int('SMS_MAX_RECIPIENTS', default=200)
+SMS_RATE_PER_SECOND = env.float('SMS_RATE_PER_SECOND', default=5)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
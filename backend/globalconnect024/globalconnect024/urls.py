@@ -21,12 +21,13 @@ router.register(r'services', ServiceViewSet, basename='service')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Must come before the router, otherwise services/<pk>/ swallows it
+    path('api/services/transport-near-vendor/', transport_near_vendor, name='transport_near_vendor'),
     path('api/', include(router.urls)),  # ✅ Services endpoints
     path('health/', health_check, name='health_check'),  # ✅ Health check endpoint
     # ✅ Guest checkout endpoint
     path('api/guest-checkout/', guest_checkout, name='guest_checkout'),
     path('api/', include('products.urls')),
-    path('api/services/transport-near-vendor/', transport_near_vendor, name='transport_near_vendor'),
 
     # ✅ Auth
     path('api/token/', EmailOrUsernameTokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -1,4 +1,3 @@
-import requests
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
@@ -6,6 +5,7 @@ from rest_framework import status
 from products.models import Product  # or your product model
 from django.core.mail import send_mail
 from django.conf import settings
+from globalconnect024.http_clients import paystack
 from products.serializers import GuestCheckoutSerializer
 
 
@@ -17,11 +17,6 @@ def paystack_initialize_payment(request):
     email = request.data.get('email')
     amount = request.data.get('amount')  # In KES or NGN — depends on your currency
 
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json",
-    }
-
     data = {
         "email": email,
         "amount": int(amount) * 100,  # Paystack expects amount in kobo/cent
@@ -29,8 +24,7 @@ def paystack_initialize_payment(request):
         "callback_url": settings.PAYSTACK_CALLBACK_URL
     }
 
-    url = "https://api.paystack.co/transaction/initialize"
-    response = requests.post(url, json=data, headers=headers)
+    response = paystack.post("/transaction/initialize", json=data)
 
     return Response(response.json())
 
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Order, Referral
+from django.utils import timezone
+
+from .models import CartOrder, Order, OutboxMessage, Referral, StockReservation, WebhookEvent
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -19,3 +21,51 @@ class ReferralAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
     autocomplete_fields = ['affiliate', 'order']  # ✅ Smart search
     date_hierarchy = 'created_at'  # ✅ Date drilldown
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['order', 'product', 'quantity', 'status', 'expires_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['product__name', 'order__id']
+    ordering = ['-created_at']
+    raw_id_fields = ['order', 'product']
+
+
+@admin.register(CartOrder)
+class CartOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'buyer', 'guest_email', 'amount', 'status', 'payment_reference', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['guest_email', 'buyer__username', 'payment_reference']
+    ordering = ['-created_at']
+    raw_id_fields = ['buyer', 'affiliate']
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['source', 'event_id', 'event_type', 'status', 'attempts', 'next_attempt_at', 'received_at', 'processed_at']
+    list_filter = ['source', 'status', 'received_at']
+    search_fields = ['event_id']
+    ordering = ['-received_at']
+    readonly_fields = ['source', 'event_id', 'event_type', 'payload', 'received_at', 'processed_at', 'last_error']
+    actions = ['retry_events']
+
+    @admin.action(description="Retry selected events now")
+    def retry_events(self, request, queryset):
+        count = queryset.exclude(status='done').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} events queued for retry.")
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['channel', 'recipient', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['channel', 'status', 'created_at']
+    search_fields = ['recipient', 'subject', 'provider_id']
+    ordering = ['-created_at']
+    readonly_fields = ['provider_id', 'last_error', 'created_at', 'sent_at']
+    actions = ['retry_messages']
+
+    @admin.action(description="Retry selected messages now")
+    def retry_messages(self, request, queryset):
+        count = queryset.filter(status='failed').update(status='pending', next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} messages queued for retry.")
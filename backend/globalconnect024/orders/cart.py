@@ -0,0 +1,131 @@
+"""
+Cart checkout: every item of a cart paid with ONE Paystack transaction.
+
+    POST /api/orders/cart-checkout/   items=[{product_id, quantity, unit_price}], guest_*, affiliate_code
+
+- All products are loaded with one query and every item becomes an Order
+  line of a CartOrder, with its splits computed in memory.
+- One transaction holds the stock of each line (a conditional UPDATE per
+  line, in product id order so concurrent carts can't deadlock; sold-out
+  lines are skipped) and writes the cart, its lines, their
+  PaymentSplits, reservations and ledger rows with bulk_create().
+- One Paystack initialization for the cart total with a flat split: the
+  vendor and affiliate shares of all lines are summed per subaccount and
+  the company keeps the rest.
+- The webhook receives metadata.cart_id and completes every line.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+
+from products.models import Product
+from .models import CartOrder, Order, PaymentSplit
+from .reservations import hold, record_holds
+
+
+class CartLine:
+    """One requested item: the unsaved Order, or why it was skipped."""
+
+    def __init__(self, product_id, order=None, skipped=None):
+        self.product_id = product_id
+        self.order = order
+        self.skipped = skipped
+
+
+def build_lines(items, buyer, affiliate, goods_description, guest):
+    """
+    Unsaved Order lines for the requested items, with split amounts set.
+    Items that can't be sold (unknown product, vendor without a Paystack
+    subaccount, no price) come back with a `skipped` reason.
+    """
+    ids = [item.get('product_id') for item in items if str(item.get('product_id', '')).isdigit()]
+    products = Product.objects.select_related('vendor', 'category').in_bulk(ids)
+
+    lines = []
+    for item in items:
+        product_id = item.get('product_id')
+        product = products.get(int(product_id)) if str(product_id or '').isdigit() else None
+        if product is None:
+            lines.append(CartLine(product_id, skipped="Product not found."))
+            continue
+        if not product.vendor.paystack_subaccount_code:
+            lines.append(CartLine(product_id, skipped="Vendor cannot receive payments yet."))
+            continue
+
+        # Prefer the price the buyer saw in their cart; fall back to the stored effective price
+        frontend_price = item.get('unit_price')
+        if frontend_price and Decimal(str(frontend_price)) > 0:
+            unit_price = Decimal(str(frontend_price))
+        else:
+            unit_price = product.effective_price or None
+        if not unit_price:
+            lines.append(CartLine(product_id, skipped="Product price is not set."))
+            continue
+
+        quantity = int(item.get('quantity', 1))
+        order = Order(
+            product=product,
+            buyer=buyer,
+            vendor=product.vendor,
+            affiliate=affiliate,
+            quantity=quantity,
+            amount=unit_price * quantity,
+            status='pending',
+            goods_description=goods_description if product.is_farm_product() else '',
+            **guest,
+        )
+        order.compute_splits()
+        lines.append(CartLine(product_id, order=order))
+    return lines
+
+
+def place_cart(lines, buyer, affiliate, guest):
+    """
+    Hold stock for the sellable lines and write the cart. Lines that sold out
+    are marked skipped. Returns (cart, orders), or (None, []) if nothing is
+    left to pay for.
+    """
+    with transaction.atomic():
+        held = []
+        sellable = [line for line in lines if line.order is not None]
+        # Take the row locks in product order, so two carts sharing products can't deadlock
+        for line in sorted(sellable, key=lambda line: line.order.product_id):
+            if hold(line.order.product, line.order.quantity):
+                held.append((line.order, line.order.product.stock))
+            else:
+                line.skipped = "Not enough stock left for the requested quantity."
+                line.order = None
+        if not held:
+            return None, []
+
+        orders = [order for order, _ in held]
+        cart = CartOrder.objects.create(
+            buyer=buyer,
+            affiliate=affiliate,
+            amount=sum(order.amount for order in orders),
+            **guest,
+        )
+        for order in orders:
+            order.cart = cart
+        Order.objects.bulk_create(orders)
+        PaymentSplit.objects.bulk_create([split for order in orders for split in order.build_splits()])
+        record_holds(held)
+    return cart, orders
+
+
+def paystack_split(orders):
+    """Flat Paystack split for a cart: vendor and affiliate shares summed per subaccount, in cents."""
+    shares = {}
+    for order in orders:
+        code = order.vendor.paystack_subaccount_code
+        shares[code] = shares.get(code, Decimal('0')) + order.vendor_amount
+        if order.affiliate and order.affiliate.paystack_subaccount_code:
+            code = order.affiliate.paystack_subaccount_code
+            shares[code] = shares.get(code, Decimal('0')) + order.affiliate_amount
+    return {
+        "type": "flat",
+        "bearer_type": "account",
+        # Rounded down to whole cents so the shares never exceed the total
+        "subaccounts": [{"subaccount": code, "share": int(amount * 100)} for code, amount in shares.items()],
+    }
@@ -0,0 +1,70 @@
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+
+from globalconnect024.emails import render_email
+
+_user = SimpleNamespace(first_name='Wanjiku', username='wanjiku')
+_order = SimpleNamespace(
+    id=1042,
+    product=SimpleNamespace(name='Maize (90kg bag)'),
+    quantity=3,
+    amount=Decimal('10500.00'),
+    vendor_amount=Decimal('9450.00'),
+    affiliate_amount=Decimal('525.00'),
+    vendor=SimpleNamespace(phone='+254712345678', city='Eldoret'),
+)
+_order_context = {
+    'order': _order,
+    'buyer_name': 'John Otieno',
+    'buyer_phone': '+254722000111',
+    'buyer_email': 'john@example.com',
+    'buyer_location': 'Kisumu, Milimani',
+    'goods_description': 'Dry, sorted, 13% moisture',
+    'vendor_name': 'Kiprop Farm',
+    'affiliate_name': 'Amina Hassan',
+}
+
+# Every transactional email with a representative context
+SAMPLES = {
+    'emails/order_paid_company': _order_context,
+    'emails/order_paid_vendor': _order_context,
+    'emails/order_paid_buyer': _order_context,
+    'emails/order_paid_affiliate': _order_context,
+    'emails/registration_received': {'user': _user},
+    'emails/registration_paid': {'user': _user, 'role_label': 'vendor'},
+    'emails/verification_code': {'user': _user, 'code': '024-KSM-0042', 'agent_name': 'Agent Mwangi'},
+    'emails/activation': {'user': _user, 'activation_link': 'https://example.com/api/users/auth/activate/MQ/abc-123/'},
+}
+
+
+class Command(BaseCommand):
+    help = ("Render every transactional email (no sending, no database) and report the cost per "
+            "message: the first render, which loads and compiles the templates, and cached renders.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000,
+                            help="Cached renders per email (default 1000).")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        self.stdout.write(f"{'email':<32} {'first render':>14} {'cached render':>14}")
+        for name, context in SAMPLES.items():
+            # Start cold: drop whatever the cached loader already compiled
+            for loader in engines['django'].engine.template_loaders:
+                if hasattr(loader, 'reset'):
+                    loader.reset()
+
+            started = time.perf_counter()
+            render_email(name, context)
+            first = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for _ in range(count):
+                render_email(name, context)
+            cached = (time.perf_counter() - started) / count
+
+            self.stdout.write(f"{name:<32} {first * 1e6:>11.0f} µs {cached * 1e6:>11.0f} µs")
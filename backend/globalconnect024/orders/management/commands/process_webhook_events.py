@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from orders.webhooks import DEFAULT_BATCH_SIZE, process_batch
+
+
+class Command(BaseCommand):
+    help = ("Process queued webhook events (Paystack payments). Runs until stopped; "
+            "start as many as needed — workers never claim the same event.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f"Events claimed per transaction (default {DEFAULT_BATCH_SIZE}).")
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty (default 1).")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the due events and exit (for cron).")
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            close_old_connections()
+            count = process_batch(batch_size=options['batch_size'])
+            processed += count
+            if count >= options['batch_size']:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"{processed} webhook events processed"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from orders.reservations import SWEEP_BATCH_SIZE, release_expired
+
+
+class Command(BaseCommand):
+    help = "Return the stock held by unpaid orders whose reservation has expired. Run it from cron every few minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE,
+                            help=f"Reservations released per transaction (default {SWEEP_BATCH_SIZE}).")
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{released} expired reservations released"))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from orders.outbox import DEFAULT_BATCH_SIZE, DEFAULT_SMS_BATCH_SIZE, process_batch, worker_pool
+
+
+class Command(BaseCommand):
+    help = ("Deliver queued emails and SMS from the notification outbox. Runs until stopped; "
+            "start as many as needed — workers never claim the same message.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f"Emails claimed per round (default {DEFAULT_BATCH_SIZE}).")
+        parser.add_argument('--sms-batch-size', type=int, default=DEFAULT_SMS_BATCH_SIZE,
+                            help=f"SMS claimed per round and coalesced into bulk sends (default {DEFAULT_SMS_BATCH_SIZE}).")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Delivery threads (default OUTBOX_WORKERS, 4).")
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help="Seconds to wait when the outbox is empty (default 1).")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the due messages and exit (for cron).")
+
+    def handle(self, *args, **options):
+        processed = 0
+        with worker_pool(options['workers']) as pool:
+            while True:
+                close_old_connections()
+                count = process_batch(pool, batch_size=options['batch_size'],
+                                      sms_batch_size=options['sms_batch_size'])
+                processed += count
+                if count:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"{processed} notifications processed"))
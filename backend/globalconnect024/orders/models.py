@@ -1,10 +1,56 @@
 from email.policy import default
 from django.db import models
+from django.utils import timezone
 from django.conf import settings
 from products.models import Product
 from decimal import Decimal
 
 
+class CartOrder(models.Model):
+    """
+    A multi-item checkout paid with ONE Paystack transaction. Each item is
+    an Order line (Order.cart) with its own splits and stock reservation;
+    the cart holds the buyer details and the Paystack reference.
+    """
+    PAYMENT_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    buyer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='carts',
+        null=True,
+        blank=True
+    )
+    affiliate = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='affiliate_carts'
+    )
+    guest_name = models.CharField(max_length=255, blank=True, null=True)
+    guest_email = models.EmailField(blank=True, null=True)
+    guest_phone = models.CharField(max_length=15, blank=True, null=True)
+    guest_address = models.TextField(blank=True, null=True)
+
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Total of all lines")
+    status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
+    payment_reference = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Cart #{self.id} - KES {self.amount} - {self.status}"
+
+
 class Order(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -43,6 +89,8 @@ class Order(models.Model):
     guest_phone = models.CharField(max_length=15, blank=True, null=True)
     guest_address = models.TextField(blank=True, null=True)
     goods_description = models.TextField(blank=True, null=True, help_text="Buyer's description of goods (farm products only)")
+    # Set when the order is one line of a cart checkout
+    cart = models.ForeignKey(CartOrder, on_delete=models.CASCADE, null=True, blank=True, related_name='lines')
     
     # Quantities and amounts
     quantity = models.PositiveIntegerField(default=1)
@@ -72,6 +120,12 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # my_orders: one party's orders newest first, keyset-paged on (created_at, id)
+            models.Index(fields=['vendor', 'created_at', 'id'], name='order_vendor_created_idx'),
+            models.Index(fields=['affiliate', 'created_at', 'id'], name='order_affiliate_created_idx'),
+            models.Index(fields=['buyer', 'created_at', 'id'], name='order_buyer_created_idx'),
+        ]
 
     def __str__(self):
         buyer_email = self.buyer.email if self.buyer else "Guest"
@@ -83,6 +137,18 @@ class Order(models.Model):
         Without affiliate: Company 5%, Vendor 95%
         With affiliate: Company 5%, Affiliate 5%, Vendor 90%
         """
+        self.compute_splits()
+        self.save()
+        
+        return {
+            'company': float(self.company_amount),
+            'vendor': float(self.vendor_amount),
+            'affiliate': float(self.affiliate_amount),
+            'total': float(self.amount)
+        }
+
+    def compute_splits(self):
+        """Set the split amounts without saving (for orders created with bulk_create)."""
         if self.affiliate:
             # With affiliate: 5% company, 5% affiliate, 90% vendor
             self.company_amount = self.amount * Decimal('0.05')
@@ -94,14 +160,16 @@ class Order(models.Model):
             self.vendor_amount = self.amount * Decimal('0.95')
             self.affiliate_amount = Decimal('0')
 
-        self.save()
-        
-        return {
-            'company': float(self.company_amount),
-            'vendor': float(self.vendor_amount),
-            'affiliate': float(self.affiliate_amount),
-            'total': float(self.amount)
-        }
+    def build_splits(self):
+        """Unsaved PaymentSplit rows for the computed amounts."""
+        splits = [
+            PaymentSplit(order=self, recipient_type='company', recipient=None, amount=self.company_amount, status='pending'),
+            PaymentSplit(order=self, recipient_type='vendor', recipient=self.vendor, amount=self.vendor_amount, status='pending'),
+        ]
+        if self.affiliate:
+            splits.append(PaymentSplit(order=self, recipient_type='affiliate', recipient=self.affiliate,
+                                       amount=self.affiliate_amount, status='pending'))
+        return splits
 
     def mark_completed(self):
         """Mark order as completed when all payments are done"""
@@ -260,4 +328,120 @@ class VendorPayout(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"Payout to {self.vendor.email} - Order #{self.order.id} - KSh {self.amount}"
\ No newline at end of file
+        return f"Payout to {self.vendor.email} - Order #{self.order.id} - KSh {self.amount}"
+
+class StockReservation(models.Model):
+    """
+    Stock held for a pending order while the buyer is on the Paystack page.
+
+    Reserving takes the quantity off the product with one conditional UPDATE
+    (only if enough is left), so concurrent checkouts can never oversell. The
+    webhook converts the hold into a sale; if the buyer never pays, the
+    sweeper (`manage.py release_expired_reservations`) puts it back after
+    STOCK_RESERVATION_TTL_MINUTES. See orders/reservations.py.
+    """
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('converted', 'Converted to sale'),
+        ('released', 'Released'),
+    ]
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='reservation')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The sweeper's scan: held reservations past their expiry
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for Order #{self.order_id} ({self.status})"
+
+
+class WebhookEvent(models.Model):
+    """
+    Durable queue of incoming provider webhooks (see orders/webhooks.py).
+
+    The endpoint stores the verified raw event and answers at once; the
+    `process_webhook_events` worker runs the handler later. The unique
+    (source, event_id) key makes a redelivery a no-op at the door, so each
+    event is handled once however often the provider sends it.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    source = models.CharField(max_length=30)
+    event_id = models.CharField(max_length=150)
+    event_type = models.CharField(max_length=50, blank=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'event_id'], name='unique_webhook_event'),
+        ]
+        indexes = [
+            # The worker's scan: due pending events, oldest first
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'),
+                         name='webhook_event_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.event_id} ({self.status})"
+
+
+class OutboxMessage(models.Model):
+    """
+    An email or SMS waiting to be delivered (see orders/outbox.py).
+
+    Written in the same transaction as the change it announces, so a rolled
+    back order sends nothing and a committed one is never lost to a restart.
+    The `send_notifications` worker delivers it and records the outcome.
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    html = models.TextField(blank=True)
+    sender = models.CharField(max_length=20, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    provider_id = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's scan: due pending messages of a channel, oldest first
+            models.Index(fields=['channel', 'next_attempt_at'], condition=models.Q(status='pending'),
+                         name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
@@ -0,0 +1,328 @@
+"""
+Notification outbox: every transactional email and SMS goes through here.
+
+    queue_email(recipient, subject, body, html=None)
+    queue_template_email(recipient, 'emails/order_paid_buyer', context)
+    queue_sms(phone, message)
+    queue_bulk_sms(phones, message)          # announcements
+
+- queue_*() only writes an OutboxMessage row, inside whatever transaction
+  the caller has open — the message commits (or rolls back) with the order,
+  registration or verification it is about. No thread, no provider call.
+- `manage.py send_notifications` is the worker. It claims due messages with
+  SELECT ... FOR UPDATE SKIP LOCKED and hands them to a fixed pool of
+  OUTBOX_WORKERS threads (default 4), so a burst of orders is a longer
+  queue, not hundreds of threads. Several workers can run side by side.
+- A claimed message is leased for LEASE_SECONDS; if the worker dies
+  mid-send it becomes due again. Delivery is at-least-once.
+- Failures are retried with exponential backoff; after OUTBOX_MAX_ATTEMPTS
+  (default 6), or on an error retrying can't fix (missing credentials, a
+  rejected address), the message is marked failed with its last error.
+- Email goes through SendGrid's HTTP API when SENDGRID_API_KEY is set and
+  Django's mail backend otherwise.
+- SMS go through Africa's Talking in bulk: a new SMS is held for
+  SMS_COALESCE_SECONDS (default 2), then every due SMS with the same text
+  and sender is sent in one call with a comma-separated `to` list of up to
+  SMS_MAX_RECIPIENTS numbers (default 200). Calls are throttled to
+  SMS_RATE_PER_SECOND (default 5) per worker, and the per-recipient
+  `Recipients` statuses are recorded on each message.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.utils import timezone
+
+from globalconnect024.emails import render_email
+from globalconnect024.http_clients import africastalking, sendgrid
+from .models import OutboxMessage
+from .webhooks import backoff
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_SMS_BATCH_SIZE = 2000
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_SMS_COALESCE_SECONDS = 2
+DEFAULT_SMS_MAX_RECIPIENTS = 200
+DEFAULT_SMS_RATE = 5
+LEASE_SECONDS = 300
+# Africa's Talking per-recipient codes that mean the message was accepted
+SMS_ACCEPTED_CODES = {100, 101, 102}
+# ...and the ones no retry will fix: invalid number, unsupported number type, blacklisted
+SMS_PERMANENT_CODES = {403, 404, 406}
+
+
+class DeliveryError(Exception):
+    """A send that failed. `permanent` errors are not retried."""
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def normalize_phone(phone):
+    """Kenyan numbers in international format: 0712... / 254712... / 712... -> +254712..."""
+    p = str(phone).strip().replace(' ', '').replace('-', '')
+    if p.startswith('0'):
+        return '+254' + p[1:]
+    if p.startswith('254'):
+        return '+' + p
+    if not p.startswith('+'):
+        return '+254' + p
+    return p
+
+
+def queue_email(recipient, subject, body, html=None):
+    """Queue an email. Returns the OutboxMessage, or None without a recipient."""
+    if not recipient:
+        print(f"[OUTBOX] No recipient for '{subject}' — skipping email")
+        return None
+    return OutboxMessage.objects.create(
+        channel='email', recipient=recipient, subject=subject, body=body, html=html or '',
+    )
+
+
+def queue_template_email(recipient, name, context):
+    """Queue an email rendered from the named templates (globalconnect024/emails.py)."""
+    if not recipient:
+        print(f"[OUTBOX] No recipient for '{name}' — skipping email")
+        return None
+    subject, text, html = render_email(name, context)
+    return queue_email(recipient, subject, text, html=html)
+
+
+def coalesce_until():
+    """When a new SMS becomes due — held briefly so identical texts go out in one bulk send."""
+    return timezone.now() + timedelta(seconds=getattr(settings, 'SMS_COALESCE_SECONDS', DEFAULT_SMS_COALESCE_SECONDS))
+
+
+def queue_sms(phone, message, sender=''):
+    """Queue an SMS. Returns the OutboxMessage, or None without a phone number."""
+    if not phone:
+        print('[OUTBOX] No phone number provided — skipping SMS')
+        return None
+    return OutboxMessage.objects.create(
+        channel='sms', recipient=normalize_phone(phone), body=message, sender=sender,
+        next_attempt_at=coalesce_until(),
+    )
+
+
+def queue_bulk_sms(phones, message, sender=''):
+    """Queue one text to many numbers (announcements) with a single INSERT. Returns how many."""
+    due = coalesce_until()
+    numbers = dict.fromkeys(normalize_phone(phone) for phone in phones if phone)
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(channel='sms', recipient=number, body=message, sender=sender, next_attempt_at=due)
+        for number in numbers
+    ], batch_size=1000)
+    return len(numbers)
+
+
+def sendgrid_from():
+    # Parse "Name <email>" format if present
+    from_raw = settings.DEFAULT_FROM_EMAIL or ''
+    if '<' in from_raw:
+        return {"email": from_raw.split('<')[1].rstrip('>'), "name": from_raw.split('<')[0].strip()}
+    return {"email": from_raw}
+
+
+def deliver_email(message):
+    api_key = getattr(settings, 'SENDGRID_API_KEY', '')
+    if not api_key:
+        email = EmailMultiAlternatives(message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.recipient])
+        if message.html:
+            email.attach_alternative(message.html, 'text/html')
+        email.send()
+        return ''
+
+    response = sendgrid.post(
+        "/v3/mail/send",
+        headers={"Authorization": f"Bearer {api_key}"},
+        json={
+            "personalizations": [{"to": [{"email": message.recipient}]}],
+            "from": sendgrid_from(),
+            "subject": message.subject,
+            "content": [{"type": "text/plain", "value": message.body}]
+                       + ([{"type": "text/html", "value": message.html}] if message.html else []),
+        },
+    )
+    if response.status_code != 202:
+        # 4xx (bad address, bad key) won't get better by retrying; 429 and 5xx might
+        permanent = 400 <= response.status_code < 500 and response.status_code != 429
+        raise DeliveryError(f"SendGrid {response.status_code}: {response.text[:500]}", permanent=permanent)
+    return response.headers.get('X-Message-Id', '')
+
+
+def sms_credentials():
+    """(username, api key) — AFRICASTALKING_* if set, else the older AT_* pair."""
+    if getattr(settings, 'AFRICASTALKING_API_KEY', ''):
+        return settings.AFRICASTALKING_USERNAME, settings.AFRICASTALKING_API_KEY
+    return getattr(settings, 'AT_USERNAME', 'sandbox'), getattr(settings, 'AT_API_KEY', '')
+
+
+class RateLimiter:
+    """At most `rate` calls per second across all pool threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+sms_rate_limiter = RateLimiter(getattr(settings, 'SMS_RATE_PER_SECOND', DEFAULT_SMS_RATE))
+
+
+def sms_batches(messages):
+    """
+    Group SMS with the same text and sender into bulk sends of at most
+    SMS_MAX_RECIPIENTS numbers. Yields lists of messages.
+    """
+    limit = getattr(settings, 'SMS_MAX_RECIPIENTS', DEFAULT_SMS_MAX_RECIPIENTS)
+    groups = {}
+    for message in messages:
+        groups.setdefault((message.body, message.sender), []).append(message)
+    for group in groups.values():
+        batch, numbers = [], set()
+        for message in group:
+            if message.recipient not in numbers and len(numbers) >= limit:
+                yield batch
+                batch, numbers = [], set()
+            batch.append(message)
+            numbers.add(message.recipient)
+        yield batch
+
+
+def send_sms_batch(messages):
+    """
+    One Africa's Talking call for messages sharing a text, and each
+    recipient's status recorded back on its message. Runs in a pool thread.
+    """
+    numbers = list(dict.fromkeys(message.recipient for message in messages))
+    try:
+        username, api_key = sms_credentials()
+        if not api_key:
+            raise DeliveryError("AFRICASTALKING_API_KEY not set", permanent=True)
+
+        data = {'username': username, 'to': ','.join(numbers), 'message': messages[0].body}
+        if messages[0].sender:
+            data['from'] = messages[0].sender
+        sms_rate_limiter.wait()
+        response = africastalking.post(
+            '/version1/messaging',
+            headers={'apiKey': api_key, 'Accept': 'application/json'},
+            data=data,
+        )
+        if response.status_code >= 400:
+            raise DeliveryError(f"Africa's Talking {response.status_code}: {response.text[:500]}",
+                                permanent=response.status_code < 500 and response.status_code != 429)
+        results = {
+            r.get('number'): r
+            for r in response.json().get('SMSMessageData', {}).get('Recipients', [])
+        }
+    except Exception as e:
+        for message in messages:
+            record_failure(message, e)
+        return messages
+
+    print(f"[SMS] Bulk send to {len(numbers)} numbers: {sum(1 for r in results.values() if r.get('statusCode') in SMS_ACCEPTED_CODES)} accepted")
+    for message in messages:
+        result = results.get(message.recipient)
+        if result is None:
+            record_failure(message, DeliveryError("Missing from Africa's Talking response"))
+            continue
+        code = result.get('statusCode')
+        if code in SMS_ACCEPTED_CODES:
+            record_success(message, result.get('messageId', ''))
+        else:
+            record_failure(message, DeliveryError(f"{result.get('status')} ({code})",
+                                                  permanent=code in SMS_PERMANENT_CODES))
+    return messages
+
+
+def record_success(message, provider_id=''):
+    message.status = 'sent'
+    message.sent_at = timezone.now()
+    message.last_error = ''
+    message.provider_id = provider_id or ''
+    print(f"[OUTBOX] Delivered {message.channel} to {message.recipient}")
+
+
+def record_failure(message, error):
+    """Schedule a retry with backoff, or give up if the error is permanent or attempts ran out."""
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    message.last_error = str(error)[:4000]
+    if getattr(error, 'permanent', False) or message.attempts >= max_attempts:
+        message.status = 'failed'
+        print(f"[OUTBOX] {message} gave up after {message.attempts} attempts: {error}")
+    else:
+        message.next_attempt_at = timezone.now() + backoff(message.attempts)
+        print(f"[OUTBOX] {message} attempt {message.attempts} failed, retrying at {message.next_attempt_at}: {error}")
+
+
+def send_email(message):
+    """Send one email and record the outcome on it (not saved). Runs in a pool thread."""
+    try:
+        provider_id = deliver_email(message)
+    except Exception as e:
+        record_failure(message, e)
+    else:
+        record_success(message, provider_id)
+    return message
+
+
+def claim(channel, batch_size):
+    """Lease up to `batch_size` due messages of `channel` to this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(channel=channel, status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for message in messages:
+            message.attempts += 1
+            message.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+        OutboxMessage.objects.bulk_update(messages, ['attempts', 'next_attempt_at'])
+    return messages
+
+
+def process_batch(pool, batch_size=DEFAULT_BATCH_SIZE, sms_batch_size=DEFAULT_SMS_BATCH_SIZE):
+    """
+    Claim due emails and SMS and deliver them on `pool`: emails one by one,
+    SMS coalesced into bulk sends. Returns how many messages were claimed.
+    """
+    emails = claim('email', batch_size)
+    sms = claim('sms', sms_batch_size)
+    jobs = [pool.submit(send_email, message) for message in emails]
+    jobs += [pool.submit(send_sms_batch, batch) for batch in sms_batches(sms)]
+    for job in jobs:
+        job.result()
+
+    messages = emails + sms
+    if messages:
+        OutboxMessage.objects.bulk_update(
+            messages, ['status', 'next_attempt_at', 'last_error', 'provider_id', 'sent_at'],
+            batch_size=500,
+        )
+    return len(messages)
+
+
+def worker_pool(workers=None):
+    return ThreadPoolExecutor(
+        max_workers=workers or getattr(settings, 'OUTBOX_WORKERS', DEFAULT_WORKERS),
+        thread_name_prefix='outbox',
+    )
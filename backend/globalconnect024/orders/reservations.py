@@ -0,0 +1,228 @@
+"""
+Stock reservations for pending orders.
+
+- checkout calls `reserve()` inside the order's transaction; cart_checkout
+  calls `hold()` per line and `record_holds()` for the whole cart. Either
+  way stock is taken with ONE conditional UPDATE (`... WHERE stock >= qty`), so
+  two buyers racing for the last units can't both get them — the loser gets
+  a 409 (or, in a cart, that line is skipped) instead of an oversold order.
+- The Paystack webhook calls `convert_for(order)`: the held stock becomes a
+  sale without touching the product again. Retried webhooks are no-ops.
+- Unpaid holds expire after STOCK_RESERVATION_TTL_MINUTES (default 30).
+  `manage.py release_expired_reservations` (run it from cron every few
+  minutes) returns them in bulk: one UPDATE for the reservations and one per
+  product. Rows locked by another sweeper are skipped, not waited on.
+- Every step is a StockMovement in the inventory ledger (products/models.py),
+  referenced "order:<id>".
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from products.cache import invalidate_catalog
+from products.models import CommodityCap, InsufficientStock, Product, StockMovement
+from .models import StockReservation
+
+DEFAULT_TTL_MINUTES = 30
+SWEEP_BATCH_SIZE = 500
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_TTL_MINUTES', DEFAULT_TTL_MINUTES))
+
+
+def order_reference(order):
+    return f"order:{order.pk}"
+
+
+def _stock_changed(moves):
+    """Caps and catalog after stock moved: `moves` are (product, signed quantity), product holding the new balance."""
+    moved = {}
+    for product, quantity in moves:
+        moved[product.pk] = (product, moved.get(product.pk, (None, 0))[1] + quantity)
+    CommodityCap.track(
+        (product.cap_entry(product.quantity_kg - quantity), product.cap_entry())
+        for product, quantity in moved.values()
+    )
+    invalidate_catalog(*{product.visible_to for product, _ in moved.values()})
+
+
+def _resolve(reservation, status):
+    reservation.status = status
+    reservation.resolved_at = timezone.now()
+    reservation.save(update_fields=['status', 'resolved_at'])
+
+
+def reserve(order, product, quantity):
+    """
+    Hold `quantity` of `product` for `order`. Call inside the transaction that
+    creates the order; raises InsufficientStock (rolling it back) if the
+    stock ran out.
+    """
+    if quantity < 1:
+        raise InsufficientStock(product, quantity)
+    StockMovement.apply(product, 'reservation', -quantity, order_reference(order), require_stock=True)
+    reservation = StockReservation.objects.create(
+        order=order,
+        product=product,
+        quantity=quantity,
+        expires_at=timezone.now() + reservation_ttl(),
+    )
+    _stock_changed([(product, -quantity)])
+    return reservation
+
+
+def hold(product, quantity):
+    """
+    Take stock for an order line that is about to be created (cart
+    checkout). Returns False if it ran out; otherwise the new balance is in
+    product.stock and record_holds() must follow in the same transaction.
+    """
+    if quantity < 1:
+        return False
+    try:
+        StockMovement.move_balance(product, -quantity, require_stock=True)
+    except InsufficientStock:
+        return False
+    return True
+
+
+def record_holds(lines):
+    """
+    Reservations and ledger rows for saved order lines whose stock hold()
+    took — two bulk_create()s. `lines` are (order, balance after the hold).
+    """
+    expires_at = timezone.now() + reservation_ttl()
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product=order.product, quantity=order.quantity, expires_at=expires_at)
+        for order, _ in lines
+    ])
+    StockMovement.objects.bulk_create([
+        StockMovement(product=order.product, kind='reservation', quantity=-order.quantity,
+                      balance_after=balance, reference=order_reference(order))
+        for order, balance in lines
+    ])
+    _stock_changed([(order.product, -order.quantity) for order, _ in lines])
+
+
+def release_cart(cart):
+    """Give back the stock held for every line of `cart`."""
+    released, _ = _release_held(
+        StockReservation.objects.filter(order__cart=cart, status='held'), f"cart:{cart.pk}"
+    )
+    return released
+
+
+def release(order):
+    """Give back the stock held for `order` (e.g. Paystack refused to start the payment)."""
+    with transaction.atomic():
+        reservation = (
+            StockReservation.objects.select_for_update()
+            .select_related('product__vendor', 'product__category')
+            .filter(order=order, status='held')
+            .first()
+        )
+        if reservation is None:
+            return False
+        _resolve(reservation, 'released')
+        product = reservation.product
+        StockMovement.apply(product, 'release', reservation.quantity, order_reference(order))
+        _stock_changed([(product, reservation.quantity)])
+    return True
+
+
+def convert_for(order):
+    """
+    Turn the reservation of a paid order into a sale. Call inside the
+    webhook's transaction.
+
+    - held: logged as release + sale; the stock was already taken at checkout.
+    - converted: a retried webhook, nothing to do.
+    - released (paid after the hold expired): the stock is taken again if
+      it's still there; otherwise it's clamped at zero and logged.
+    - no reservation (orders placed before reservations existed): stock is
+      deducted now, clamped at zero, as the webhook always did.
+    """
+    product = order.product
+    reference = order_reference(order)
+    reservation = StockReservation.objects.select_for_update().filter(order=order).first()
+
+    if reservation is not None and reservation.status == 'converted':
+        return
+    if reservation is not None and reservation.status == 'held':
+        _resolve(reservation, 'converted')
+        balance = Product.objects.filter(pk=product.pk).values_list('stock', flat=True).get()
+        StockMovement.objects.bulk_create([
+            StockMovement(product=product, kind='release', quantity=reservation.quantity,
+                          balance_after=balance + reservation.quantity, reference=reference),
+            StockMovement(product=product, kind='sale', quantity=-reservation.quantity,
+                          balance_after=balance, reference=reference),
+        ])
+        return
+
+    try:
+        movement = StockMovement.apply(product, 'sale', -order.quantity, reference, require_stock=True)
+    except InsufficientStock:
+        if reservation is not None:
+            print(f"[RESERVATION] WARNING: Order #{order.id} was paid after its hold expired and "
+                  f"'{product.name}' no longer has {order.quantity} in stock — clamping at zero")
+        movement = StockMovement.apply(product, 'sale', -order.quantity, reference)
+    _stock_changed([(product, movement.quantity)])
+
+    if reservation is not None:
+        _resolve(reservation, 'converted')
+
+
+def release_expired(batch_size=SWEEP_BATCH_SIZE):
+    """Release every held reservation past its expiry. Returns the number released."""
+    released = 0
+    while True:
+        count = _release_expired_batch(batch_size)
+        released += count
+        if count < batch_size:
+            return released
+
+
+def _release_expired_batch(batch_size):
+    expired = (
+        StockReservation.objects
+        .filter(status='held', expires_at__lte=timezone.now())
+        .order_by('expires_at')[:batch_size]
+    )
+    released, products = _release_held(expired, 'expired')
+    if released:
+        print(f"[RESERVATION] Released {released} expired reservations across {products} products")
+    return released
+
+
+def _release_held(reservations, reference):
+    """
+    Release the held reservations in `reservations`: one UPDATE for the
+    reservations and one ledger movement per product. Rows locked by another
+    worker are skipped. Returns (reservations released, products restocked).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        held = list(
+            reservations.select_for_update(skip_locked=True).values_list('id', 'product_id', 'quantity')
+        )
+        if not held:
+            return 0, 0
+
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in held]).update(
+            status='released', resolved_at=now
+        )
+
+        quantities = {}
+        for _, product_id, quantity in held:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        products = list(
+            Product.objects.select_related('vendor', 'category').filter(pk__in=quantities).order_by('pk')
+        )
+        for product in products:
+            StockMovement.apply(product, 'release', quantities[product.pk], reference)
+        _stock_changed((product, quantities[product.pk]) for product in products)
+    return len(held), len(products)
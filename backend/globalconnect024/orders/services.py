@@ -2,8 +2,7 @@ from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 from .models import Order, PaymentSplit
-import requests
-from django.conf import settings
+from globalconnect024.http_clients import paystack
 
 
 class PaymentSplitService:
@@ -146,12 +145,6 @@ class PaymentSplitService:
         # Convert amount to kobo (Paystack uses kobo)
         amount_in_kobo = int(float(amount) * 100)
         
-        url = "https://api.paystack.co/transfer"
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "source": "balance",
             "amount": amount_in_kobo,
@@ -160,7 +153,7 @@ class PaymentSplitService:
         }
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = paystack.post("/transfer", json=payload)
             data = response.json()
             
             if data.get('status') and data.get('data'):
@@ -1,3 +1,640 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import io
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.template import TemplateDoesNotExist
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from globalconnect024.emails import html_to_text, render_email
+from globalconnect024.http_clients import ProviderClient
+from products.models import Product, StockMovement
+from users.models import CustomUser
+from . import outbox
+from .cart import build_lines, place_cart
+from .management.commands.benchmark_email_templates import SAMPLES
+from .models import Order, OutboxMessage, StockReservation, WebhookEvent
+from .reservations import convert_for, hold, release, release_expired, reserve
+from .outbox import queue_bulk_sms, queue_email, queue_sms, sms_batches
+from .webhooks import backoff, enqueue, process_batch
+
+
+def make_vendor(username, vendor_type='retailer', **extra):
+    extra.setdefault('paystack_subaccount_code', f'ACCT_{username}')
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pw-12345678',
+        role='vendor', vendor_type=vendor_type, **extra
+    )
+
+
+def make_product(vendor, name='Soap', stock=5, price=50):
+    return Product.objects.create(
+        vendor=vendor, name=name, description='d', stock=stock, quantity_kg=stock,
+        **{f'{vendor.vendor_type}_price': price}
+    )
+
+
+class CartTests(TestCase):
+    """place_cart(): holds stock per line, skips sold-out lines, locks in product order."""
+
+    def setUp(self):
+        self.vendor = make_vendor('shop')
+        self.first = make_product(self.vendor, 'First', stock=5)
+        self.second = make_product(self.vendor, 'Second', stock=1)
+
+    def place(self, items):
+        lines = build_lines(items, None, None, '', {})
+        return lines, place_cart(lines, None, None, {})
+
+    def test_holds_stock_and_skips_sold_out_lines(self):
+        lines, (cart, orders) = self.place([
+            {'product_id': self.first.pk, 'quantity': 2},
+            {'product_id': self.second.pk, 'quantity': 3},
+        ])
+        self.assertEqual([order.product_id for order in orders], [self.first.pk])
+        self.assertEqual(cart.amount, 100)
+        self.assertIn("Not enough stock", lines[1].skipped)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.stock, 3)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+        self.assertEqual(StockMovement.objects.filter(kind='reservation').get().balance_after, 3)
+
+    def test_stock_is_locked_in_product_order(self):
+        with mock.patch('orders.cart.hold', wraps=hold) as spy:
+            self.place([
+                {'product_id': self.second.pk, 'quantity': 1},
+                {'product_id': self.first.pk, 'quantity': 1},
+            ])
+        self.assertEqual([call.args[0].pk for call in spy.call_args_list], [self.first.pk, self.second.pk])
+
+    def test_nothing_sellable_places_no_cart(self):
+        lines, (cart, orders) = self.place([{'product_id': self.second.pk, 'quantity': 2}])
+        self.assertIsNone(cart)
+        self.assertEqual(orders, [])
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.stock, 1)
+
+
+class ReservationTests(TestCase):
+    """Stock is held at checkout, returned on release or expiry, and sold once on payment."""
+
+    def setUp(self):
+        self.vendor = make_vendor('shop')
+        self.product = make_product(self.vendor, 'Soap', stock=5)
+
+    def order(self, quantity=2):
+        return Order.objects.create(product=self.product, vendor=self.vendor, quantity=quantity, amount=50 * quantity)
+
+    def stock(self):
+        return Product.objects.values_list('stock', flat=True).get(pk=self.product.pk)
+
+    def ledger(self):
+        return list(StockMovement.objects.order_by('pk').values_list('kind', 'quantity', 'balance_after'))
+
+    def test_reserve_takes_stock(self):
+        reservation = reserve(self.order(), self.product, 2)
+        self.assertEqual((reservation.status, reservation.quantity), ('held', 2))
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(self.ledger()[-1], ('reservation', -2, 3))
+
+    def test_checkout_past_the_stock_is_a_409(self):
+        response = APIClient().post('/api/orders/checkout/', {
+            'product': self.product.pk, 'quantity': 6, 'guest_email': 'buyer@example.com',
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(), 5)
+
+    def test_release_gives_the_stock_back_once(self):
+        order = self.order()
+        reserve(order, self.product, 2)
+        self.assertTrue(release(order))
+        self.assertFalse(release(order))
+        self.assertEqual(self.stock(), 5)
+        self.assertEqual(StockReservation.objects.get().status, 'released')
+
+    def test_release_expired_only_touches_expired_holds(self):
+        reserve(self.order(), self.product, 2)
+        fresh = reserve(self.order(1), self.product, 1)
+        StockReservation.objects.exclude(pk=fresh.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('quantity', 'status')), {2: 'released', 1: 'held'}
+        )
+
+    def test_convert_is_idempotent(self):
+        order = self.order()
+        reserve(order, self.product, 2)
+        convert_for(order)
+        convert_for(order)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(StockReservation.objects.get().status, 'converted')
+        self.assertEqual([kind for kind, _, _ in self.ledger()].count('sale'), 1)
+        self.assertEqual(self.ledger()[-2:], [('release', 2, 5), ('sale', -2, 3)])
+
+    def test_paid_after_expiry_takes_the_stock_again(self):
+        order = self.order()
+        reserve(order, self.product, 2)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        release_expired()
+        convert_for(order)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(StockReservation.objects.get().status, 'converted')
+
+    def test_paid_after_expiry_with_stock_gone_clamps_at_zero(self):
+        order = self.order(4)
+        reserve(order, self.product, 4)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        release_expired()
+        reserve(self.order(3), self.product, 3)
+        convert_for(order)
+        self.assertEqual(self.stock(), 0)
+
+
+class FlakyProvider(BaseHTTPRequestHandler):
+    """Answers 503 to the first request of each method, 200 afterwards."""
+
+    def answer(self):
+        hits = self.server.hits
+        hits[self.command] = hits.get(self.command, 0) + 1
+        self.send_response(503 if hits[self.command] == 1 else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST = answer
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(HTTP_MAX_RETRIES=1)
+class ProviderClientTests(SimpleTestCase):
+    """ProviderClient: timeouts and auth on every call, retries only where they are safe."""
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FlakyProvider)
+        self.server.hits = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = ProviderClient(
+            'test', f'http://127.0.0.1:{self.server.server_port}/', read_timeout=7,
+            auth_headers=lambda: {'Authorization': 'Bearer sk_test'},
+        )
+
+    def test_idempotent_calls_are_retried_on_5xx(self):
+        self.assertEqual(self.client.get('/status').status_code, 200)
+        self.assertEqual(self.server.hits, {'GET': 2})
+
+    def test_posts_are_never_repeated(self):
+        self.assertEqual(self.client.post('/charge', json={}).status_code, 503)
+        self.assertEqual(self.server.hits, {'POST': 1})
+
+    @override_settings(HTTP_CONNECT_TIMEOUT=1.5)
+    def test_every_call_has_a_timeout_and_auth(self):
+        with mock.patch.object(self.client.session, 'request') as send:
+            self.client.post('transaction/initialize', headers={'X-Trace': '1'})
+        (method, url), kwargs = send.call_args
+        self.assertEqual((method, url), ('POST', f'{self.client.base_url}/transaction/initialize'))
+        self.assertEqual(kwargs['timeout'], (1.5, 7))
+        self.assertEqual(kwargs['headers'], {'Authorization': 'Bearer sk_test', 'X-Trace': '1'})
+
+    def test_session_is_reused(self):
+        self.assertIs(self.client.session, self.client.session)
+
+    def test_connection_failures_raise(self):
+        self.server.server_close()
+        client = ProviderClient('test', self.client.base_url)
+        with self.assertRaises(requests.RequestException):
+            client.get('/status', timeout=1)
+
+
+@mock.patch('orders.views.PAYSTACK_SECRET_KEY', 'sk_test')
+class PaystackWebhookTests(TestCase):
+    """POST /api/orders/paystack-webhook/ — signed events are queued once, however often they arrive."""
+
+    def setUp(self):
+        self.vendor = make_vendor('shop')
+        self.product = make_product(self.vendor, 'Soap', stock=5)
+        self.order = Order.objects.create(
+            product=self.product, vendor=self.vendor, quantity=2, amount=100, guest_email='buyer@example.com'
+        )
+        self.order.calculate_splits()
+        reserve(self.order, self.product, 2)
+
+    def deliver(self, event, signature=None):
+        payload = json.dumps(event).encode()
+        if signature is None:
+            signature = hmac.new(b'sk_test', payload, hashlib.sha512).hexdigest()
+        return APIClient().post(
+            '/api/orders/paystack-webhook/', payload, content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=signature,
+        )
+
+    def charge(self):
+        return {'event': 'charge.success', 'data': {
+            'id': 991, 'reference': 'ref-1', 'metadata': {'order_id': self.order.pk},
+            'customer': {'email': 'buyer@example.com'},
+        }}
+
+    def test_bad_signature_is_rejected(self):
+        self.assertEqual(self.deliver(self.charge(), signature='forged').status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_redelivery_is_queued_once(self):
+        for _ in range(3):
+            self.assertEqual(self.deliver(self.charge()).status_code, 200)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.source, event.event_id), ('paystack_orders', 'charge.success:991'))
+
+    def test_redelivery_after_processing_completes_the_order_once(self):
+        self.deliver(self.charge())
+        self.assertEqual(process_batch(), 1)
+        messages = OutboxMessage.objects.count()
+        self.deliver(self.charge())
+        self.assertEqual(process_batch(), 0)
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.payment_reference), ('completed', 'ref-1'))
+        self.assertGreater(messages, 0)
+        self.assertEqual(OutboxMessage.objects.count(), messages)
+        self.assertEqual(StockMovement.objects.filter(kind='sale').count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 3)
+
+
+def broken_handler(event):
+    # Queues a message, then fails: the savepoint must take the message with it
+    queue_email('ops@example.com', 'Half done', event['note'])
+    raise RuntimeError("provider down")
+
+
+def working_handler(event):
+    queue_email('ops@example.com', 'Done', event['note'])
+
+
+@mock.patch.dict('orders.webhooks.HANDLERS', {
+    'broken': 'orders.tests.broken_handler', 'working': 'orders.tests.working_handler',
+})
+class WebhookQueueTests(TestCase):
+    """process_batch(): each event in its own savepoint, failures retried with backoff."""
+
+    def test_enqueue_ignores_repeats(self):
+        self.assertTrue(enqueue('working', {'event': 'ping', 'note': 'a'}, 'evt-1'))
+        self.assertFalse(enqueue('working', {'event': 'ping', 'note': 'b'}, 'evt-1'))
+        self.assertEqual(WebhookEvent.objects.get().event_type, 'ping')
+
+    def test_failure_is_rolled_back_alone_and_retried_later(self):
+        enqueue('broken', {'note': 'x'}, 'evt-1')
+        enqueue('working', {'note': 'y'}, 'evt-2')
+        self.assertEqual(process_batch(), 2)
+
+        self.assertEqual(list(OutboxMessage.objects.values_list('subject', flat=True)), ['Done'])
+        failed = WebhookEvent.objects.get(event_id='evt-1')
+        self.assertEqual((failed.status, failed.attempts), ('pending', 1))
+        self.assertIn("provider down", failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        self.assertEqual(WebhookEvent.objects.get(event_id='evt-2').status, 'done')
+        # Not due yet
+        self.assertEqual(process_batch(), 0)
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        enqueue('broken', {'note': 'x'}, 'evt-1')
+        for _ in range(2):
+            WebhookEvent.objects.update(next_attempt_at=timezone.now())
+            process_batch()
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('failed', 2))
+        WebhookEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_batch(), 0)
+
+    def test_backoff_doubles_up_to_an_hour(self):
+        self.assertEqual([backoff(n).total_seconds() for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(backoff(20), timedelta(hours=1))
+
+    def test_worker_command_drains_the_queue(self):
+        for i in range(3):
+            enqueue('working', {'note': str(i)}, f'evt-{i}')
+        out = io.StringIO()
+        call_command('process_webhook_events', '--once', '--batch-size', '2', stdout=out)
+        self.assertIn("3 webhook events processed", out.getvalue())
+        self.assertFalse(WebhookEvent.objects.exclude(status='done').exists())
+
+
+def provider_response(status_code, payload=None, headers=None):
+    response = mock.Mock(status_code=status_code, text=json.dumps(payload or {}), headers=headers or {})
+    response.json.return_value = payload or {}
+    return response
+
+
+class OutboxEmailTests(TestCase):
+    """Emails are queued with the caller's transaction and delivered by the outbox worker."""
+
+    def setUp(self):
+        self.pool = outbox.worker_pool(1)
+        self.addCleanup(self.pool.shutdown)
+
+    def deliver(self):
+        return outbox.process_batch(self.pool)
+
+    def test_rolled_back_work_sends_nothing(self):
+        self.assertIsNone(queue_email('', 'No one', 'body'))
+        try:
+            with transaction.atomic():
+                queue_email('buyer@example.com', 'Order paid', 'body')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_worker_sends_through_the_mail_backend(self):
+        queue_email('buyer@example.com', 'Order paid', 'Thanks', html='<p>Thanks</p>')
+        self.assertEqual(self.deliver(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>Thanks</p>')
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), ('sent', 1))
+        self.assertEqual(self.deliver(), 0)
+
+    @override_settings(SENDGRID_API_KEY='SG.test', DEFAULT_FROM_EMAIL='Shop <shop@example.com>')
+    def test_sendgrid_server_errors_are_retried_with_backoff(self):
+        queue_email('buyer@example.com', 'Order paid', 'Thanks')
+        with mock.patch.object(outbox.sendgrid, 'post', return_value=provider_response(503)) as post:
+            self.deliver()
+        self.assertEqual(post.call_args.kwargs['json']['from'], {'email': 'shop@example.com', 'name': 'Shop'})
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, 'pending')
+        self.assertIn("SendGrid 503", message.last_error)
+        self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=25))
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        response = provider_response(202, headers={'X-Message-Id': 'sg-1'})
+        with mock.patch.object(outbox.sendgrid, 'post', return_value=response):
+            self.deliver()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.provider_id), ('sent', 2, 'sg-1'))
+
+    @override_settings(SENDGRID_API_KEY='SG.test')
+    def test_rejected_address_fails_without_retrying(self):
+        queue_email('not-an-address', 'Order paid', 'Thanks')
+        with mock.patch.object(outbox.sendgrid, 'post', return_value=provider_response(400)):
+            self.deliver()
+        self.assertEqual(OutboxMessage.objects.get().status, 'failed')
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        queue_email('buyer@example.com', 'Order paid', 'Thanks')
+        with mock.patch('orders.outbox.deliver_email', side_effect=RuntimeError("SMTP down")):
+            for _ in range(2):
+                OutboxMessage.objects.update(next_attempt_at=timezone.now())
+                self.deliver()
+        self.assertEqual(OutboxMessage.objects.get().status, 'failed')
+
+    def test_claimed_messages_are_leased(self):
+        queue_email('buyer@example.com', 'Order paid', 'Thanks')
+        self.assertEqual(len(outbox.claim('email', 10)), 1)
+        self.assertEqual(outbox.claim('email', 10), [])
+
+
+@override_settings(AFRICASTALKING_USERNAME='shop', AFRICASTALKING_API_KEY='at-key', SMS_COALESCE_SECONDS=0)
+class OutboxSmsTests(TestCase):
+    """SMS with the same text go out in one Africa's Talking call, with statuses per recipient."""
+
+    def setUp(self):
+        self.pool = outbox.worker_pool(1)
+        self.addCleanup(self.pool.shutdown)
+        limiter = mock.patch.object(outbox.sms_rate_limiter, 'wait')
+        limiter.start()
+        self.addCleanup(limiter.stop)
+
+    def send(self, recipients):
+        response = provider_response(201, {'SMSMessageData': {'Recipients': recipients}})
+        with mock.patch.object(outbox.africastalking, 'post', return_value=response) as post:
+            outbox.process_batch(self.pool)
+        return post
+
+    def statuses(self):
+        return dict(OutboxMessage.objects.values_list('recipient', 'status'))
+
+    def test_numbers_are_normalised(self):
+        for phone in ('0712345678', '254712345678', '712345678', '+254712345678'):
+            self.assertEqual(queue_sms(phone, 'Hi').recipient, '+254712345678')
+        self.assertIsNone(queue_sms('', 'Hi'))
+
+    @override_settings(SMS_COALESCE_SECONDS=30)
+    def test_new_sms_wait_to_be_coalesced(self):
+        queue_sms('0712345678', 'Hi')
+        self.assertEqual(outbox.claim('sms', 10), [])
+
+    def test_same_text_is_one_call_with_per_recipient_statuses(self):
+        queue_bulk_sms(['0711000001', '0711000002', '0711000002', '0711000003'], 'Sale today')
+        post = self.send([
+            {'number': '+254711000001', 'statusCode': 101, 'messageId': 'at-1'},
+            {'number': '+254711000002', 'statusCode': 403, 'status': 'InvalidPhoneNumber'},
+            {'number': '+254711000003', 'statusCode': 500, 'status': 'InternalServerError'},
+        ])
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args.kwargs['data']['to'], '+254711000001,+254711000002,+254711000003')
+        self.assertEqual(self.statuses(), {
+            '+254711000001': 'sent', '+254711000002': 'failed', '+254711000003': 'pending',
+        })
+        self.assertEqual(OutboxMessage.objects.get(recipient='+254711000001').provider_id, 'at-1')
+
+    def test_different_texts_are_separate_calls(self):
+        queue_sms('0711000001', 'Order paid')
+        queue_sms('0711000002', 'Order shipped')
+        post = self.send([
+            {'number': '+254711000001', 'statusCode': 101},
+            {'number': '+254711000002', 'statusCode': 101},
+        ])
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(set(self.statuses().values()), {'sent'})
+
+    @override_settings(AFRICASTALKING_API_KEY='', AT_API_KEY='')
+    def test_missing_credentials_fail_without_retrying(self):
+        queue_sms('0711000001', 'Hi')
+        self.send([])
+        self.assertEqual(self.statuses(), {'+254711000001': 'failed'})
+
+
+class SmsBatchTests(SimpleTestCase):
+    """sms_batches(): groups by text and sender, capped at SMS_MAX_RECIPIENTS numbers."""
+
+    def message(self, number, body='Hi', sender=''):
+        return OutboxMessage(channel='sms', recipient=number, body=body, sender=sender)
+
+    @override_settings(SMS_MAX_RECIPIENTS=2)
+    def test_batches_are_capped_by_distinct_numbers(self):
+        messages = [self.message(n) for n in ('+1', '+2', '+2', '+3')]
+        batches = [[m.recipient for m in batch] for batch in sms_batches(messages)]
+        self.assertEqual(batches, [['+1', '+2', '+2'], ['+3']])
+
+    def test_text_and_sender_split_batches(self):
+        messages = [self.message('+1'), self.message('+2', body='Bye'), self.message('+3', sender='SHOP')]
+        self.assertEqual(len(list(sms_batches(messages))), 3)
+
+
+class EmailTemplateTests(SimpleTestCase):
+    """render_email(): every transactional email renders from its named templates."""
+
+    def test_every_email_renders(self):
+        for name, context in SAMPLES.items():
+            with self.subTest(name):
+                subject, text, html = render_email(name, context)
+                self.assertTrue(subject)
+                self.assertNotIn('\n', subject)
+                self.assertTrue(text)
+                self.assertNotIn('{{', text + html)
+
+    def test_only_html_is_escaped(self):
+        context = dict(SAMPLES['emails/order_paid_buyer'], buyer_name='Tom & Jerry')
+        subject, text, html = render_email('emails/order_paid_buyer', context)
+        self.assertIn('Order #1042 Confirmed', subject)
+        self.assertIn('Hi Tom & Jerry,', text)
+        self.assertIn('Tom &amp; Jerry', html)
+
+    def test_text_only_emails_have_no_html(self):
+        self.assertEqual(render_email('emails/order_paid_vendor', SAMPLES['emails/order_paid_vendor'])[2], '')
+
+    def test_html_to_text_fallback(self):
+        self.assertEqual(html_to_text('<h2>Hi</h2>\n\n\n  <p>Paid</p>'), 'Hi\n\nPaid')
+
+    def test_unknown_email_raises(self):
+        with self.assertRaises(TemplateDoesNotExist):
+            render_email('emails/no_such_email', {})
+
+    def test_benchmark_command_covers_every_template(self):
+        out = io.StringIO()
+        call_command('benchmark_email_templates', '--count', '2', stdout=out)
+        for name in SAMPLES:
+            self.assertIn(name, out.getvalue())
+
+
+class VendorSalesTests(TestCase):
+    """GET /api/orders/vendor-sales/ — completed orders grouped per product in one query."""
+
+    def setUp(self):
+        self.vendor = make_vendor('shop')
+        self.soap = make_product(self.vendor, 'Soap', price=50)
+        self.salt = make_product(self.vendor, 'Salt', price=20)
+        self.sale(self.soap, 2, 95)
+        self.sale(self.soap, 1, 47.5)
+        self.sale(self.salt, 3, 57)
+        self.sale(self.salt, 9, 171, status='pending')
+        self.sale(make_product(make_vendor('rival'), 'Sugar'), 1, 100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendor)
+
+    def sale(self, product, quantity, vendor_amount, status='completed', created_at=None):
+        order = Order.objects.create(
+            product=product, vendor=product.vendor, quantity=quantity, amount=vendor_amount,
+            vendor_amount=vendor_amount, status=status,
+        )
+        if created_at:
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        return order
+
+    def get(self, **params):
+        return self.client.get('/api/orders/vendor-sales/', params)
+
+    def test_one_row_per_product_by_revenue(self):
+        with self.assertNumQueries(1):
+            response = self.get()
+        self.assertEqual(
+            [(row['product_name'], row['units_sold'], row['total_collected'], row['price']) for row in response.data],
+            [('Soap', 3, 142.5, 50.0), ('Salt', 3, 57.0, 20.0)],
+        )
+
+    def test_paging_is_opt_in_and_carries_totals(self):
+        response = self.get(page_size=1)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['product_name'] for row in response.data['results']], ['Soap'])
+        self.assertEqual(response.data['totals'], {'units_sold': 6, 'total_collected': 199.5})
+
+    def test_date_range(self):
+        self.sale(self.salt, 5, 500, created_at=timezone.now() - timedelta(days=40))
+        recent = (timezone.localdate() - timedelta(days=1)).isoformat()
+        rows = {row['product_name']: row['units_sold'] for row in self.get(start=recent).data}
+        self.assertEqual(rows, {'Soap': 3, 'Salt': 3})
+        month_ago = (timezone.localdate() - timedelta(days=30)).isoformat()
+        self.assertEqual([row['units_sold'] for row in self.get(end=month_ago).data], [5])
+
+    def test_bad_dates_and_non_vendors_are_rejected(self):
+        self.assertEqual(self.get(start='18/10/2026').status_code, 400)
+        self.assertEqual(self.get(end='2026-02-30').status_code, 400)
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pw-12345678', role='customer'
+        ))
+        self.assertEqual(self.get().status_code, 403)
+
+
+class MyOrdersTests(TestCase):
+    """GET /api/orders/my-orders/ — the caller's orders per role, newest first, keyset-paged."""
+
+    def setUp(self):
+        self.vendor = make_vendor('shop')
+        self.buyer = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pw-12345678', role='customer'
+        )
+        self.affiliate = CustomUser.objects.create_user(
+            username='promo', email='promo@example.com', password='pw-12345678', role='affiliate'
+        )
+        soap = make_product(self.vendor, 'Soap')
+        self.orders = []
+        for i in range(5):
+            order = Order.objects.create(
+                product=soap, vendor=self.vendor, buyer=self.buyer, affiliate=self.affiliate if i % 2 else None,
+                quantity=1, amount=100, status='completed' if i < 3 else 'pending',
+            )
+            order.calculate_splits()
+            self.orders.append(order)
+        self.client = APIClient()
+
+    def get(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/orders/my-orders/', params)
+
+    def test_each_role_sees_its_own_orders_and_share(self):
+        vendor_rows = self.get(self.vendor).data['results']
+        self.assertEqual([row['id'] for row in vendor_rows], [order.pk for order in reversed(self.orders)])
+        self.assertEqual({row['my_earnings'] for row in vendor_rows}, {90.0, 95.0})
+
+        affiliate_rows = self.get(self.affiliate).data['results']
+        self.assertEqual(sorted(row['id'] for row in affiliate_rows), [self.orders[1].pk, self.orders[3].pk])
+        self.assertEqual({row['my_earnings'] for row in affiliate_rows}, {5.0})
+
+        buyer_rows = self.get(self.buyer).data['results']
+        self.assertEqual(len(buyer_rows), 5)
+        self.assertEqual(buyer_rows[0]['product'], 'Soap')
+        self.assertEqual({row['my_earnings'] for row in buyer_rows}, {0.0})
+
+    def test_status_filter(self):
+        rows = self.get(self.vendor, status='pending').data['results']
+        self.assertEqual({row['status'] for row in rows}, {'pending'})
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(self.get(self.vendor, status='shipped').status_code, 400)
+
+    def test_cursor_pages_cover_every_order_once(self):
+        self.client.force_authenticate(self.vendor)
+        ids, url = [], '/api/orders/my-orders/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, [order.pk for order in reversed(self.orders)])
+
+    def test_page_is_one_query(self):
+        self.client.force_authenticate(self.vendor)
+        with self.assertNumQueries(1):
+            self.client.get('/api/orders/my-orders/', {'page_size': 2})
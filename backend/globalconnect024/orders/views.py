@@ -1,148 +1,49 @@
 # orders/views.py
 import requests
-from datetime import datetime
+from datetime import datetime, time, timedelta
 from base64 import b64encode
 from decimal import Decimal
-import json
 import hashlib
 import hmac
-import threading
 
 from services.views import get_nearest_transporters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
+from django.db.models import F, Max, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from products.models import Product
+from globalconnect024.http_clients import mpesa, paystack
+from globalconnect024.pagination import KeysetPagination
+from products.models import InsufficientStock, Product
 from users.models import CustomUser
-from orders.models import Order
+from orders.models import CartOrder, Order
 from orders.models import PaymentSplit, Referral, VendorPayout
+from orders.cart import build_lines, paystack_split, place_cart
+from orders.reservations import convert_for, release, release_cart, reserve
+from orders.outbox import queue_sms, queue_template_email
+from orders.webhooks import enqueue, parse_payload, paystack_event_id
 from rest_framework.permissions import AllowAny
 from django.utils.decorators import method_decorator
 from django.http import JsonResponse
 
 PAYSTACK_SECRET_KEY = settings.PAYSTACK_SECRET_KEY
-from users.utils import send_sms
-
-
-def send_email_async(subject, message, recipient, html=None):
-    """
-    Send email via SendGrid HTTP API in a background thread.
-    Uses HTTPS (port 443) — works even when Render blocks outbound SMTP.
-    If html is provided, sends HTML email; otherwise sends plain text.
-    """
-    def _send():
-        api_key = getattr(settings, 'SENDGRID_API_KEY', '')
-        if not api_key:
-            print(f"[EMAIL] SENDGRID_API_KEY not set — cannot send '{subject}' to {recipient}")
-            return
-
-        # Parse "Name <email>" format if present
-        from_raw = settings.DEFAULT_FROM_EMAIL or ''
-        if '<' in from_raw:
-            from_name = from_raw.split('<')[0].strip()
-            from_addr = from_raw.split('<')[1].rstrip('>')
-            from_field = {"email": from_addr, "name": from_name}
-        else:
-            from_field = {"email": from_raw}
-
-        content = []
-        if html:
-            content.append({"type": "text/html", "value": html})
-        else:
-            content.append({"type": "text/plain", "value": message})
-
-        payload = {
-            "personalizations": [{"to": [{"email": recipient}]}],
-            "from": from_field,
-            "subject": subject,
-            "content": content,
-        }
-
-        try:
-            response = requests.post(
-                "https://api.sendgrid.com/v3/mail/send",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-                timeout=15,
-            )
-            if response.status_code == 202:
-                print(f"[EMAIL] Delivered '{subject}' to {recipient}")
-            else:
-                print(f"[EMAIL] SendGrid error {response.status_code} for '{subject}' to {recipient}: {response.text}")
-        except Exception as e:
-            print(f"[EMAIL] SendGrid request failed for '{subject}' to {recipient}: {e}")
-
-    threading.Thread(target=_send, daemon=True).start()
-
-
-def send_sms_async(message, recipients):
-    """
-    Send SMS via Africa's Talking HTTP API in a background thread.
-    recipients: list of phone numbers in international format e.g. ['+254712345678']
-    """
-    def _send():
-        api_key = getattr(settings, 'AT_API_KEY', '')
-        username = getattr(settings, 'AT_USERNAME', 'sandbox')
-        if not api_key:
-            print(f"[SMS] AT_API_KEY not set — cannot send SMS")
-            return
-
-        # Format phone numbers to international format (+254...)
-        formatted = []
-        for phone in recipients:
-            if not phone:
-                continue
-            p = str(phone).strip().replace(' ', '').replace('-', '')
-            if p.startswith('0'):
-                p = '+254' + p[1:]
-            elif p.startswith('254') and not p.startswith('+'):
-                p = '+' + p
-            elif not p.startswith('+'):
-                p = '+254' + p
-            formatted.append(p)
-
-        if not formatted:
-            return
-
-        try:
-            response = requests.post(
-                'https://api.africastalking.com/version1/messaging',
-                headers={
-                    'apiKey': api_key,
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                    'Accept': 'application/json',
-                },
-                data={
-                    'username': username,
-                    'to': ','.join(formatted),
-                    'message': message,
-                    'from': '024Global',
-                },
-                timeout=15,
-            )
-            result = response.json()
-            recipients_info = result.get('SMSMessageData', {}).get('Recipients', [])
-            for r in recipients_info:
-                print(f"[SMS] {r.get('status')} to {r.get('number')}: {r.get('statusCode')}")
-        except Exception as e:
-            print(f"[SMS] Africa's Talking request failed: {e}")
-
-    threading.Thread(target=_send, daemon=True).start()
 
 
 def get_mpesa_token():
     """Get M-Pesa OAuth token"""
-    url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
-    r = requests.get(url, auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET))
+    r = mpesa.get(
+        "/oauth/v1/generate",
+        params={"grant_type": "client_credentials"},
+        auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET),
+    )
     r.raise_for_status()
     return r.json().get("access_token")
 
@@ -174,8 +75,8 @@ def initiate_stk_push(phone, amount):
         "TransactionDesc": "Product purchase"
     }
 
-    response = requests.post(
-        "https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest",
+    response = mpesa.post(
+        "/mpesa/stkpush/v1/processrequest",
         headers=headers,
         json=payload
     )
@@ -211,8 +112,8 @@ def send_b2c_payment(phone, amount, recipient_type, order_id):
         "Occasion": f"ORD{order_id}{recipient_type[:3].upper()}"
     }
 
-    response = requests.post(
-        "https://sandbox.safaricom.co.ke/mpesa/b2c/v1/paymentrequest",
+    response = mpesa.post(
+        "/mpesa/b2c/v1/paymentrequest",
         headers=headers,
         json=payload
     )
@@ -262,19 +163,14 @@ def checkout(request):
         return Response({"error": "Product is required."}, status=400)
 
     try:
-        product = Product.objects.select_related('vendor').get(id=product_id)
+        product = Product.objects.select_related('vendor', 'category').get(id=product_id)
     except Product.DoesNotExist:
         return Response({"error": "Product not found."}, status=404)
 
     vendor = product.vendor
 
-    # Use same price priority as frontend: retailer → wholesaler → farmer
-    unit_price = (
-        product.retailer_price if product.retailer_price and Decimal(str(product.retailer_price)) > 0
-        else product.wholesaler_price if product.wholesaler_price and Decimal(str(product.wholesaler_price)) > 0
-        else product.farmer_price if product.farmer_price and Decimal(str(product.farmer_price)) > 0
-        else None
-    )
+    # Stored effective price: retailer → wholesaler → farmer, same as the frontend (0 = not set)
+    unit_price = product.effective_price or None
 
     if not unit_price:
         return Response({"error": "Product price is not set."}, status=400)
@@ -323,54 +219,58 @@ def checkout(request):
     amount = unit_price * quantity
     amount_kobo = int(amount * 100)  # Paystack uses smallest currency unit
 
-    # Create order with payment splits
-    with transaction.atomic():
-        order = Order.objects.create(
-            product=product,
-            buyer=buyer,
-            vendor=vendor,
-            affiliate=affiliate,
-            quantity=quantity,
-            amount=amount,
-            status="pending",
-            guest_name=guest_name,
-            guest_email=guest_email,
-            guest_phone=guest_phone,
-            guest_address=guest_address,
-        )
+    # Create order with payment splits and hold the stock until it's paid
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                product=product,
+                buyer=buyer,
+                vendor=vendor,
+                affiliate=affiliate,
+                quantity=quantity,
+                amount=amount,
+                status="pending",
+                guest_name=guest_name,
+                guest_email=guest_email,
+                guest_phone=guest_phone,
+                guest_address=guest_address,
+            )
+            reserve(order, product, quantity)
 
-        order.calculate_splits()
+            order.calculate_splits()
 
-        PaymentSplit.objects.create(
-            order=order,
-            recipient_type='company',
-            recipient=None,
-            amount=order.company_amount,
-            status='pending'
-        )
-        PaymentSplit.objects.create(
-            order=order,
-            recipient_type='vendor',
-            recipient=vendor,
-            amount=order.vendor_amount,
-            status='pending'
-        )
-        if affiliate:
             PaymentSplit.objects.create(
                 order=order,
-                recipient_type='affiliate',
-                recipient=affiliate,
-                amount=order.affiliate_amount,
+                recipient_type='company',
+                recipient=None,
+                amount=order.company_amount,
                 status='pending'
             )
-            Referral.objects.create(
-                affiliate=affiliate,
+            PaymentSplit.objects.create(
                 order=order,
-                product=product,
-                commission_earned=order.affiliate_amount,
-                commission_rate=Decimal('5.00'),
-                is_approved=True
+                recipient_type='vendor',
+                recipient=vendor,
+                amount=order.vendor_amount,
+                status='pending'
             )
+            if affiliate:
+                PaymentSplit.objects.create(
+                    order=order,
+                    recipient_type='affiliate',
+                    recipient=affiliate,
+                    amount=order.affiliate_amount,
+                    status='pending'
+                )
+                Referral.objects.create(
+                    affiliate=affiliate,
+                    order=order,
+                    product=product,
+                    commission_earned=order.affiliate_amount,
+                    commission_rate=Decimal('5.00'),
+                    is_approved=True
+                )
+    except InsufficientStock:
+        return Response({"error": "Not enough stock left for the requested quantity."}, status=409)
 
     # Build Paystack payload
     paystack_data = {
@@ -391,22 +291,15 @@ def checkout(request):
         }
     }
 
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    response = requests.post(
-        "https://api.paystack.co/transaction/initialize",
-        headers=headers,
-        json=paystack_data
-    )
-
-    res_data = response.json()
+    try:
+        res_data = paystack.post("/transaction/initialize", json=paystack_data).json()
+    except (requests.RequestException, ValueError):
+        res_data = {"status": False, "message": "Payment provider did not respond."}
 
     if not res_data.get('status'):
         order.status = 'failed'
         order.save()
+        release(order)
         return Response({
             "error": "Failed to initialize payment.",
             "details": res_data.get('message', 'Unknown error')
@@ -427,263 +320,193 @@ def checkout(request):
         }
     }, status=200)
 
-@csrf_exempt
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def paystack_order_webhook(request):
+def complete_paid_order(order, affiliate_id, paystack_reference):
     """
-    Paystack calls this after successful payment.
-    Marks order and all splits as completed.
-    Sends confirmation emails to buyer, vendor, and affiliate.
+    Mark one paid order and its splits completed, turn its stock hold into a
+    sale and record the vendor payout. Notifications are queued separately
+    by notify_paid_order.
     """
-    paystack_signature = request.headers.get('X-Paystack-Signature')
-    payload = request.body
-
-    # Verify Paystack signature
-    expected_signature = hmac.new(
-        PAYSTACK_SECRET_KEY.encode('utf-8'),
-        payload,
-        hashlib.sha512
-    ).hexdigest()
-
-    if paystack_signature != expected_signature:
-        return JsonResponse({"error": "Invalid signature"}, status=400)
-
-    event = json.loads(payload)
-
-    if event['event'] == 'charge.success':
-        metadata = event['data'].get('metadata', {})
-        order_id = metadata.get('order_id')
-        affiliate_id = metadata.get('affiliate_id')
-        paystack_reference = event['data'].get('reference')
+    with transaction.atomic():
+        order.status = 'completed'
+        order.company_paid = True
+        order.vendor_paid = True
+        order.affiliate_paid = True if affiliate_id else False
+        order.completed_at = timezone.now()
+        order.payment_reference = paystack_reference
+        order.save()
+        order.splits.all().update(
+            status='completed',
+            completed_at=timezone.now()
+        )
 
-        try:
-            order = Order.objects.select_related(
-                'vendor', 'affiliate', 'buyer', 'product'
-            ).get(id=order_id)
-
-            with transaction.atomic():
-                order.status = 'completed'
-                order.company_paid = True
-                order.vendor_paid = True
-                order.affiliate_paid = True if affiliate_id else False
-                order.completed_at = timezone.now()
-                order.payment_reference = paystack_reference
-                order.save()
-                order.splits.all().update(
-                    status='completed',
-                    completed_at=timezone.now()
-                )
+        # Turn the stock held at checkout into a sale (update()s only —
+        # full_clean() on save() would reject a product sold down to zero)
+        convert_for(order)
 
-                # Deduct stock from product — use .update() to bypass full_clean()
-                # which raises "Stock must be at least 1" validation on save()
-                product = order.product
-                if product.is_farm_product():
-                    new_qty = max(0, product.quantity_kg - order.quantity)
-                    Product.objects.filter(id=product.id).update(
-                        quantity_kg=new_qty, stock=new_qty
-                    )
-                else:
-                    new_stock = max(0, product.stock - order.quantity)
-                    Product.objects.filter(id=product.id).update(
-                        stock=new_stock, quantity_kg=new_stock
-                    )
-
-                # Mark referral as paid
-                if affiliate_id:
-                    try:
-                        referral = Referral.objects.get(order=order)
-                        affiliate_split = order.splits.filter(
-                            recipient_type='affiliate'
-                        ).first()
-                        referral.mark_paid(affiliate_split)
-                    except Referral.DoesNotExist:
-                        pass
-
-            # Create vendor payout record — wrapped so failures don't block emails
+        # Mark referral as paid
+        if affiliate_id:
             try:
-                vendor_split = order.splits.filter(recipient_type='vendor').first()
-                if vendor_split:
-                    VendorPayout.objects.create(
-                        vendor=order.vendor,
-                        order=order,
-                        amount=order.vendor_amount,
-                        payment_split=vendor_split,
-                        is_paid=True,
-                        paid_at=timezone.now()
-                    )
-            except Exception:
+                referral = Referral.objects.get(order=order)
+                affiliate_split = order.splits.filter(
+                    recipient_type='affiliate'
+                ).first()
+                referral.mark_paid(affiliate_split)
+            except Referral.DoesNotExist:
                 pass
 
-            # Resolve shared values used across all notifications
-            buyer_name = order.guest_name or (order.buyer.get_full_name() if order.buyer else 'Customer')
-            buyer_phone_display = order.guest_phone or (getattr(order.buyer, 'phone', 'N/A') if order.buyer else 'N/A')
-            buyer_location = order.guest_address or 'N/A'
-            buyer_email_addr = event['data'].get('customer', {}).get('email') or order.guest_email or (order.buyer.email if order.buyer else None)
-            buyer_sms_phone = order.guest_phone or (getattr(order.buyer, 'phone', None) if order.buyer else None)
-            is_farm = order.product.is_farm_product()
-            goods_section = f"\nGoods Description : {order.goods_description}" if is_farm and order.goods_description else ''
-            frontend_url = getattr(settings, 'FRONTEND_URL', 'https://www.024global.com')
-            company_email = getattr(settings, 'COMPANY_EMAIL', '024globalconnect@gmail.com')
-            company_phone = getattr(settings, 'COMPANY_PHONE', '')
-
-            # ── 1. COMPANY notification (full order details + buyer contact) ──
-            company_msg_html = f"""<!DOCTYPE html>
-<html>
-<body style="font-family:Arial,sans-serif;color:#333;max-width:600px;margin:0 auto;padding:20px;">
-  <h2 style="color:#1d4ed8;">New Order Received - #{order.id}</h2>
-  <p>A new order has been placed on 024 Global Connect. Please contact the buyer to confirm and arrange delivery.</p>
-
-  <h3 style="color:#374151;margin-top:24px;">Buyer Details</h3>
-  <table style="width:100%;border-collapse:collapse;margin:8px 0 16px;">
-    <tr><td style="padding:6px 0;color:#555;width:40%;">Name</td><td style="padding:6px 0;font-weight:bold;">{buyer_name}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Phone</td><td style="padding:6px 0;font-weight:bold;color:#1d4ed8;">{buyer_phone_display}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Email</td><td style="padding:6px 0;">{buyer_email_addr or 'N/A'}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Delivery Location</td><td style="padding:6px 0;">{buyer_location}</td></tr>
-  </table>
-
-  <h3 style="color:#374151;">Order Details</h3>
-  <table style="width:100%;border-collapse:collapse;margin:8px 0 16px;">
-    <tr><td style="padding:6px 0;color:#555;width:40%;">Order ID</td><td style="padding:6px 0;font-weight:bold;">#{order.id}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Product</td><td style="padding:6px 0;">{order.product.name}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Quantity</td><td style="padding:6px 0;">{order.quantity}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Total Paid</td><td style="padding:6px 0;font-weight:bold;color:#16a34a;">KES {order.amount}</td></tr>
-    {f'<tr><td style="padding:6px 0;color:#555;">Goods Description</td><td style="padding:6px 0;">{order.goods_description}</td></tr>' if is_farm and order.goods_description else ''}
-  </table>
-
-  <h3 style="color:#374151;">Vendor Details</h3>
-  <table style="width:100%;border-collapse:collapse;margin:8px 0 16px;">
-    <tr><td style="padding:6px 0;color:#555;width:40%;">Vendor</td><td style="padding:6px 0;">{order.vendor.get_full_name() if order.vendor else 'N/A'}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Vendor Phone</td><td style="padding:6px 0;">{getattr(order.vendor, 'phone', 'N/A') if order.vendor else 'N/A'}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Vendor City</td><td style="padding:6px 0;">{getattr(order.vendor, 'city', 'N/A') if order.vendor else 'N/A'}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Vendor Amount</td><td style="padding:6px 0;">KES {order.vendor_amount}</td></tr>
-  </table>
-
-  <p style="margin-top:24px;color:#888;font-size:13px;">024Global Admin &bull; www.024global.com</p>
-</body>
-</html>"""
-            send_email_async(
-                subject=f'NEW ORDER #{order.id} — {buyer_name} | {buyer_phone_display}',
-                message=f"New order #{order.id}. Buyer: {buyer_name}, Phone: {buyer_phone_display}, Product: {order.product.name}, Total: KES {order.amount}.",
-                recipient=company_email,
-                html=company_msg_html,
-            )
-            if company_phone:
-                send_sms(
-                    company_phone,
-                    f"024Global NEW ORDER #{order.id}!\n"
-                    f"Buyer: {buyer_name}\n"
-                    f"Phone: {buyer_phone_display}\n"
-                    f"Product: {order.product.name} x{order.quantity}\n"
-                    f"Total: KES {order.amount}\n"
-                    f"Location: {buyer_location}"
+    # Create vendor payout record — in a savepoint so a failure doesn't block the rest
+    try:
+        with transaction.atomic():
+            vendor_split = order.splits.filter(recipient_type='vendor').first()
+            if vendor_split:
+                VendorPayout.objects.create(
+                    vendor=order.vendor,
+                    order=order,
+                    amount=order.vendor_amount,
+                    payment_split=vendor_split,
+                    is_paid=True,
+                    paid_at=timezone.now()
                 )
+    except Exception:
+        pass
+
+
+def notify_paid_order(order, event):
+    """Queue the emails / SMS to the company, vendor, buyer and affiliate about a paid order."""
+    # Resolve shared values used across all notifications
+    buyer_name = order.guest_name or (order.buyer.get_full_name() if order.buyer else 'Customer')
+    buyer_phone_display = order.guest_phone or (getattr(order.buyer, 'phone', 'N/A') if order.buyer else 'N/A')
+    buyer_location = order.guest_address or 'N/A'
+    buyer_email_addr = event['data'].get('customer', {}).get('email') or order.guest_email or (order.buyer.email if order.buyer else None)
+    buyer_sms_phone = order.guest_phone or (getattr(order.buyer, 'phone', None) if order.buyer else None)
+    is_farm = order.product.is_farm_product()
+    company_email = getattr(settings, 'COMPANY_EMAIL', '024globalconnect@gmail.com')
+    company_phone = getattr(settings, 'COMPANY_PHONE', '')
+
+    # Shared context for the order emails (orders/templates/emails/order_paid_*)
+    context = {
+        'order': order,
+        'buyer_name': buyer_name,
+        'buyer_phone': buyer_phone_display,
+        'buyer_email': buyer_email_addr,
+        'buyer_location': buyer_location,
+        'goods_description': order.goods_description if is_farm else '',
+        'vendor_name': order.vendor.get_full_name() if order.vendor else 'N/A',
+        'affiliate_name': order.affiliate.get_full_name() if order.affiliate else '',
+    }
+
+    # ── 1. COMPANY notification (full order details + buyer contact) ──
+    queue_template_email(company_email, 'emails/order_paid_company', context)
+    if company_phone:
+        queue_sms(
+            company_phone,
+            f"024Global NEW ORDER #{order.id}!\n"
+            f"Buyer: {buyer_name}\n"
+            f"Phone: {buyer_phone_display}\n"
+            f"Product: {order.product.name} x{order.quantity}\n"
+            f"Total: KES {order.amount}\n"
+            f"Location: {buyer_location}"
+        )
 
-            # ── 2. VENDOR notification (prepare goods — no buyer contact info) ──
-            vendor_email = order.vendor.email if order.vendor else None
-            if vendor_email:
-                send_email_async(
-                    subject=f'Prepare Order #{order.id} - {order.product.name}',
-                    message=f"""Hi {order.vendor.get_full_name()},
+    # ── 2. VENDOR notification (prepare goods — no buyer contact info) ──
+    vendor_email = order.vendor.email if order.vendor else None
+    if vendor_email:
+        queue_template_email(vendor_email, 'emails/order_paid_vendor', context)
+    vendor_sms_phone = getattr(order.vendor, 'phone', None) if order.vendor else None
+    if vendor_sms_phone:
+        queue_sms(
+            vendor_sms_phone,
+            f"024Global: New order #{order.id}! "
+            f"Product: {order.product.name} x{order.quantity}. "
+            f"Your amount: KES {order.vendor_amount}. "
+            f"Please prepare goods — our team will arrange collection."
+        )
 
-A new order has been placed for your product on 024Global!
+    # ── 3. BUYER confirmation (no vendor contact, company will call) ──
+    if buyer_email_addr:
+        queue_template_email(buyer_email_addr, 'emails/order_paid_buyer', context)
+    if buyer_sms_phone:
+        queue_sms(
+            buyer_sms_phone,
+            f"024Global: Order #{order.id} confirmed! "
+            f"Product: {order.product.name}. Total: KES {order.amount}. "
+            f"Our team will call you shortly to arrange delivery. Thank you!"
+        )
 
-Order Details
-Order ID    : #{order.id}
-Product     : {order.product.name}
-Quantity    : {order.quantity}
-Your Amount : KES {order.vendor_amount}{goods_section}
+    # ── 4. AFFILIATE commission notification ──
+    affiliate_email = order.affiliate.email if order.affiliate else None
+    if affiliate_email:
+        queue_template_email(affiliate_email, 'emails/order_paid_affiliate', context)
+    affiliate_sms_phone = getattr(order.affiliate, 'phone', None) if order.affiliate else None
+    if affiliate_sms_phone:
+        queue_sms(
+            affiliate_sms_phone,
+            f"024Global: Commission earned! Order #{order.id} - {order.product.name}. "
+            f"Your commission: KES {order.affiliate_amount}. - 024Global"
+        )
 
-Please prepare the goods. Our team will arrange collection and delivery.
 
-Your payment will be settled within 1-3 business days.
+def process_paystack_order_event(event):
+    """
+    Worker handler (orders/webhooks.py) for a queued Paystack order event:
+    completes the paid order, or every line of a paid cart. Runs inside the
+    worker's transaction, so the queued notifications commit with it.
+    """
+    if event.get('event') != 'charge.success':
+        return
 
-Thank you for selling on 024Global!
-024Global Team
-www.024global.com""",
-                    recipient=vendor_email,
-                )
-            vendor_sms_phone = getattr(order.vendor, 'phone', None) if order.vendor else None
-            if vendor_sms_phone:
-                send_sms(
-                    vendor_sms_phone,
-                    f"024Global: New order #{order.id}! "
-                    f"Product: {order.product.name} x{order.quantity}. "
-                    f"Your amount: KES {order.vendor_amount}. "
-                    f"Please prepare goods — our team will arrange collection."
-                )
+    metadata = event['data'].get('metadata') or {}
+    order_id = metadata.get('order_id')
+    cart_id = metadata.get('cart_id')
+    affiliate_id = metadata.get('affiliate_id')
+    paystack_reference = event['data'].get('reference')
 
-            # ── 3. BUYER confirmation (no vendor contact, company will call) ──
-            if buyer_email_addr:
-                buyer_html = f"""<!DOCTYPE html>
-<html>
-<body style="font-family:Arial,sans-serif;color:#333;max-width:600px;margin:0 auto;padding:20px;">
-  <h2 style="color:#16a34a;">Order Confirmed! ✓</h2>
-  <p>Hi {buyer_name},</p>
-  <p>Thank you for your purchase on <strong>024 Global Connect</strong>! Your payment was successful and your order has been received.</p>
-
-  <table style="width:100%;border-collapse:collapse;margin:16px 0;">
-    <tr><td style="padding:6px 0;color:#555;">Order ID</td><td style="padding:6px 0;font-weight:bold;">#{order.id}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Product</td><td style="padding:6px 0;">{order.product.name}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Quantity</td><td style="padding:6px 0;">{order.quantity}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Total Paid</td><td style="padding:6px 0;font-weight:bold;color:#16a34a;">KES {order.amount}</td></tr>
-    <tr><td style="padding:6px 0;color:#555;">Delivery Address</td><td style="padding:6px 0;">{buyer_location}</td></tr>
-  </table>
-
-  <div style="background:#f0fdf4;border-left:4px solid #16a34a;padding:16px;border-radius:8px;margin:24px 0;">
-    <p style="margin:0;font-weight:bold;color:#166534;">What happens next?</p>
-    <p style="margin:8px 0 0;color:#166534;">Our team will call you shortly on <strong>{buyer_phone_display}</strong> to confirm your order and arrange delivery.</p>
-  </div>
-
-  <p style="color:#888;font-size:13px;">For any questions, contact us at 024globalconnect@gmail.com</p>
-  <p style="color:#888;font-size:13px;">024Global Team &bull; www.024global.com</p>
-</body>
-</html>"""
-                send_email_async(
-                    subject=f'Order #{order.id} Confirmed — We will call you shortly',
-                    message=f"Hi {buyer_name}, your order #{order.id} for {order.product.name} is confirmed. Total: KES {order.amount}. Our team will call you on {buyer_phone_display} to arrange delivery.",
-                    recipient=buyer_email_addr,
-                    html=buyer_html,
-                )
-            if buyer_sms_phone:
-                send_sms(
-                    buyer_sms_phone,
-                    f"024Global: Order #{order.id} confirmed! "
-                    f"Product: {order.product.name}. Total: KES {order.amount}. "
-                    f"Our team will call you shortly to arrange delivery. Thank you!"
-                )
+    orders = Order.objects.select_related(
+        'vendor', 'affiliate', 'buyer', 'product', 'product__vendor', 'product__category'
+    )
+    if cart_id:
+        # One payment for a whole cart: complete every line
+        CartOrder.objects.filter(pk=cart_id).update(
+            status='completed', completed_at=timezone.now(), payment_reference=paystack_reference
+        )
+        orders = list(orders.filter(cart_id=cart_id).order_by('id'))
+    else:
+        orders = list(orders.filter(id=order_id))
 
-            # ── 4. AFFILIATE commission notification ──
-            affiliate_email = order.affiliate.email if order.affiliate else None
-            if affiliate_email:
-                send_email_async(
-                    subject=f'Commission Earned - Order #{order.id}',
-                    message=f"""Hi {order.affiliate.get_full_name()},
+    for order in orders:
+        complete_paid_order(order, affiliate_id, paystack_reference)
+        notify_paid_order(order, event)
 
-You have earned a commission on 024Global!
 
-Order ID    : #{order.id}
-Product     : {order.product.name}
-Sale Amount : KES {order.amount}
-Commission  : KES {order.affiliate_amount} (5%)
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def paystack_order_webhook(request):
+    """
+    Paystack calls this after successful payment.
+    Verifies the signature, queues the event and answers straight away —
+    `manage.py process_webhook_events` completes the order and its splits
+    and sends the confirmation emails.
+    """
+    paystack_signature = request.headers.get('X-Paystack-Signature')
+    payload = request.body
 
-Your commission will be settled within 1-3 business days.
+    # Verify Paystack signature
+    expected_signature = hmac.new(
+        PAYSTACK_SECRET_KEY.encode('utf-8'),
+        payload,
+        hashlib.sha512
+    ).hexdigest()
 
-024Global Team
-www.024global.com""",
-                    recipient=affiliate_email,
-                )
-            affiliate_sms_phone = getattr(order.affiliate, 'phone', None) if order.affiliate else None
-            if affiliate_sms_phone:
-                send_sms(
-                    affiliate_sms_phone,
-                    f"024Global: Commission earned! Order #{order.id} - {order.product.name}. "
-                    f"Your commission: KES {order.affiliate_amount}. - 024Global"
-                )
+    if paystack_signature != expected_signature:
+        return JsonResponse({"error": "Invalid signature"}, status=400)
 
-        except Order.DoesNotExist:
-            pass
+    event = parse_payload(payload)
+    if event is None:
+        return JsonResponse({"error": "Invalid payload"}, status=400)
 
+    # Paystack redelivers slow-to-acknowledge events: enqueue() ignores the repeats
+    enqueue('paystack_orders', event, paystack_event_id(event, payload))
     return JsonResponse({"status": "ok"}, status=200)
 
 
@@ -723,125 +546,90 @@ def check_payment_status(request, order_id):
 @permission_classes([AllowAny])
 def cart_checkout(request):
     """
-    Multi-item cart checkout.
-    Accepts: items=[{product_id, quantity}], guest_name, guest_email, guest_phone, guest_address, affiliate_code
-    Creates one order per item. Returns list of payment_urls.
+    Multi-item cart checkout, paid with ONE Paystack transaction.
+    Accepts: items=[{product_id, quantity, unit_price}], guest_name, guest_email, guest_phone, guest_address,
+    goods_description, affiliate_code
+    Creates a CartOrder with one Order line per item (see orders/cart.py) and returns one payment_url.
     """
     items = request.data.get('items', [])
-    guest_name = request.data.get('guest_name')
-    guest_email = request.data.get('guest_email')
-    guest_phone = request.data.get('guest_phone')
-    guest_address = request.data.get('guest_address')
+    guest = {
+        'guest_name': request.data.get('guest_name'),
+        'guest_email': request.data.get('guest_email'),
+        'guest_phone': request.data.get('guest_phone'),
+        'guest_address': request.data.get('guest_address'),
+    }
     goods_description = request.data.get('goods_description', '')
     affiliate_code = request.data.get('affiliate_code')
 
     if not items:
         return Response({"error": "No items in cart."}, status=400)
-    if not guest_email:
+    if not guest['guest_email']:
         return Response({"error": "Email is required."}, status=400)
 
-    from products.models import Product as ProductModel
-    payment_urls = []
-
-    for item in items:
-        product_id = item.get('product_id')
-        quantity = int(item.get('quantity', 1))
-        # Unit price sent by cart — this is what was displayed to the buyer
-        frontend_price = item.get('unit_price')
-
-        try:
-            product = ProductModel.objects.select_related('vendor').get(id=product_id)
-        except ProductModel.DoesNotExist:
-            continue
-
-        vendor = product.vendor
-        if not vendor.paystack_subaccount_code:
-            continue
-
-        # Prefer the price the buyer saw in their cart; fall back to first non-zero DB price
-        if frontend_price and Decimal(str(frontend_price)) > 0:
-            unit_price = Decimal(str(frontend_price))
-        else:
-            # Same priority order as frontend getPrice: retailer → wholesaler → farmer
-            unit_price = (
-                product.retailer_price if product.retailer_price and Decimal(str(product.retailer_price)) > 0
-                else product.wholesaler_price if product.wholesaler_price and Decimal(str(product.wholesaler_price)) > 0
-                else product.farmer_price if product.farmer_price and Decimal(str(product.farmer_price)) > 0
-                else None
-            )
-
-        if not unit_price:
-            continue
+    # Resolve affiliate once for the whole cart
+    affiliate = None
+    if affiliate_code:
+        affiliate = CustomUser.objects.filter(username=affiliate_code, role='user').first()
 
-        # Resolve affiliate
-        affiliate = None
-        affiliate_subaccount = None
-        if affiliate_code:
-            try:
-                affiliate = CustomUser.objects.get(username=affiliate_code, role='user')
-                affiliate_subaccount = affiliate.paystack_subaccount_code
-            except CustomUser.DoesNotExist:
-                pass
+    buyer = request.user if request.user.is_authenticated else None
+    lines = build_lines(items, buyer, affiliate, goods_description, guest)
+    cart, orders = place_cart(lines, buyer, affiliate, guest)
+    skipped = [{"product_id": line.product_id, "reason": line.skipped} for line in lines if line.skipped]
+    for entry in skipped:
+        print(f"[CART] Skipping product {entry['product_id']}: {entry['reason']}")
 
-        buyer = request.user if request.user.is_authenticated else None
-        amount = unit_price * quantity
-        # Paystack uses smallest currency unit: 1 KES = 100 cents → multiply by 100
-        amount_kobo = int(Decimal(str(amount)) * 100)
+    if cart is None:
+        return Response({"error": "None of the items in the cart can be bought.", "skipped": skipped}, status=409)
 
-        subaccounts = [{"subaccount": vendor.paystack_subaccount_code, "share": 90 if affiliate else 95}]
-        if affiliate_subaccount:
-            subaccounts.append({"subaccount": affiliate_subaccount, "share": 5})
+    paystack_data = {
+        "email": guest['guest_email'],
+        # Paystack uses smallest currency unit: 1 KES = 100 cents
+        "amount": int(cart.amount * 100),
+        "currency": "KES",
+        "callback_url": f"{settings.FRONTEND_URL}/order-success?order_id={orders[0].id}&cart_id={cart.id}",
+        "metadata": {
+            "cart_id": cart.id,
+            "order_ids": [order.id for order in orders],
+            "affiliate_id": affiliate.id if affiliate else None,
+        },
+        "split": paystack_split(orders),
+    }
+    try:
+        res_data = paystack.post("/transaction/initialize", json=paystack_data).json()
+    except (requests.RequestException, ValueError):
+        res_data = {"status": False, "message": "Payment provider did not respond."}
 
-        with transaction.atomic():
-            order = Order.objects.create(
-                product=product,
-                buyer=buyer,
-                vendor=vendor,
-                affiliate=affiliate,
-                quantity=quantity,
-                amount=amount,
-                status="pending",
-                guest_name=guest_name,
-                guest_email=guest_email,
-                guest_phone=guest_phone,
-                guest_address=guest_address,
-                goods_description=goods_description if product.is_farm_product() else '',
-            )
-            order.calculate_splits()
-            PaymentSplit.objects.create(order=order, recipient_type='company', recipient=None, amount=order.company_amount, status='pending')
-            PaymentSplit.objects.create(order=order, recipient_type='vendor', recipient=vendor, amount=order.vendor_amount, status='pending')
-            if affiliate:
-                PaymentSplit.objects.create(order=order, recipient_type='affiliate', recipient=affiliate, amount=order.affiliate_amount, status='pending')
-
-        paystack_data = {
-            "email": guest_email,
-            "amount": amount_kobo,
-            "currency": "KES",
-            "callback_url": f"{settings.FRONTEND_URL}/order-success?order_id={order.id}",
-            "metadata": {"order_id": order.id, "product_id": product.id},
-            "split": {"type": "percentage", "bearer_type": "account", "subaccounts": subaccounts},
-        }
-        headers = {"Authorization": f"Bearer {PAYSTACK_SECRET_KEY}", "Content-Type": "application/json"}
-        res = requests.post("https://api.paystack.co/transaction/initialize", headers=headers, json=paystack_data)
-        res_data = res.json()
-        if res_data.get('status'):
-            order.payment_reference = res_data['data']['reference']
-            order.save()
-            payment_urls.append({
-                "order_id": order.id,
-                "product_name": product.name,
-                "amount": float(amount),
-                "payment_url": res_data['data']['authorization_url'],
-                "reference": res_data['data']['reference'],
-            })
-        else:
-            order.status = 'failed'
-            order.save()
+    if not res_data.get('status'):
+        CartOrder.objects.filter(pk=cart.pk).update(status='failed')
+        cart.lines.update(status='failed')
+        release_cart(cart)
+        return Response({
+            "error": "Could not initialize payment for the cart.",
+            "details": res_data.get('message', 'Unknown error'),
+        }, status=500)
 
-    if not payment_urls:
-        return Response({"error": "Could not initialize payment for any items."}, status=500)
+    reference = res_data['data']['reference']
+    payment_url = res_data['data']['authorization_url']
+    CartOrder.objects.filter(pk=cart.pk).update(payment_reference=reference)
+    cart.lines.update(payment_reference=reference)
 
-    return Response({"payment_urls": payment_urls}, status=200)
+    return Response({
+        "cart_id": cart.id,
+        "order_ids": [order.id for order in orders],
+        "amount": float(cart.amount),
+        "payment_url": payment_url,
+        "reference": reference,
+        "skipped": skipped,
+        # Older clients walk a list of links — a cart now has exactly one
+        "payment_urls": [{
+            "order_id": orders[0].id,
+            "cart_id": cart.id,
+            "product_name": ", ".join(order.product.name for order in orders),
+            "amount": float(cart.amount),
+            "payment_url": payment_url,
+            "reference": reference,
+        }],
+    }, status=200)
 
 
 @api_view(["GET"])
@@ -872,85 +660,147 @@ def vendor_contact(request):
     })
 
 
+def filter_created_range(queryset, request):
+    """
+    Narrow `queryset` to ?start= / ?end= (YYYY-MM-DD, inclusive, local dates)
+    on created_at — as a plain range, so an index on created_at applies.
+    Returns None if either date can't be parsed.
+    """
+    bounds = {}
+    for param, lookup, shift in (('start', 'created_at__gte', 0), ('end', 'created_at__lt', 1)):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            return None
+        bounds[lookup] = timezone.make_aware(datetime.combine(day + timedelta(days=shift), time.min))
+    return queryset.filter(**bounds)
+
+
+class VendorSalesPagination(PageNumberPagination):
+    # One row per product, so plain pages are cheap; opt in with ?page= / ?page_size=
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+VENDOR_PRICE_FIELDS = {
+    'farmer': 'product__farmer_price',
+    'wholesaler': 'product__wholesaler_price',
+}
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def vendor_sales(request):
     """
     Returns a per-product sales summary for the authenticated vendor.
     Includes: product name, price, units sold, total revenue collected.
+
+    One grouped query over the vendor's completed orders.
+    Optional ?start= / ?end= (YYYY-MM-DD) limit it to orders placed in that
+    range. With ?page= or ?page_size= the response is paginated
+    ({count, next, previous, results, totals}); otherwise it is the plain list.
     """
     if request.user.role != 'vendor':
         return Response({"error": "Only vendors can access this endpoint."}, status=403)
 
-    from django.db.models import Sum
-
-    completed_orders = Order.objects.filter(
-        vendor=request.user,
-        status='completed'
-    ).select_related('product')
-
-    # Aggregate per product
-    product_ids = completed_orders.values_list('product_id', flat=True).distinct()
-    summary = []
-    for pid in product_ids:
-        orders_for_product = completed_orders.filter(product_id=pid)
-        first_order = orders_for_product.first()
-        product = first_order.product
-        total_qty = orders_for_product.aggregate(total=Sum('quantity'))['total'] or 0
-        total_revenue = orders_for_product.aggregate(total=Sum('vendor_amount'))['total'] or 0
-
-        vendor_type = request.user.vendor_type
-        if vendor_type == 'farmer':
-            price = float(product.farmer_price or 0)
-        elif vendor_type == 'wholesaler':
-            price = float(product.wholesaler_price or 0)
-        else:
-            price = float(product.retailer_price or 0)
-
-        summary.append({
-            'product_id': product.id,
-            'product_name': product.name,
-            'price': price,
-            'units_sold': total_qty,
-            'total_collected': float(total_revenue),
-            'is_farm_product': product.is_farm_product(),
-        })
+    completed_orders = filter_created_range(
+        Order.objects.filter(vendor=request.user, status='completed'), request
+    )
+    if completed_orders is None:
+        return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=400)
+
+    price_field = VENDOR_PRICE_FIELDS.get(request.user.vendor_type, 'product__retailer_price')
+    sales = (
+        completed_orders
+        .values('product_id', 'product__name', 'product__category__is_farm')
+        .annotate(
+            price=Coalesce(Max(price_field), Decimal('0')),
+            units_sold=Sum('quantity'),
+            total_collected=Sum('vendor_amount'),
+        )
+        .order_by('-total_collected', 'product_id')
+    )
+
+    def summarize(rows):
+        return [{
+            'product_id': row['product_id'],
+            'product_name': row['product__name'],
+            'price': float(row['price']),
+            'units_sold': row['units_sold'] or 0,
+            'total_collected': float(row['total_collected'] or 0),
+            'is_farm_product': bool(row['product__category__is_farm']),
+        } for row in rows]
+
+    if not {'page', 'page_size'} & set(request.query_params):
+        return Response(summarize(sales))
+
+    paginator = VendorSalesPagination()
+    page = paginator.paginate_queryset(sales, request)
+    response = paginator.get_paginated_response(summarize(page))
+    totals = completed_orders.aggregate(units_sold=Sum('quantity'), total_collected=Sum('vendor_amount'))
+    response.data['totals'] = {
+        'units_sold': totals['units_sold'] or 0,
+        'total_collected': float(totals['total_collected'] or 0),
+    }
+    return response
+
 
-    return Response(summary)
+# role -> (whose orders, my_earnings column, paid column)
+MY_ORDERS_SCOPES = {
+    'vendor': ('vendor', 'vendor_amount', 'vendor_paid'),
+    'affiliate': ('affiliate', 'affiliate_amount', 'affiliate_paid'),
+    # Affiliates registered with the 'user' role see their purchases, with the affiliate share
+    'user': ('buyer', 'affiliate_amount', 'affiliate_paid'),
+}
+BUYER_SCOPE = ('buyer', None, 'company_paid')
+ORDER_STATUSES = {value for value, _ in Order.PAYMENT_STATUS_CHOICES}
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def my_orders(request):
-    """Get user's orders based on role"""
-    user = request.user
-
-    if user.role == 'vendor':
-        orders = Order.objects.filter(vendor=user)
-    elif user.role == 'affiliate':
-        orders = Order.objects.filter(affiliate=user)
-    else:
-        orders = Order.objects.filter(buyer=user)
+    """
+    Get user's orders based on role, newest first.
 
-    orders_data = []
-    for order in orders:
-        orders_data.append({
-            "id": order.id,
-            "product": order.product.name,
-            "amount": float(order.amount),
-            "status": order.status,
-            "created_at": order.created_at,
-            "payment_url": None,
-            "my_earnings": float(
-                order.vendor_amount if user.role == 'vendor'
-                else order.affiliate_amount if user.role == 'user'
-                else 0
-            ),
-            "paid": (
-                order.vendor_paid if user.role == 'vendor'
-                else order.affiliate_paid if user.role == 'user'
-                else order.company_paid
-            )
-        })
+    Keyset pages on (created_at, id): ?cursor= / ?page_size= (see
+    globalconnect024/pagination.py). Optional ?status= and ?start= / ?end=
+    (YYYY-MM-DD) filters. Each role gets one values() query with only the
+    columns it shows, joined to the product name.
+    """
+    user = request.user
+    owner, earnings, paid = MY_ORDERS_SCOPES.get(user.role, BUYER_SCOPE)
+
+    orders = filter_created_range(Order.objects.filter(**{owner: user}), request)
+    if orders is None:
+        return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=400)
+    status_filter = request.query_params.get('status')
+    if status_filter:
+        if status_filter not in ORDER_STATUSES:
+            return Response({"error": f"status must be one of: {', '.join(sorted(ORDER_STATUSES))}."}, status=400)
+        orders = orders.filter(status=status_filter)
+
+    orders = orders.values(
+        'id', 'amount', 'status', 'created_at',
+        product_name=F('product__name'),
+        my_earnings=F(earnings) if earnings else Value(Decimal('0')),
+        paid=F(paid),
+    )
 
-    return Response(orders_data)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(orders, request)
+    return paginator.get_paginated_response([{
+        "id": row['id'],
+        "product": row['product_name'],
+        "amount": float(row['amount']),
+        "status": row['status'],
+        "created_at": row['created_at'],
+        "payment_url": None,
+        "my_earnings": float(row['my_earnings'] or 0),
+        "paid": row['paid'],
+    } for row in page])
@@ -0,0 +1,106 @@
+"""
+Durable, broker-free queue for provider webhooks.
+
+- The endpoints verify the signature, `enqueue()` the raw event and return
+  200 straight away, so Paystack never times out and retries while we send
+  emails. A redelivered event hits the unique key and is not queued again.
+- `manage.py process_webhook_events` is the worker. Each batch claims due
+  events with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run
+  side by side without handling the same event twice.
+- Every event runs in its own savepoint. A failure is rolled back alone and
+  retried with exponential backoff; after WEBHOOK_MAX_ATTEMPTS it is marked
+  failed (visible in the admin with its last error).
+- Handlers queue their emails/SMS in the notification outbox
+  (orders/outbox.py) inside that savepoint, so nothing is sent for work
+  that was rolled back.
+"""
+
+import hashlib
+import json
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import WebhookEvent
+
+# source -> handler(event dict)
+HANDLERS = {
+    'paystack_orders': 'orders.views.process_paystack_order_event',
+    'paystack_registration': 'users.views.process_paystack_registration_event',
+}
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+
+def paystack_event_id(event, payload):
+    """Paystack's transaction id (or reference) per event type; a hash of the body if it has neither."""
+    data = event.get('data') or {}
+    key = data.get('id') or data.get('reference')
+    if not key:
+        return hashlib.sha256(payload).hexdigest()
+    return f"{event.get('event')}:{key}"
+
+
+def enqueue(source, event, event_id):
+    """Store a verified event for the worker. Returns False if it was already received."""
+    _, created = WebhookEvent.objects.get_or_create(
+        source=source,
+        event_id=event_id,
+        defaults={'event_type': event.get('event') or '', 'payload': event},
+    )
+    if not created:
+        print(f"[WEBHOOK] Duplicate {source} event {event_id} ignored")
+    return created
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def process_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """Claim and handle up to `batch_size` due events. Returns how many were claimed."""
+    max_attempts = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for event in events:
+            event.attempts += 1
+            try:
+                with transaction.atomic():
+                    import_string(HANDLERS[event.source])(event.payload)
+            except Exception as e:
+                event.last_error = f"{e}\n{traceback.format_exc()}"[-4000:]
+                if event.attempts >= max_attempts:
+                    event.status = 'failed'
+                    print(f"[WEBHOOK] {event} gave up after {event.attempts} attempts: {e}")
+                else:
+                    event.next_attempt_at = now + backoff(event.attempts)
+                    print(f"[WEBHOOK] {event} attempt {event.attempts} failed, retrying at {event.next_attempt_at}: {e}")
+            else:
+                event.status = 'done'
+                event.processed_at = timezone.now()
+                event.last_error = ''
+        WebhookEvent.objects.bulk_update(
+            events, ['status', 'attempts', 'next_attempt_at', 'last_error', 'processed_at']
+        )
+    return len(events)
+
+
+def parse_payload(payload):
+    """The JSON body of a webhook, or None if it isn't a JSON object."""
+    try:
+        event = json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+    return event if isinstance(event, dict) else None
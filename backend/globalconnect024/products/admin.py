@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product
+from .models import Product, StockMovement
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -8,3 +8,22 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ['name', 'description', 'vendor__username']
     ordering = ['-created_at']
     list_editable = ['approved', 'is_active', 'stock']
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'kind', 'quantity', 'balance_after', 'reference', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['product__name', 'reference']
+    ordering = ['-created_at']
+    raw_id_fields = ['product']
+
+    # Append-only: the ledger is written by the stock paths, never by hand
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
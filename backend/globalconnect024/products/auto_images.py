@@ -0,0 +1,91 @@
+"""
+Fallback images for products that were uploaded without a photo.
+
+- The keyword → image table lives in data (products/data/auto_images.json, or
+  the file named by settings.PRODUCT_AUTO_IMAGE_TABLE), not in code. Entries
+  are checked in file order: the FIRST keyword that appears anywhere in the
+  product name wins.
+- All keywords are compiled once into a single lookahead alternation. At each
+  position the regex reports the highest-priority keyword starting there, so
+  the lowest table index over all positions is exactly the first-match result
+  of a linear scan — without rescanning the name once per keyword.
+- Results are memoised per normalised product name in a bounded LRU cache.
+- No match → a loremflickr photo tagged with the product (or category) name.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from urllib.parse import quote_plus
+
+from django.conf import settings
+
+DEFAULT_TABLE = os.path.join(os.path.dirname(__file__), 'data', 'auto_images.json')
+CACHE_SIZE = 4096
+FALLBACK_URL = 'https://loremflickr.com/400/400/{query}'
+
+_matcher = None
+
+
+class _KeywordMatcher:
+    def __init__(self, entries):
+        self.images = [entry['image'] for entry in entries]
+        keywords = [entry['keyword'].lower() for entry in entries]
+        self.priority = {}
+        for index, keyword in enumerate(keywords):
+            self.priority.setdefault(keyword, index)
+        alternation = '|'.join(re.escape(keyword) for keyword in keywords)
+        self.pattern = re.compile(f'(?=({alternation}))') if keywords else None
+
+    def match(self, text):
+        if not self.pattern:
+            return None
+        best = None
+        for found in self.pattern.finditer(text):
+            index = self.priority[found.group(1)]
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.images[best] if best is not None else None
+
+
+def load_table():
+    path = getattr(settings, 'PRODUCT_AUTO_IMAGE_TABLE', DEFAULT_TABLE)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_matcher():
+    global _matcher
+    if _matcher is None:
+        _matcher = _KeywordMatcher(load_table())
+    return _matcher
+
+
+def reload_table():
+    """Re-read the keyword table (e.g. after editing the JSON) and drop cached results."""
+    global _matcher
+    _matcher = None
+    _resolve.cache_clear()
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _resolve(name, category_name):
+    url = get_matcher().match(name)
+    if url:
+        return url
+    query = name or category_name or 'product'
+    return FALLBACK_URL.format(query=quote_plus(query))
+
+
+def auto_image_url(name, category_name=''):
+    """Image URL for a product without an upload, based on its name."""
+    name = normalize(name)
+    # The category only matters for the fallback query when there is no name
+    return _resolve(name, '' if name else normalize(category_name))
@@ -0,0 +1,292 @@
+"""
+Bulk product import for vendors and admins.
+
+    POST /api/products/bulk-import/   (multipart: file=<products.csv | .json | .jsonl>)
+
+- CSV columns: name, description, price, stock, category (+ vendor for admins,
+  as a user id or username). JSON is either an array of objects with the same
+  keys or JSON Lines (one object per line).
+- CSV and JSON Lines are read row by row from the uploaded file, so memory
+  stays flat no matter how large the upload is. A JSON array has to be parsed
+  whole — prefer CSV or JSON Lines for very large imports.
+- Rows are validated in batches of BATCH_SIZE. Categories, vendors and the
+  upstream tier caps (CommodityCap) are resolved with one query per batch
+  instead of several per row, the same tier rules
+  as Product.clean() are applied in memory, and valid rows are inserted with a
+  single bulk_create(). Search vectors are filled in with one UPDATE per
+  category in the batch, and the opening stock of every row goes into the
+  inventory ledger with one more bulk_create().
+- A bad row never blocks the rest: the response lists every failed row with
+  its errors. A JSON Lines line that isn't UTF-8 fails on its own; in a CSV,
+  undecodable bytes or a malformed record leave the reader with no safe place
+  to resume, so reading stops there with an error row and the rows before it
+  are still imported.
+"""
+
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from category.models import Category
+from .cache import invalidate_catalog
+from .models import (
+    CommodityCap, NextChangeSeq, Product, StockMovement, UPSTREAM_VENDOR_TYPE, listing_visibility,
+    normalize_commodity, product_search_vector, validate_listing,
+)
+
+BATCH_SIZE = 500
+# Keep the response bounded for files that are mostly broken
+MAX_REPORTED_ERRORS = 1000
+VENDOR_TYPES = ('farmer', 'wholesaler', 'retailer')
+PRICE_FIELDS = {'farmer': 'farmer_price', 'wholesaler': 'wholesaler_price', 'retailer': 'retailer_price'}
+
+
+class BulkImportError(Exception):
+    """The upload as a whole can't be read (bad format, bad encoding)."""
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0)
+    category = serializers.CharField(required=False, allow_blank=True, default='')
+    vendor = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate_price(self, value):
+        if not value:
+            raise serializers.ValidationError("Price must be greater than zero.")
+        return value
+
+
+def iter_rows(upload):
+    """Yield dict rows from an uploaded CSV / JSON / JSON Lines file."""
+    name = (upload.name or '').lower()
+    if name.endswith('.csv') or upload.content_type in ('text/csv', 'application/vnd.ms-excel'):
+        yield from _until_unreadable(csv.DictReader(_text_lines(upload)))
+        return
+
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        yield from _iter_json_lines(upload)
+        return
+
+    if name.endswith('.json') or upload.content_type == 'application/json':
+        try:
+            data = json.load(codecs.getreader('utf-8-sig')(upload))
+        except (ValueError, UnicodeError) as e:
+            raise BulkImportError(f"Invalid JSON file: {e}")
+        if not isinstance(data, list):
+            raise BulkImportError("JSON file must contain an array of products.")
+        yield from data
+        return
+
+    raise BulkImportError("Unsupported file type. Upload a .csv, .json or .jsonl file.")
+
+
+def _text_lines(upload):
+    """
+    Decode the upload one line at a time, so a bad byte is pinned to its own
+    line instead of taking a whole decoder chunk of good rows with it.
+    """
+    for number, line in enumerate(upload, start=1):
+        yield line.decode('utf-8-sig' if number == 1 else 'utf-8')
+
+
+def _until_unreadable(rows):
+    """Turn a decode / CSV error mid-stream into a final error row."""
+    try:
+        yield from rows
+    except UnicodeDecodeError as e:
+        yield {'__error__': f"Not valid UTF-8 ({e.reason}); save the file as UTF-8. "
+                            "Rows from here on were not read."}
+    except csv.Error as e:
+        yield {'__error__': f"Malformed CSV: {e}. Rows from here on were not read."}
+
+
+def _iter_json_lines(upload):
+    for number, line in enumerate(upload, start=1):
+        try:
+            line = line.decode('utf-8-sig' if number == 1 else 'utf-8').strip()
+        except UnicodeDecodeError as e:
+            # Lines are independent — report this one and carry on
+            yield {'__error__': f"Not valid UTF-8 ({e.reason}); save the file as UTF-8."}
+            continue
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {'__error__': f"Invalid JSON: {e}"}
+
+
+class ProductImporter:
+    """
+    Validates and inserts rows for `user`. Vendors import for themselves;
+    admins must name the vendor of every row.
+    """
+
+    def __init__(self, user, batch_size=BATCH_SIZE):
+        self.user = user
+        self.is_admin = user.role == 'admin' or user.is_superuser
+        self.batch_size = batch_size
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        # Lookups are remembered across batches — most files reuse a handful of each
+        self._categories = {}
+        self._vendors = {}
+
+    def run(self, rows):
+        rows = enumerate(rows, start=1)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+        # Rows fail at different stages of a batch — report them in file order
+        self.errors.sort(key=lambda error: error['row'])
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+    def import_batch(self, batch):
+        parsed = []
+        for row_number, row in batch:
+            if not isinstance(row, dict) or '__error__' in row:
+                message = row.get('__error__') if isinstance(row, dict) else "Row must be an object."
+                self.fail(row_number, {'non_field_errors': [message]})
+                continue
+            serializer = ProductImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                self.fail(row_number, serializer.errors)
+                continue
+            parsed.append((row_number, serializer.validated_data))
+
+        self.load_categories(data['category'] for _, data in parsed)
+        if self.is_admin:
+            self.load_vendors(data['vendor'] for _, data in parsed)
+
+        candidates = []
+        for row_number, data in parsed:
+            try:
+                candidates.append((row_number, self.build_product(data)))
+            except ValidationError as e:
+                self.fail(row_number, {'non_field_errors': e.messages})
+
+        caps = self.load_upstream_caps(product for _, product in candidates)
+        products = []
+        for row_number, product in candidates:
+            vendor_type = product.vendor.vendor_type
+            is_farm = product.is_farm_product()
+            upstream_max = caps.get((vendor_type, product.commodity)) if is_farm else None
+            try:
+                validate_listing(vendor_type, is_farm, product.quantity_kg, product.stock, upstream_max)
+            except ValidationError as e:
+                self.fail(row_number, {'non_field_errors': e.messages})
+                continue
+            product.visible_to = listing_visibility(vendor_type, is_farm)
+            products.append(product)
+
+        if products:
+            self.insert(products)
+
+    def build_product(self, data):
+        vendor = self.user
+        if self.is_admin:
+            vendor = self._vendors.get(data['vendor'])
+            if vendor is None:
+                raise ValidationError("Unknown vendor." if data['vendor'] else "Vendor is required for admin imports.")
+
+        vendor_type = vendor.vendor_type
+        if vendor_type not in VENDOR_TYPES:
+            raise ValidationError("Invalid vendor type.")
+
+        category = None
+        if data['category']:
+            category = self._categories.get(data['category'])
+            if category is None:
+                raise ValidationError(f"Unknown category '{data['category']}'.")
+
+        # Same price / stock mapping as ProductSerializer.validate
+        prices = {field: 0 for field in PRICE_FIELDS.values()}
+        prices[PRICE_FIELDS[vendor_type]] = data['price']
+
+        return Product(
+            vendor=vendor,
+            name=data['name'],
+            commodity=normalize_commodity(data['name']),
+            description=data['description'],
+            category=category,
+            quantity_kg=data['stock'],
+            stock=data['stock'],
+            approved=True,  # Auto-approve, as for single creates
+            **prices,
+        )
+
+    def load_categories(self, names):
+        missing = {name for name in names if name and name not in self._categories}
+        if missing:
+            for category in Category.objects.filter(name__in=missing):
+                self._categories[category.name] = category
+
+    def load_vendors(self, references):
+        missing = {ref for ref in references if ref and ref not in self._vendors}
+        if not missing:
+            return
+        ids = {ref for ref in missing if ref.isdigit()}
+        vendors = get_user_model().objects.filter(Q(username__in=missing) | Q(pk__in=ids), role='vendor')
+        for vendor in vendors:
+            self._vendors[vendor.username] = vendor
+            self._vendors[str(vendor.pk)] = vendor
+
+    def load_upstream_caps(self, products):
+        """
+        {(vendor_type, commodity): upstream tier cap} for every farm product
+        in the batch — one CommodityCap query per tier.
+        """
+        commodities_by_tier = {}
+        for product in products:
+            vendor_type = product.vendor.vendor_type
+            if vendor_type in UPSTREAM_VENDOR_TYPE and product.is_farm_product():
+                commodities_by_tier.setdefault(vendor_type, set()).add(product.commodity)
+
+        caps = {}
+        for vendor_type, commodities in commodities_by_tier.items():
+            for commodity, cap in CommodityCap.upstream_caps(commodities, vendor_type).items():
+                caps[(vendor_type, commodity)] = cap
+        return caps
+
+    def insert(self, products):
+        with transaction.atomic():
+            created = Product.objects.bulk_create(products)
+            ids_by_category = {}
+            for product in created:
+                ids_by_category.setdefault(product.category, []).append(product.pk)
+            # bulk_create skips save(), so fill the search vectors and change sequence here
+            for category, ids in ids_by_category.items():
+                Product.objects.filter(pk__in=ids).update(
+                    search_vector=product_search_vector(category.name if category else ''),
+                    change_seq=NextChangeSeq(),
+                )
+            StockMovement.objects.bulk_create([
+                StockMovement(product=product, kind='receipt', quantity=product.stock,
+                              balance_after=product.stock, reference='import')
+                for product in created if product.stock
+            ])
+            CommodityCap.track((None, product.cap_entry()) for product in created)
+            invalidate_catalog(*{product.visible_to for product in created})
+        self.created += len(created)
+
+    def fail(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
@@ -0,0 +1,115 @@
+"""
+Server-side cache for public catalog list pages.
+
+- Every non-vendor caller in the same visibility tier (public, affiliate,
+  wholesaler, retailer, admin) gets the same list response, so rendered pages
+  are cached per tier + full request URL. Vendors see only their own products
+  and are never cached.
+- Each tier has a version number in the cache. Page keys embed the current
+  version, so invalidating a tier is a single counter bump — stale pages are
+  simply never read again and age out on their TTL.
+- Invalidation runs on commit: Product save/delete, new ratings, stock
+  changes and category renames bump the tiers that can see the product.
+- Cached entries keep the ETag / Last-Modified of the rendered response, so a
+  cache hit can still answer conditional GETs with 304 without touching the DB.
+- Works with any Django cache backend. With the per-process local-memory
+  backend other workers only notice an invalidation after CATALOG_CACHE_TIMEOUT;
+  use the file or database backend (CACHE_URL) for cross-worker invalidation.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from globalconnect024.conditional import stamp_validators
+
+TIERS = ('public', 'affiliate', 'wholesaler', 'retailer', 'admin')
+# Tiers that see every product regardless of visible_to
+ALL_PRODUCT_TIERS = ('public', 'affiliate', 'admin')
+# visible_to value -> the role-specific tier restricted to it
+VISIBLE_TO_TIERS = {'wholesaler': 'wholesaler', 'retailer': 'retailer'}
+
+
+def _cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def _version_key(tier):
+    return f'catalog:version:{tier}'
+
+
+def tier_version(tier):
+    cache = _cache()
+    key = _version_key(tier)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version evicted from the cache never
+        # comes back as a number that old page keys were built with
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump(tiers):
+    cache = _cache()
+    for tier in tiers:
+        try:
+            cache.incr(_version_key(tier))
+        except ValueError:
+            cache.set(_version_key(tier), int(time.time() * 1000), timeout=None)
+
+
+def invalidate_catalog(*visible_to):
+    """
+    Drop cached pages for every tier that can see a product with any of the
+    given visible_to values. With no arguments, every tier is invalidated.
+    """
+    if visible_to:
+        tiers = set(ALL_PRODUCT_TIERS)
+        tiers.update(VISIBLE_TO_TIERS[v] for v in visible_to if v in VISIBLE_TO_TIERS)
+    else:
+        tiers = set(TIERS)
+    transaction.on_commit(lambda: _bump(sorted(tiers)))
+
+
+def page_key(tier, request):
+    url = request.build_absolute_uri()
+    digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return f'catalog:page:{tier}:{tier_version(tier)}:{digest}'
+
+
+def cached_catalog_page(request, tier, render):
+    """
+    Serve a list page for `tier` from the cache, or call `render()` and store
+    its data and validators. Conditional GETs are answered on hits too.
+    """
+    cache = _cache()
+    key = page_key(tier, request)
+    entry = cache.get(key)
+
+    if entry is None:
+        response = render()
+        if response.status_code == 200:
+            cache.set(key, {
+                'data': response.data,
+                'etag': response.get('ETag'),
+                'last_modified': response.get('Last-Modified'),
+            }, _timeout())
+        return response
+
+    last_modified_ts = parse_http_date_safe(entry['last_modified']) if entry['last_modified'] else None
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=last_modified_ts)
+    if response is None:
+        response = Response(entry['data'])
+    return stamp_validators(response, entry['etag'], last_modified_ts)
@@ -0,0 +1,146 @@
+"""
+Incremental catalog change feed for clients that keep a local copy.
+
+    GET /api/products/changes/?since=<seq>&limit=200
+
+Every product write stamps Product.change_seq with the id of its
+transaction, and every delete leaves a ProductTombstone stamped the same
+way, so all changes share one total order. Start with since=0 (or an ISO
+timestamp), then keep passing back `next_since`.
+
+- {"op": "upsert", "seq", "id", "product": {...}} — created or changed
+- {"op": "delete", "seq", "id", "reason": ...} — tombstone; reason is
+  "deleted", "deactivated" (is_active turned off) or "hidden" (no longer
+  visible to the caller, e.g. moved to another tier)
+- A product changed several times appears once, at its latest sequence.
+- The feed only reaches up to the oldest transaction still running
+  (pg_snapshot_xmin): a transaction's id is taken before it commits, so a
+  slower transaction could otherwise commit a LOWER value after a client has
+  already moved past it. Transactions of any length are safe; a long one
+  (a bulk import batch, a webhook batch) only delays the changes after it.
+- The changes of one transaction share a sequence value and are never split
+  across pages, so a page can run past `limit` by the rest of one transaction.
+"""
+
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Product, ProductTombstone
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+
+
+def parse_since(value):
+    """
+    Sequence number to resume after. Accepts a sequence number or an ISO
+    timestamp (changes after that moment); returns None if unparseable.
+    """
+    value = (value or '0').strip()
+    if value.isdigit():
+        return int(value)
+    moment = parse_datetime(value)
+    if moment is None:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    first = min(
+        (seq for seq in (
+            Product.objects.filter(updated_at__gt=moment).aggregate(seq=Min('change_seq'))['seq'],
+            ProductTombstone.objects.filter(deleted_at__gt=moment).aggregate(seq=Min('change_seq'))['seq'],
+        ) if seq is not None),
+        default=None,
+    )
+    if first is None:
+        return latest_settled_seq()
+    return first - 1
+
+
+def settle_horizon():
+    """
+    Id of the oldest transaction still running — every change below it is
+    committed (or rolled back) for good. None where there is a single writer.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+        return cursor.fetchone()[0]
+
+
+def latest_settled_seq():
+    horizon = settle_horizon()
+    products = Product.objects.all()
+    tombstones = ProductTombstone.objects.all()
+    if horizon is not None:
+        products = products.filter(change_seq__lt=horizon)
+        tombstones = tombstones.filter(change_seq__lt=horizon)
+    latest = [
+        products.order_by('-change_seq').values_list('change_seq', flat=True).first(),
+        tombstones.order_by('-change_seq').values_list('change_seq', flat=True).first(),
+    ]
+    return max((seq for seq in latest if seq is not None), default=0)
+
+
+def _events(products, tombstones, count=None):
+    """Product rows and tombstones merged in sequence order, at most `count` of each."""
+    changed = products.order_by('change_seq', 'id').values('id', 'change_seq', 'is_active')
+    removed = tombstones.order_by('change_seq', 'id').values('product_id', 'change_seq')
+    if count is not None:
+        changed, removed = changed[:count], removed[:count]
+    return sorted(
+        [('product', row['change_seq'], row) for row in changed]
+        + [('tombstone', row['change_seq'], row) for row in removed],
+        key=lambda event: event[1],
+    )
+
+
+def change_feed(since, limit, visible, serialize):
+    """
+    Changes after `since`, oldest first. `visible` is the caller's scoped
+    product queryset; `serialize(products)` renders the upserted rows.
+    """
+    horizon = settle_horizon()
+
+    products = Product.objects.filter(change_seq__gt=since)
+    tombstones = ProductTombstone.objects.filter(change_seq__gt=since)
+    if horizon is not None:
+        products = products.filter(change_seq__lt=horizon)
+        tombstones = tombstones.filter(change_seq__lt=horizon)
+
+    # Take `limit + 1` from each stream and merge — enough to know if there's more
+    events = _events(products, tombstones, limit + 1)
+    has_more = len(events) > limit
+    if has_more:
+        # Cut after the whole transaction of the last row, so next_since never lands inside one
+        last = events[limit - 1][1]
+        events = [event for event in events if event[1] < last] + _events(
+            products.filter(change_seq=last), tombstones.filter(change_seq=last)
+        )
+        has_more = (products.filter(change_seq__gt=last).exists()
+                    or tombstones.filter(change_seq__gt=last).exists())
+
+    ids = [row['id'] for kind, _, row in events if kind == 'product' and row['is_active']]
+    payloads = {}
+    if ids:
+        rows = list(visible.filter(pk__in=ids))
+        payloads = {product.pk: data for product, data in zip(rows, serialize(rows))}
+
+    changes = []
+    for kind, seq, row in events:
+        if kind == 'tombstone':
+            changes.append({'op': 'delete', 'seq': seq, 'id': row['product_id'], 'reason': 'deleted'})
+        elif not row['is_active']:
+            changes.append({'op': 'delete', 'seq': seq, 'id': row['id'], 'reason': 'deactivated'})
+        elif row['id'] in payloads:
+            changes.append({'op': 'upsert', 'seq': seq, 'id': row['id'], 'product': payloads[row['id']]})
+        else:
+            changes.append({'op': 'delete', 'seq': seq, 'id': row['id'], 'reason': 'hidden'})
+
+    return {
+        'changes': changes,
+        'next_since': changes[-1]['seq'] if changes else since,
+        'has_more': has_more,
+    }
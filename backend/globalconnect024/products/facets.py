@@ -0,0 +1,138 @@
+"""
+Faceted filtering for the product catalog.
+
+    GET /api/products/facets/?category=3,7&vendor_type=farmer&price_band=100-500&county=Nakuru
+
+Facets: category, vendor_type, visible_to, price_band and county (the
+vendor's city/county). Several values of one facet are OR-ed; different
+facets are AND-ed.
+
+Counts are disjunctive: the counts of a facet apply every OTHER selected
+facet but not its own, so the UI can offer "Vegetables (312)" next to the
+category that is already ticked.
+
+- vendor_type, visible_to and price_band have a fixed set of values, so all of
+  their counts come from ONE aggregate query using conditional Count(filter=...).
+- category and county are open-ended and get one GROUP BY query each.
+That is three queries no matter how many facet values exist.
+"""
+
+from django.db.models import Count, Q
+
+FACET_LIMIT = 50
+VENDOR_TYPES = (('farmer', 'Farmer'), ('wholesaler', 'Wholesaler'), ('retailer', 'Retailer'))
+VISIBILITY = (('wholesaler', 'Wholesaler'), ('retailer', 'Retailer'), ('consumers', 'Consumers'))
+# (label, min inclusive, max exclusive) in KES, on the stored effective_price
+PRICE_BANDS = (
+    ('0-100', 0, 100),
+    ('100-500', 100, 500),
+    ('500-1000', 500, 1000),
+    ('1000-5000', 1000, 5000),
+    ('5000+', 5000, None),
+)
+
+
+def price_band_q(label):
+    for band, low, high in PRICE_BANDS:
+        if band == label:
+            q = Q(effective_price__gte=low)
+            if high is not None:
+                q &= Q(effective_price__lt=high)
+            return q
+    return None
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+class ProductFacets:
+    """Parses the facet selection from query params and computes filters and counts."""
+
+    dimensions = ('category', 'vendor_type', 'visible_to', 'price_band', 'county')
+
+    def __init__(self, params):
+        self.selected = {dim: _split(params.get(dim)) for dim in self.dimensions}
+
+    def dimension_q(self, dim):
+        values = self.selected[dim]
+        if not values:
+            return Q()
+        if dim == 'category':
+            ids = [v for v in values if v.isdigit()]
+            names = [v for v in values if not v.isdigit()]
+            return Q(category_id__in=ids) | Q(category__name__in=names)
+        if dim == 'vendor_type':
+            return Q(vendor__vendor_type__in=values)
+        if dim == 'visible_to':
+            return Q(visible_to__in=values)
+        if dim == 'county':
+            return Q(vendor__city__in=values)
+        q = Q()
+        for label in values:
+            band = price_band_q(label)
+            if band is not None:
+                q |= band
+        return q
+
+    def filter_q(self, exclude=None):
+        q = Q()
+        for dim in self.dimensions:
+            if dim != exclude:
+                q &= self.dimension_q(dim)
+        return q
+
+    def apply(self, queryset):
+        return queryset.filter(self.filter_q())
+
+    def counts(self, queryset):
+        """Facet counts over `queryset` (role-scoped and list-filtered, but not facet-filtered)."""
+        queryset = queryset.order_by()
+        facets = self.fixed_counts(queryset)
+        facets['category'] = [
+            {'value': row['category'], 'label': row['category__name'], 'count': row['count']}
+            for row in (
+                queryset.filter(self.filter_q('category'), category__isnull=False)
+                .values('category', 'category__name')
+                .annotate(count=Count('pk'))
+                .order_by('-count', 'category__name')[:FACET_LIMIT]
+            )
+        ]
+        facets['county'] = [
+            {'value': row['vendor__city'], 'label': row['vendor__city'], 'count': row['count']}
+            for row in (
+                queryset.filter(self.filter_q('county')).exclude(vendor__city__isnull=True).exclude(vendor__city='')
+                .values('vendor__city')
+                .annotate(count=Count('pk'))
+                .order_by('-count', 'vendor__city')[:FACET_LIMIT]
+            )
+        ]
+        return facets
+
+    def fixed_counts(self, queryset):
+        aggregates = {}
+        for value, _ in VENDOR_TYPES:
+            aggregates[f'vendor_type_{value}'] = Count(
+                'pk', filter=self.filter_q('vendor_type') & Q(vendor__vendor_type=value))
+        for value, _ in VISIBILITY:
+            aggregates[f'visible_to_{value}'] = Count(
+                'pk', filter=self.filter_q('visible_to') & Q(visible_to=value))
+        for i, (label, _, _) in enumerate(PRICE_BANDS):
+            aggregates[f'price_band_{i}'] = Count(
+                'pk', filter=self.filter_q('price_band') & price_band_q(label))
+
+        totals = queryset.aggregate(**aggregates)
+        return {
+            'vendor_type': [
+                {'value': value, 'label': label, 'count': totals[f'vendor_type_{value}']}
+                for value, label in VENDOR_TYPES
+            ],
+            'visible_to': [
+                {'value': value, 'label': label, 'count': totals[f'visible_to_{value}']}
+                for value, label in VISIBILITY
+            ],
+            'price_band': [
+                {'value': label, 'label': label, 'count': totals[f'price_band_{i}']}
+                for i, (label, _, _) in enumerate(PRICE_BANDS)
+            ],
+        }
@@ -0,0 +1,28 @@
+import django_filters
+from rest_framework import filters
+
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """?stock=&approved= plus a price range on the stored effective price."""
+    min_price = django_filters.NumberFilter(field_name='effective_price', lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name='effective_price', lookup_expr='lte')
+
+    class Meta:
+        model = Product
+        fields = ['stock', 'approved']
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that maps public names to columns, e.g. ?ordering=-price → -effective_price."""
+    aliases = {'price': 'effective_price'}
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        return [
+            ('-' if term.startswith('-') else '') + self.aliases.get(term.lstrip('-'), term.lstrip('-'))
+            for term in ordering
+        ]
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from PIL import Image
+
+from globalconnect024.image_variants import is_current, pending, process_instance
+from products.models import Product
+from services.models import Service
+
+MODELS = {'products': Product, 'services': Service}
+
+
+class Command(BaseCommand):
+    help = ("Generate resized WebP/JPEG variants for product and service images. With --watch, "
+            "keep rendering newly uploaded images until stopped (run one watcher).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODELS), help="Only process one model (default: all).")
+        parser.add_argument('--force', action='store_true', help="Rebuild variants that are already up to date.")
+        parser.add_argument('--watch', action='store_true',
+                            help="Process pending uploads as they arrive instead of a one-off backfill.")
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help="Pending rows taken per round with --watch (default 50).")
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help="Seconds to wait when nothing is pending with --watch (default 2).")
+
+    def handle(self, *args, **options):
+        names = [options['model']] if options['model'] else sorted(MODELS)
+        if options['watch']:
+            self.watch(names, options)
+        else:
+            self.backfill(names, options)
+
+    def backfill(self, names, options):
+        for name in names:
+            model = MODELS[name]
+            rows = model.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image', 'image_variants')
+            done = skipped = failed = 0
+            for instance in rows.iterator(chunk_size=200):
+                if not options['force'] and is_current(instance.image, instance.image_variants):
+                    skipped += 1
+                    continue
+                if self.process(model, instance.pk):
+                    done += 1
+                else:
+                    failed += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {done} processed, {skipped} already up to date, {failed} failed"
+            ))
+
+    def watch(self, names, options):
+        while True:
+            close_old_connections()
+            backlog = False
+            for name in names:
+                model = MODELS[name]
+                pks = list(pending(model).order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+                for pk in pks:
+                    self.process(model, pk)
+                # A row that raised stays pending; only a full batch means more is waiting
+                backlog = backlog or len(pks) >= options['batch_size']
+            if not backlog:
+                time.sleep(options['sleep'])
+
+    def process(self, model, pk):
+        # One bad upload must never stop the run
+        try:
+            return process_instance(model, pk) is not None
+        except Image.DecompressionBombError as e:
+            print(f"[IMAGES] Skipped {model.__name__} {pk}, image too large: {e}")
+        except Exception as e:
+            print(f"[IMAGES] Failed to build variants for {model.__name__} {pk}: {e}")
+        return False
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+def backfill_search_vectors(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Category = apps.get_model('category', 'Category')
+
+    def vector(category_name):
+        return (
+            SearchVector('name', weight='A', config='english')
+            + SearchVector(Value(category_name), weight='B', config='english')
+            + SearchVector('description', weight='C', config='english')
+        )
+
+    # One UPDATE per category (the category name is constant within it)
+    for category in Category.objects.all():
+        Product.objects.filter(category=category).update(search_vector=vector(category.name))
+    Product.objects.filter(category__isnull=True).update(search_vector=vector(''))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_alter_category_vendor'),
+        ('products', '0013_productratingsummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
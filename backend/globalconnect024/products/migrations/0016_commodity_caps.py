@@ -0,0 +1,59 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:55
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_commodity_caps(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    CommodityCap = apps.get_model('products', 'CommodityCap')
+
+    batch = []
+    for product in Product.objects.only('id', 'name').iterator(chunk_size=1000):
+        product.commodity = ' '.join((product.name or '').lower().split())
+        batch.append(product)
+        if len(batch) >= 1000:
+            Product.objects.bulk_update(batch, ['commodity'])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['commodity'])
+
+    maxima = (
+        Product.objects
+        .filter(vendor__vendor_type__in=['farmer', 'wholesaler'])
+        .values('commodity', 'vendor__vendor_type')
+        .annotate(max_qty=Max('quantity_kg'))
+    )
+    CommodityCap.objects.bulk_create([
+        CommodityCap(commodity=row['commodity'], vendor_type=row['vendor__vendor_type'], max_quantity_kg=row['max_qty'])
+        for row in maxima
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='commodity',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='CommodityCap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commodity', models.CharField(max_length=255)),
+                ('vendor_type', models.CharField(max_length=20)),
+                ('max_quantity_kg', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('commodity', 'vendor_type'), name='unique_commodity_cap')],
+            },
+        ),
+        migrations.RunPython(backfill_commodity_caps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_alter_category_vendor'),
+        ('products', '0017_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['visible_to', 'category'], name='product_visible_category_idx'),
+        ),
+    ]
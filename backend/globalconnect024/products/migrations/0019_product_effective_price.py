@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_alter_category_vendor'),
+        ('products', '0018_product_facet_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(retailer_price__gt=0, then=models.F('retailer_price')), models.When(then=models.F('wholesaler_price'), wholesaler_price__gt=0), models.When(farmer_price__gt=0, then=models.F('farmer_price')), default=models.Value(0), output_field=models.DecimalField(decimal_places=2, max_digits=10)), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='product_effective_price_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0003_alter_category_vendor'),
+        ('products', '0019_product_effective_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE SEQUENCE IF NOT EXISTS products_change_seq",
+            "DROP SEQUENCE IF EXISTS products_change_seq",
+        ),
+        migrations.CreateModel(
+            name='ProductTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('visible_to', models.CharField(max_length=20)),
+                ('change_seq', models.BigIntegerField(db_index=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+        ),
+        # Existing products enter the feed in the order they were last changed
+        migrations.RunSQL(
+            """
+            UPDATE products_product AS p
+            SET change_seq = ordered.seq
+            FROM (
+                SELECT id, nextval('products_change_seq') AS seq
+                FROM (SELECT id FROM products_product ORDER BY updated_at, id) AS by_time
+            ) AS ordered
+            WHERE p.id = ordered.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def open_ledger(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    StockMovement = apps.get_model('products', 'StockMovement')
+
+    # The webhook used to count farm products in quantity_kg and the rest in
+    # stock; settle each product on the column that was authoritative for it
+    Product.objects.filter(category__is_farm=True).update(stock=F('quantity_kg'))
+    Product.objects.exclude(category__is_farm=True).update(quantity_kg=F('stock'))
+
+    StockMovement.objects.bulk_create((
+        StockMovement(product_id=pk, kind='receipt', quantity=stock, balance_after=stock, reference='opening balance')
+        for pk, stock in Product.objects.filter(stock__gt=0).values_list('pk', 'stock').iterator(chunk_size=1000)
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0004_category_is_farm'),
+        ('products', '0020_product_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('sale', 'Sale'), ('reservation', 'Reservation'), ('release', 'Release'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('balance_after', models.PositiveIntegerField()),
+                ('reference', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-created_at'], name='stock_movement_history_idx'), models.Index(fields=['kind', 'created_at'], name='stock_movement_kind_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
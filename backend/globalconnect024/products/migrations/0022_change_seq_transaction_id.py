@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_stock_ledger'),
+    ]
+
+    operations = [
+        # Change-feed positions become the id of the writing transaction (see
+        # NextChangeSeq). Existing rows move to this migration's transaction;
+        # cursors handed out from the old sequence are not comparable, so
+        # clients holding one resync from since=0.
+        migrations.RunSQL(
+            """
+            UPDATE products_product SET change_seq = pg_current_xact_id()::text::bigint;
+            UPDATE products_producttombstone SET change_seq = pg_current_xact_id()::text::bigint;
+            DROP SEQUENCE IF EXISTS products_change_seq;
+            """,
+            """
+            CREATE SEQUENCE IF NOT EXISTS products_change_seq;
+            SELECT setval('products_change_seq', GREATEST(
+                (SELECT COALESCE(MAX(change_seq), 0) FROM products_product),
+                (SELECT COALESCE(MAX(change_seq), 0) FROM products_producttombstone),
+                1
+            ));
+            """,
+        ),
+    ]
@@ -1,8 +1,107 @@
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import Max
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from category.models import Category
+from globalconnect024.image_variants import queue_variants
+from .cache import invalidate_catalog
+
+# Text search configuration used both for the stored vector and for queries
+SEARCH_CONFIG = 'english'
+
+
+def product_search_vector(category_name):
+    """
+    Weighted tsvector expression for a product row: name (A), category (B),
+    description (C). The category name is passed in as a value because
+    UPDATE statements can't reference joined columns.
+    """
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(category_name or ''), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+# Minimum lot size per vendor tier for farm produce
+MIN_QUANTITY_KG = {'farmer': 600, 'wholesaler': 300, 'retailer': 100}
+# Each tier buys from the one before it and can't list more than it sells
+UPSTREAM_VENDOR_TYPE = {'wholesaler': 'farmer', 'retailer': 'wholesaler'}
+# Tiers whose largest listing per commodity caps the tier below
+CAPPED_VENDOR_TYPES = tuple(UPSTREAM_VENDOR_TYPE.values())
+# Who sees a farm product listed by each tier
+FARM_VISIBILITY = {'farmer': 'wholesaler', 'wholesaler': 'retailer', 'retailer': 'consumers'}
+
+
+def normalize_commodity(name):
+    """'  White  Maize' and 'white maize' are the same commodity."""
+    return ' '.join((name or '').lower().split())
+
+
+def listing_visibility(vendor_type, is_farm_category):
+    """visible_to for a new listing: farm produce moves one tier down the chain."""
+    if is_farm_category:
+        return FARM_VISIBILITY.get(vendor_type, 'consumers')
+    return 'consumers'
+
+
+def validate_listing(vendor_type, is_farm_category, quantity_kg, stock, upstream_max=None):
+    """
+    Tier rules shared by Product.clean() and the bulk importer. `upstream_max`
+    is the largest quantity the upstream tier lists under the same name.
+    """
+    if is_farm_category:
+        #farmer
+        if vendor_type == 'farmer':
+            if quantity_kg < MIN_QUANTITY_KG['farmer']:
+                raise ValidationError("Farmers must sell at least 600 kg.")
+
+        #wholesaler
+        elif vendor_type == 'wholesaler':
+            if quantity_kg < MIN_QUANTITY_KG['wholesaler']:
+                raise ValidationError("Wholesalers must sell at least 300 kg.")
+            if upstream_max and quantity_kg > upstream_max:
+                raise ValidationError("Wholesaler quantity cannot exceed the maximum quantity sold by farmers.")
+        #retailer
+        elif vendor_type == 'retailer':
+            if quantity_kg < MIN_QUANTITY_KG['retailer']:
+                raise ValidationError("Retailers must sell at least 100 kg.")
+            if upstream_max and quantity_kg > upstream_max:
+                raise ValidationError("Retailer quantity cannot exceed the maximum quantity sold by wholesalers.")
+
+    else:
+        if stock < 0:
+            raise ValidationError("Stock cannot be negative.")
+
+
+class NextChangeSeq(models.Expression):
+    """
+    Change-feed position of a write — every write to a product (and every
+    delete tombstone) takes one, giving the change feed a total order.
+
+    On PostgreSQL it is the id of the writing transaction, so all writes of
+    one transaction share it and the feed can tell finished transactions
+    from running ones (products/changes.py).
+    """
+    output_field = models.BigIntegerField()
+
+    def as_sql(self, compiler, connection):
+        # Single-writer databases (local sqlite): one past the largest value in use
+        return (
+            "(SELECT COALESCE(MAX(seq), 0) + 1 FROM ("
+            "SELECT MAX(change_seq) AS seq FROM products_product "
+            "UNION ALL SELECT MAX(change_seq) FROM products_producttombstone) AS change_seqs)"
+        ), []
+
+    def as_postgresql(self, compiler, connection):
+        return "pg_current_xact_id()::text::bigint", []
 
 
 class Product(models.Model):
@@ -18,67 +117,152 @@ class Product(models.Model):
     farmer_price = models.DecimalField(max_digits=10, decimal_places=2,null=True, blank=True)
     wholesaler_price = models.DecimalField(max_digits=10, decimal_places=2,null=True, blank=True)
     retailer_price = models.DecimalField(max_digits=10, decimal_places=2,null=True, blank=True)
+    # The price buyers pay: first non-zero of retailer → wholesaler → farmer (0 = not set).
+    # Computed and stored by the database so the catalog can sort and range-filter on it.
+    effective_price = models.GeneratedField(
+        expression=models.Case(
+            models.When(retailer_price__gt=0, then=F('retailer_price')),
+            models.When(wholesaler_price__gt=0, then=F('wholesaler_price')),
+            models.When(farmer_price__gt=0, then=F('farmer_price')),
+            default=Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # Resized WebP/JPEG renditions of `image` (globalconnect024/image_variants.py)
+    image_variants = models.JSONField(null=True, blank=True, editable=False)
     stock = models.PositiveIntegerField(default=0)
     visible_to = models.CharField(max_length=20, choices=VISIBILITY_CHOICES, default='consumers')
+    # Normalized name, the key for the tier quantity caps (CommodityCap)
+    commodity = models.CharField(max_length=255, blank=True, editable=False, db_index=True)
 
     approved = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Stored full-text vector for /products/search/, refreshed on every save
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Position in the catalog change feed (/products/changes/), bumped on every write
+    change_seq = models.BigIntegerField(default=0, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_gin'),
+            # Facet counts and tier-scoped listings group by category within a tier
+            models.Index(fields=['visible_to', 'category'], name='product_visible_category_idx'),
+            # ?ordering=price keyset pages and ?min_price/?max_price ranges
+            models.Index(fields=['effective_price', 'id'], name='product_effective_price_idx'),
+            # Change feed ?since=<timestamp>: recent writes by time
+            models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the tier the row was cached under, in case save() moves it
+        instance._loaded_visible_to = instance.__dict__.get('visible_to')
+        instance._loaded_commodity = instance.__dict__.get('commodity')
+        instance._loaded_stock = instance.__dict__.get('stock')
+        instance._loaded_quantity_kg = instance.__dict__.get('quantity_kg')
+        instance._loaded_vendor_id = instance.__dict__.get('vendor_id')
+        return instance
 
     def clean(self):
         vendor_type = self.vendor.vendor_type
+        is_farm_category = self.is_farm_product()
 
-        FARM_CATEGORIES = ['farm products', 'food & grocery', 'agricultural']
+        upstream_max = None
+        if is_farm_category and vendor_type in UPSTREAM_VENDOR_TYPE:
+            upstream_max = CommodityCap.upstream_max(normalize_commodity(self.name), vendor_type)
 
-        category_name = self.category.name.lower() if self.category else ''
-        is_farm_category = any(cat in category_name for cat in FARM_CATEGORIES)
-
-        if is_farm_category:
-            #farmer
-            if vendor_type == 'farmer':
-                if self.quantity_kg <600:
-                    raise ValidationError("Farmers must sell at least 600 kg.")
-            
-        #wholesaler
-            elif vendor_type == 'wholesaler':
-                if self.quantity_kg < 300:
-                    raise ValidationError("Wholesalers must sell at least 300 kg.")
-                max_farmer_qty = Product.objects.filter(name=self.name,vendor__vendor__type='farmer').aggregate(Max('quantity_kg'))['quantity_kg__max'] 
-                if max_farmer_qty and self.quantity_kg > max_farmer_qty:
-                    raise ValidationError("Wholesaler quantity cannot exceed the maximum quantity sold by farmers.")
-        #retailer
-            elif vendor_type == 'retailer':
-                if self.quantity_kg < 100:
-                    raise ValidationError("Retailers must sell at least 100 kg.")
-                max_wholesaler_qty = Product.objects.filter(name=self.name,vendor__vendor_type='wholesaler').aggregate(Max('quantity_kg'))['quantity_kg__max'] 
-                if max_wholesaler_qty and self.quantity_kg > max_wholesaler_qty:
-                    raise ValidationError("Retailer quantity cannot exceed the maximum quantity sold by wholesalers.")
-            
-        else:
-            if self.stock < 0:
-                raise ValidationError("Stock cannot be negative.")
+        validate_listing(vendor_type, is_farm_category, self.quantity_kg, self.stock, upstream_max)
 
     
     def save (self, *args, **kwargs):
+        self.settle_quantity()
         self.full_clean()
+        self.visible_to = listing_visibility(self.vendor.vendor_type, self.is_farm_product())
+        self.commodity = normalize_commodity(self.name)
+        adding = self._state.adding
+        with transaction.atomic():
+            stock_change = self.lock_stock()
+            super().save(*args, **kwargs)
+            if stock_change:
+                StockMovement.log(self, 'receipt' if adding else 'adjustment', stock_change)
+        before = None if adding else self.loaded_cap_entry(self.stock - stock_change)
+        self._loaded_stock = self._loaded_quantity_kg = self.stock
+        self.update_derived_columns()
+        invalidate_catalog(self.visible_to, getattr(self, '_loaded_visible_to', None))
+        self._loaded_visible_to = self.visible_to
+
+        CommodityCap.track([(before, self.cap_entry())])
+        self._loaded_commodity = self.commodity
+        self._loaded_vendor_id = self.vendor_id
+        queue_variants(self)
+
+    def cap_entry(self, quantity_kg=None):
+        """(commodity, vendor_type, quantity_kg) as the tier caps see this listing."""
+        return (self.commodity, self.vendor.vendor_type, self.quantity_kg if quantity_kg is None else quantity_kg)
 
-        category_name = self.category.name.lower() if self.category else ''
-        FARM_CATEGORIES = ['farm products', 'food & grocery', 'agricultural']
-        is_farm_category = any(cat in category_name for cat in FARM_CATEGORIES)
-
-        if is_farm_category:
-             if self.vendor.vendor_type == 'farmer':
-                self.visible_to ='wholesaler'
-             elif self.vendor.vendor_type == 'wholesaler':
-                self.visible_to ='retailer'
-             elif self.vendor.vendor_type == 'retailer':
-                self.visible_to ='consumers'
+    def loaded_cap_entry(self, quantity_kg):
+        """cap_entry() as the row stood before this save, holding `quantity_kg`."""
+        commodity = getattr(self, '_loaded_commodity', None) or self.commodity
+        vendor_id = getattr(self, '_loaded_vendor_id', None) or self.vendor_id
+        if vendor_id == self.vendor_id:
+            vendor_type = self.vendor.vendor_type
         else:
-            self.visible_to ='consumers'
-        super().save(*args, **kwargs)
+            # Moved to another vendor (admin edit) — the old one may be in another tier
+            vendor_type = type(self.vendor).objects.filter(pk=vendor_id).values_list('vendor_type', flat=True).first()
+        return (commodity, vendor_type, quantity_kg)
+
+    def settle_quantity(self):
+        """quantity_kg mirrors stock; take whichever of the two the caller set or changed."""
+        if self._state.adding:
+            # Nothing loaded to compare with: a new row may come with either one
+            if not self.stock:
+                self.stock = self.quantity_kg
+        elif self.quantity_kg != getattr(self, '_loaded_quantity_kg', None) and self.stock == getattr(self, '_loaded_stock', None):
+            self.stock = self.quantity_kg
+        self.quantity_kg = self.stock
+
+    def lock_stock(self):
+        """
+        Lock the stored balance for this save and return the ledger movement
+        it makes. If the caller didn't touch the count, the stored balance is
+        kept, so an edit never undoes a sale or reservation made since the
+        product was loaded.
+        """
+        stored = None
+        if not self._state.adding:
+            stored = Product.objects.select_for_update().filter(pk=self.pk).values_list('stock', flat=True).first()
+        if stored is None:
+            return self.stock
+        if self.stock == getattr(self, '_loaded_stock', None):
+            self.stock = self.quantity_kg = stored
+        return self.stock - stored
+
+    def image_variants_ready(self):
+        Product.objects.filter(pk=self.pk).update(change_seq=NextChangeSeq())
+        invalidate_catalog(self.visible_to)
+
+    def delete(self, *args, **kwargs):
+        invalidate_catalog(self.visible_to)
+        result = super().delete(*args, **kwargs)
+        CommodityCap.track([(self.cap_entry(), None)])
+        return result
+
+    def update_derived_columns(self):
+        """Search vector and change sequence, set in SQL right after every save."""
+        category_name = self.category.name if self.category else ''
+        Product.objects.filter(pk=self.pk).update(
+            search_vector=product_search_vector(category_name),
+            change_seq=NextChangeSeq(),
+        )
     
     # ✅ Control visibility and admin approval
     approved = models.BooleanField(default=True)
@@ -88,9 +272,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def is_farm_product(self):
-        FARM_CATEGORIES = ['farm products', 'food & grocery', 'agricultural']
-        category_name = self.category.name.lower() if self.category else ''
-        return any(cat in category_name for cat in FARM_CATEGORIES)
+        # Stored on the category; filter in SQL with category__is_farm=True
+        return bool(self.category_id) and self.category.is_farm
 
     def __str__(self):
         return f"{self.name} ({self.vendor.vendor_type})"
@@ -109,3 +292,284 @@ class ProductRating(models.Model):
 
     def __str__(self):
         return f"{self.product.name} - {self.rating}/5 by {self.reviewer_name or 'Anonymous'}"
+
+
+class ProductRatingSummary(models.Model):
+    """
+    Running rating totals for a product so list/detail responses never have
+    to aggregate over ProductRating. Updated incrementally by `record()`.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0, help_text="Sum of all ratings")
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 1) if self.count else None
+
+    @property
+    def histogram(self):
+        return {star: getattr(self, f'stars_{star}') for star in range(1, 6)}
+
+    @classmethod
+    def record(cls, product, rating):
+        """Fold one new rating into the product's summary with a single UPDATE."""
+        changes = {'count': F('count') + 1, 'total': F('total') + rating, 'updated_at': timezone.now()}
+        if 1 <= rating <= 5:
+            changes[f'stars_{rating}'] = F(f'stars_{rating}') + 1
+
+        invalidate_catalog(product.visible_to)
+        # Ratings are part of the product payload, so they move it up the change feed
+        Product.objects.filter(pk=product.pk).update(change_seq=NextChangeSeq(), updated_at=timezone.now())
+        if cls.objects.filter(product=product).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    product=product, count=1, total=rating,
+                    **({f'stars_{rating}': 1} if 1 <= rating <= 5 else {})
+                )
+        except IntegrityError:
+            # Another request created the row first — fall back to incrementing it
+            cls.objects.filter(product=product).update(**changes)
+
+    def __str__(self):
+        return f"{self.product.name} - {self.average or 0}/5 ({self.count} ratings)"
+
+
+class CommodityCap(models.Model):
+    """
+    Largest quantity_kg listed per commodity by each capped tier (farmers,
+    wholesalers), so Product.clean can check the tier below with one indexed
+    read instead of aggregating over products. Kept in step by track(), which
+    Product save / delete, the bulk importer and the stock paths call: a
+    larger listing raises the cap in place, and only a listing that held the
+    cap and then shrank or left it makes the cap be recomputed.
+    """
+    commodity = models.CharField(max_length=255)
+    vendor_type = models.CharField(max_length=20)
+    max_quantity_kg = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['commodity', 'vendor_type'], name='unique_commodity_cap'),
+        ]
+
+    @classmethod
+    def upstream_max(cls, commodity, vendor_type):
+        """Cap a `vendor_type` listing of `commodity` must stay within (None = no cap)."""
+        return cls.upstream_caps([commodity], vendor_type).get(commodity)
+
+    @classmethod
+    def upstream_caps(cls, commodities, vendor_type):
+        upstream = UPSTREAM_VENDOR_TYPE.get(vendor_type)
+        if not upstream:
+            return {}
+        rows = cls.objects.filter(commodity__in=commodities, vendor_type=upstream)
+        return dict(rows.values_list('commodity', 'max_quantity_kg'))
+
+    @classmethod
+    def track(cls, changes):
+        """
+        Fold listing changes into the caps. `changes` are (before, after)
+        pairs of (commodity, vendor_type, quantity_kg); before is None for a
+        new listing and after is None for a deleted one.
+        """
+        raised = {}
+        lowered = {}
+        for before, after in changes:
+            if after is not None and after[1] in CAPPED_VENDOR_TYPES:
+                key = after[:2]
+                raised[key] = max(raised.get(key, 0), after[2])
+            if before is not None and before[1] in CAPPED_VENDOR_TYPES:
+                if after is None or after[:2] != before[:2] or after[2] < before[2]:
+                    key = before[:2]
+                    lowered[key] = max(lowered.get(key, 0), before[2])
+
+        stale = set()
+        if lowered:
+            # Only a listing that held the cap can bring it down
+            rows = cls.objects.filter(
+                commodity__in={commodity for commodity, _ in lowered},
+                vendor_type__in={vendor_type for _, vendor_type in lowered},
+            ).values_list('commodity', 'vendor_type', 'max_quantity_kg')
+            caps = {(commodity, vendor_type): cap for commodity, vendor_type, cap in rows}
+            stale = {key for key, quantity in lowered.items() if quantity >= caps.get(key, 0)}
+
+        for key, quantity in raised.items():
+            if key not in stale:
+                cls.raise_to(*key, quantity)
+        if stale:
+            cls.refresh_many(stale)
+
+    @classmethod
+    def raise_to(cls, commodity, vendor_type, quantity):
+        """Lift the cap to `quantity` if it is lower — one UPDATE, no aggregate."""
+        rows = cls.objects.filter(commodity=commodity, vendor_type=vendor_type)
+        changes = {'max_quantity_kg': Greatest(F('max_quantity_kg'), Value(quantity)), 'updated_at': timezone.now()}
+        if rows.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(commodity=commodity, vendor_type=vendor_type, max_quantity_kg=quantity)
+        except IntegrityError:
+            # Another listing created the row first
+            rows.update(**changes)
+
+    @classmethod
+    def refresh_many(cls, keys):
+        """Recompute the caps for (commodity, vendor_type) pairs — one grouped query per tier."""
+        by_tier = {}
+        for commodity, vendor_type in keys:
+            if vendor_type in CAPPED_VENDOR_TYPES:
+                by_tier.setdefault(vendor_type, set()).add(commodity)
+
+        for vendor_type, commodities in by_tier.items():
+            maxima = dict(
+                Product.objects
+                .filter(commodity__in=commodities, vendor__vendor_type=vendor_type)
+                .values('commodity')
+                .annotate(max_qty=Max('quantity_kg'))
+                .values_list('commodity', 'max_qty')
+            )
+            if maxima:
+                cls.objects.bulk_create(
+                    [cls(commodity=c, vendor_type=vendor_type, max_quantity_kg=m, updated_at=timezone.now())
+                     for c, m in maxima.items()],
+                    update_conflicts=True,
+                    unique_fields=['commodity', 'vendor_type'],
+                    update_fields=['max_quantity_kg', 'updated_at'],
+                )
+            gone = commodities - set(maxima)
+            if gone:
+                cls.objects.filter(commodity__in=gone, vendor_type=vendor_type).delete()
+
+    def __str__(self):
+        return f"{self.commodity} ({self.vendor_type}): {self.max_quantity_kg} kg"
+
+
+class InsufficientStock(Exception):
+    """Not enough stock left to take the requested quantity."""
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        super().__init__(f"Not enough stock left for {quantity} of '{product.name}'.")
+
+
+class StockMovement(models.Model):
+    """
+    Append-only inventory ledger. Every change to a product's stock is one
+    row; Product.stock is the cached balance, updated in the same transaction
+    (quantity_kg mirrors it for the API), so reading a balance stays a column
+    read while history and stock reports come from this table.
+
+    - receipt: stock listed (create, bulk import); adjustment: a vendor or
+      admin edit of the count
+    - reservation / release: stock held for and returned from a pending order
+    - sale: a paid order. A sale of held stock is logged as release + sale,
+      leaving the balance unchanged.
+    """
+    KIND_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('sale', 'Sale'),
+        ('reservation', 'Reservation'),
+        ('release', 'Release'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Signed: positive adds stock, negative takes it
+    quantity = models.IntegerField()
+    balance_after = models.PositiveIntegerField()
+    # What caused it, e.g. "order:42"
+    reference = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # A product's history, newest first
+            models.Index(fields=['product', '-created_at'], name='stock_movement_history_idx'),
+            # Stock reports: movements of one kind over a period
+            models.Index(fields=['kind', 'created_at'], name='stock_movement_kind_idx'),
+        ]
+
+    @classmethod
+    def log(cls, product, kind, quantity, reference=''):
+        """Record a movement whose effect is already in product.stock."""
+        return cls.objects.create(
+            product=product, kind=kind, quantity=quantity, balance_after=product.stock, reference=reference
+        )
+
+    @classmethod
+    def apply(cls, product, kind, quantity, reference='', require_stock=False):
+        """Move `quantity` (signed) in or out of `product` and record it. See move_balance()."""
+        with transaction.atomic():
+            quantity = cls.move_balance(product, quantity, require_stock)
+            return cls.log(product, kind, quantity, reference)
+
+    @staticmethod
+    def move_balance(product, quantity, require_stock=False):
+        """
+        Change the cached balance only — callers log the movement (or build
+        it for a bulk_create). Returns the quantity actually moved and leaves
+        the new balance in product.stock.
+
+        Taking stock with `require_stock` is one conditional UPDATE
+        (stock >= qty) and raises InsufficientStock when it fails. Without
+        it the balance is clamped at zero and only what was actually taken
+        is returned.
+        """
+        rows = Product.objects.filter(pk=product.pk)
+        with transaction.atomic():
+            if quantity < 0 and require_stock:
+                rows = rows.filter(stock__gte=-quantity)
+            elif quantity < 0:
+                current = rows.select_for_update().values_list('stock', flat=True).first() or 0
+                quantity = max(quantity, -current)
+
+            changed = rows.update(
+                stock=F('stock') + quantity,
+                quantity_kg=F('stock') + quantity,
+                updated_at=timezone.now(),
+                change_seq=NextChangeSeq(),
+            )
+            if not changed:
+                raise InsufficientStock(product, -quantity)
+            product.stock = product.quantity_kg = (
+                Product.objects.filter(pk=product.pk).values_list('stock', flat=True).get()
+            )
+        return quantity
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} of {self.product_id} -> {self.balance_after}"
+
+
+class ProductTombstone(models.Model):
+    """
+    Left behind when a product is deleted so change-feed clients can drop it
+    from their local copy. Written by the post_delete receiver below, which
+    also covers cascades (e.g. a vendor account being deleted).
+    """
+    product_id = models.BigIntegerField()
+    visible_to = models.CharField(max_length=20)
+    change_seq = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Deleted product {self.product_id} (#{self.change_seq})"
+
+
+@receiver(post_delete, sender=Product)
+def leave_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(
+        product_id=instance.pk, visible_to=instance.visible_to, change_seq=NextChangeSeq()
+    )
@@ -1,17 +1,28 @@
 # products/serializers.py
-from urllib.parse import quote_plus
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from django.db.models import Avg
-from .models import Product, ProductRating
+from globalconnect024.fieldsets import SparseFieldsetsMixin
+from globalconnect024.image_variants import srcset
+from .auto_images import auto_image_url
+from .models import Product, ProductRating, ProductRatingSummary, StockMovement
 
 class ProductRatingSerializer(serializers.ModelSerializer):
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+
     class Meta:
         model = ProductRating
         fields = ['id', 'rating', 'comment', 'reviewer_name', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class StockMovementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'kind', 'quantity', 'balance_after', 'reference', 'created_at']
+        read_only_fields = fields
+
+
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     vendor_name = serializers.SerializerMethodField()
     vendor_type = serializers.SerializerMethodField()
     category = serializers.CharField(required=False, allow_null=True, write_only=True)
@@ -19,25 +30,38 @@ class ProductSerializer(serializers.ModelSerializer):
     is_farm_product = serializers.SerializerMethodField()
     avg_rating = serializers.SerializerMethodField()
     rating_count = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    # Database-generated retailer → wholesaler → farmer price (0 = not set)
+    effective_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
     # Accept 'price' from frontend (maps to vendor-specific price)
     price = serializers.DecimalField(max_digits=10, decimal_places=2, write_only=True, required=False)
 
     # Accept 'stock' from frontend (maps to quantity_kg in model)
-    stock = serializers.IntegerField(write_only=True, required=False)
+    stock = serializers.IntegerField(write_only=True, required=False, min_value=0)
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description',
             'price', 'stock',  # Frontend fields
-            'farmer_price', 'wholesaler_price', 'retailer_price',
-            'quantity_kg', 'image', 'approved',
+            'farmer_price', 'wholesaler_price', 'retailer_price', 'effective_price',
+            'quantity_kg', 'image', 'image_srcset', 'approved',
             'vendor_name', 'vendor_type', 'category', 'category_name',
             'visible_to', 'is_farm_product', 'avg_rating', 'rating_count',
         ]
-        read_only_fields = ['id', 'vendor', 'approved', 'vendor_name', 'vendor_type', 'visible_to',
-                            'category_name', 'is_farm_product', 'avg_rating', 'rating_count']
+        read_only_fields = ['id', 'vendor', 'approved', 'effective_price', 'vendor_name', 'vendor_type', 'visible_to',
+                            'category_name', 'is_farm_product', 'avg_rating', 'rating_count', 'image_srcset']
+
+    # Relations each field reads — only joined when the field is rendered (?fields= / ?omit=)
+    sparse_related = {
+        'vendor_name': ('vendor',),
+        'vendor_type': ('vendor',),
+        'category_name': ('category',),
+        'is_farm_product': ('category',),
+        'avg_rating': ('rating_summary',),
+        'rating_count': ('rating_summary',),
+    }
 
     def get_vendor_name(self, obj):
         return obj.vendor.first_name or obj.vendor.username if obj.vendor else None
@@ -51,88 +75,36 @@ class ProductSerializer(serializers.ModelSerializer):
     def get_is_farm_product(self, obj):
         return obj.is_farm_product()
 
+    def get_image_srcset(self, obj):
+        # Resized WebP/JPEG variants; None until they've been generated
+        return srcset(obj.image_variants, self.context.get('request'), obj.image) if obj.image else None
+
+    def _get_rating_summary(self, obj):
+        # Read from the denormalized summary (select_related by the viewset)
+        try:
+            return obj.rating_summary
+        except ProductRatingSummary.DoesNotExist:
+            return None
+
     def get_avg_rating(self, obj):
-        result = obj.ratings.aggregate(avg=Avg('rating'))['avg']
-        return round(result, 1) if result else None
+        summary = self._get_rating_summary(obj)
+        return summary.average if summary else None
 
     def get_rating_count(self, obj):
-        return obj.ratings.count()
+        summary = self._get_rating_summary(obj)
+        return summary.count if summary else 0
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if not instance.image:
+        if 'image' in data and not instance.image:
             data['image'] = self._get_auto_image(instance)
         return data
 
     def _get_auto_image(self, instance):
-        name = instance.name.lower() if instance.name else ''
-        category_name = instance.category.name.lower() if instance.category else ''
-
-        # Keyword-based lookup (product name)
-        FRONTEND_URL = 'https://www.024global.com'
-        keyword_map = {
-            # ✅ Preset farm products — images served from frontend /products/
-            'watermelon': f'{FRONTEND_URL}/products/watermelon.jpg',
-            'tomato': f'{FRONTEND_URL}/products/tomato.jpg',
-            'ginger': f'{FRONTEND_URL}/products/ginger.jpg',
-            'terere': f'{FRONTEND_URL}/products/terere.jpg',
-            'amaranth': f'{FRONTEND_URL}/products/terere.jpg',
-            'beans': f'{FRONTEND_URL}/products/beans.jpg',
-            'kidney bean': f'{FRONTEND_URL}/products/beans.jpg',
-            'kunde': f'{FRONTEND_URL}/products/kunde.jpg',
-            'cowpea': f'{FRONTEND_URL}/products/kunde.jpg',
-            'cow pea': f'{FRONTEND_URL}/products/kunde.jpg',
-            'sweet potato': f'{FRONTEND_URL}/products/sweetpotato.jpg',
-            'sweetpotato': f'{FRONTEND_URL}/products/sweetpotato.jpg',
-            'sukuma': f'{FRONTEND_URL}/products/sukumawiki.jpg',
-            'kale': f'{FRONTEND_URL}/products/sukumawiki.jpg',
-            'collard': f'{FRONTEND_URL}/products/sukumawiki.jpg',
-            'managu': f'{FRONTEND_URL}/products/managu.jpg',
-            'nightshade': f'{FRONTEND_URL}/products/managu.jpg',
-            'pumpkin': f'{FRONTEND_URL}/products/pumpkin.jpg',
-            'rosemary': f'{FRONTEND_URL}/products/rosemary.jpg',
-            'garlic': f'{FRONTEND_URL}/products/garlic.jpg',
-            'strawberry': f'{FRONTEND_URL}/products/strawberry.jpg',
-            'coriander': f'{FRONTEND_URL}/products/dania.jpg',
-            'dania': f'{FRONTEND_URL}/products/dania.jpg',
-            'dhania': f'{FRONTEND_URL}/products/dania.jpg',
-            'mrenda': f'{FRONTEND_URL}/products/mrenda.jpg',
-            'jute mallow': f'{FRONTEND_URL}/products/mrenda.jpg',
-            'carrot': f'{FRONTEND_URL}/products/carrots.jpg',
-            'irish potato': f'{FRONTEND_URL}/products/potato.jpg',
-            'irish': f'{FRONTEND_URL}/products/potato.jpg',
-            'green chilli': f'{FRONTEND_URL}/products/green-chilli.jpg',
-            'chilli': f'{FRONTEND_URL}/products/green-chilli.jpg',
-            'pilipili hoho': f'{FRONTEND_URL}/products/capsicum.jpg',
-            'capsicum': f'{FRONTEND_URL}/products/capsicum.jpg',
-            'bell pepper': f'{FRONTEND_URL}/products/capsicum.jpg',
-            # existing products
-            'laptop': 'https://images.unsplash.com/photo-1496181133206-80ce9b88a853?w=400',
-            'phone': 'https://images.unsplash.com/photo-1511707171634-5f897ff02aa9?w=400',
-            'tv': 'https://images.unsplash.com/photo-1593305841991-05c297ba4575?w=400',
-            'television': 'https://images.unsplash.com/photo-1593305841991-05c297ba4575?w=400',
-            'shirt': 'https://images.unsplash.com/photo-1521572163474-6864f9cf17ab?w=400',
-            'shoe': 'https://images.unsplash.com/photo-1542291026-7eec264c27ff?w=400',
-            'maize': 'https://images.unsplash.com/photo-1551754655-cd27e38d2076?w=400',
-            'corn': 'https://images.unsplash.com/photo-1551754655-cd27e38d2076?w=400',
-            'rice': 'https://images.unsplash.com/photo-1586201375761-83865001e31c?w=400',
-            'milk': 'https://images.unsplash.com/photo-1550583724-b2692b85b150?w=400',
-            'potato': f'{FRONTEND_URL}/products/potato.jpg',
-            'chicken': 'https://images.unsplash.com/photo-1560717845-968823efbee1?w=400',
-            'beef': 'https://images.unsplash.com/photo-1529692236671-f1f6cf9683ba?w=400',
-            'book': 'https://images.unsplash.com/photo-1481627834876-b7833e8f5570?w=400',
-            'sofa': 'https://images.unsplash.com/photo-1555041469-a586c61ea9bc?w=400',
-            'car': 'https://images.unsplash.com/photo-1492144534655-ae79c964c9d7?w=400',
-            'wheel': 'https://images.unsplash.com/photo-1492144534655-ae79c964c9d7?w=400',
-        }
-        for keyword, url in keyword_map.items():
-            if keyword in name:
-                return url
-
-        # No saved image — fall back to a real keyword-based web image search
-        # (loremflickr returns a Flickr photo tagged with the search term, no API key)
-        query = name.strip() or category_name.strip() or 'product'
-        return f'https://loremflickr.com/400/400/{quote_plus(query)}'
+        # Keyword table and matcher live in products/auto_images.py (cached per name)
+        if instance.name and instance.name.strip():
+            return auto_image_url(instance.name)
+        return auto_image_url('', instance.category.name if instance.category else '')
 
     def validate(self, data):
         user = self.context['request'].user
@@ -142,12 +114,14 @@ class ProductSerializer(serializers.ModelSerializer):
         
         vendor_type = user.vendor_type
         
-        # Map 'stock' to both 'quantity_kg' (farm products) and 'stock' (non-farm products)
+        # 'stock' is the balance for every product and quantity_kg its mirror;
+        # older clients send only quantity_kg. Product.save() records the change
+        # in the inventory ledger
         if 'stock' in data:
-            stock_value = data.pop('stock')
-            data['quantity_kg'] = stock_value
-            data['stock'] = stock_value
-        
+            data['quantity_kg'] = data['stock']
+        elif 'quantity_kg' in data:
+            data['stock'] = data['quantity_kg']
+
         # Map 'price' to the appropriate vendor price field
         if 'price' in data:
             price_value = data.pop('price')
@@ -184,8 +158,33 @@ class ProductSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError("Retailer must set a price")
             else:
                 raise serializers.ValidationError("Invalid vendor type.")
-        
+
+        self.validate_listing(data, user)
         return data
+
+    def validate_listing(self, data, user):
+        """
+        Run the tier rules of Product.clean() on the row as it will be saved,
+        so a listing that breaks them is a 400 instead of an error from save().
+        """
+        current = self.instance
+        if 'category' in data:
+            from category.models import Category
+            category = Category.objects.filter(name=data['category']).first() if data['category'] else None
+        else:
+            category = current.category if current else None
+        stock = data.get('stock', current.stock if current else 0)
+        product = Product(
+            vendor=current.vendor if current else user,
+            category=category,
+            name=data.get('name', current.name if current else ''),
+            stock=stock,
+            quantity_kg=stock,
+        )
+        try:
+            product.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.messages)
     
     def create(self, validated_data):
         # Handle category lookup by name
@@ -1,3 +1,767 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from category.models import Category
+from globalconnect024.image_variants import pending, process_instance, srcset
+from users.models import CustomUser
+from . import auto_images
+from .models import CommodityCap, Product, ProductRatingSummary, StockMovement
+
+
+def make_vendor(username, vendor_type='retailer', **extra):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pw-12345678',
+        role='vendor', vendor_type=vendor_type, **extra
+    )
+
+
+def make_product(vendor, name='Soap', stock=5, category=None, **extra):
+    prices = {f'{vendor.vendor_type}_price': extra.pop('price', 50)}
+    return Product.objects.create(
+        vendor=vendor, name=name, description='d', category=category,
+        stock=stock, quantity_kg=stock, **prices, **extra
+    )
+
+
+class ProductWriteTests(TestCase):
+    """POST / PATCH /api/products/ — stock and quantity_kg, tier rules."""
+
+    def setUp(self):
+        self.farm = Category.objects.create(name='Farm Products')
+        self.farmer = make_vendor('farmer', 'farmer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def create(self, **data):
+        payload = {'name': 'Maize', 'description': 'd', 'price': 40, 'category': 'Farm Products', **data}
+        return self.client.post('/api/products/', payload, format='json')
+
+    def test_create_with_quantity_kg_only(self):
+        response = self.create(quantity_kg=700)
+        self.assertEqual(response.status_code, 201, response.data)
+        product = Product.objects.get(pk=response.data['id'])
+        self.assertEqual((product.stock, product.quantity_kg), (700, 700))
+        self.assertEqual(list(product.stock_movements.values_list('kind', 'quantity')), [('receipt', 700)])
+
+    def test_create_with_stock_only(self):
+        response = self.create(stock=650)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Product.objects.get(pk=response.data['id']).quantity_kg, 650)
+
+    def test_tier_rule_failure_is_a_400(self):
+        response = self.create(quantity_kg=100)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("at least 600 kg", str(response.data))
+        self.assertFalse(Product.objects.exists())
+
+    def test_update_by_quantity_kg_logs_an_adjustment(self):
+        product = make_product(self.farmer, 'Maize', stock=700, category=self.farm)
+        response = self.client.patch(f'/api/products/{product.pk}/', {'quantity_kg': 800}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.quantity_kg), (800, 800))
+        self.assertEqual(product.stock_movements.latest('pk').quantity, 100)
+
+    def test_update_below_the_lot_size_is_a_400(self):
+        product = make_product(self.farmer, 'Maize', stock=700, category=self.farm)
+        response = self.client.patch(f'/api/products/{product.pk}/', {'stock': 10}, format='json')
+        self.assertEqual(response.status_code, 400)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 700)
+
+
+class ProductListTests(TestCase):
+    """GET /api/products/ — plain list by default, keyset pages on request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor('shop')
+        for i in range(30):
+            make_product(cls.vendor, f'Item {i}', price=10 + i % 7)
+
+    def setUp(self):
+        # Catalog pages are cached per tier; invalidation only runs on a real commit
+        cache.clear()
+        self.client = APIClient()
+
+    def follow(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_plain_list_returns_every_product(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 30)
+
+    def test_pages_cover_the_list_once(self):
+        ids = self.follow('/api/products/?page_size=7')
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(ids, [row['id'] for row in self.client.get('/api/products/').data])
+
+    def test_pages_by_price_cover_the_list_once(self):
+        ids = self.follow('/api/products/?ordering=price&page_size=4')
+        self.assertCountEqual(ids, Product.objects.values_list('pk', flat=True))
+        prices = dict(Product.objects.values_list('pk', 'effective_price'))
+        self.assertEqual([prices[pk] for pk in ids], sorted(prices[pk] for pk in ids))
+
+    def test_page_queries_do_not_grow_with_page_size(self):
+        def page_queries(size):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(f'/api/products/?page_size={size}')
+            return len(queries)
+
+        self.assertEqual(page_queries(2), page_queries(20))
+
+    def test_bad_cursor_is_a_404(self):
+        for values in (['not-a-date', 1], 'garbage', [1]):
+            token = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            self.assertEqual(self.client.get(f'/api/products/?cursor={token}').status_code, 404)
+
+
+class ChangeFeedTests(TestCase):
+    """GET /api/products/changes/ — ordering, tombstones, transactions and the horizon."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_vendor('shop')
+
+    def feed(self, since=0, **params):
+        response = self.client.get('/api/products/changes/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_upserts_and_tombstones_in_order(self):
+        kept = make_product(self.vendor, 'Kept')
+        deleted = make_product(self.vendor, 'Deleted')
+        paused = make_product(self.vendor, 'Paused')
+        deleted_id = deleted.pk
+        deleted.delete()
+        paused.is_active = False
+        paused.save()
+
+        feed = self.feed()
+        ops = [(change['op'], change['id'], change.get('reason')) for change in feed['changes']]
+        self.assertEqual(ops, [
+            ('upsert', kept.pk, None),
+            ('delete', deleted_id, 'deleted'),
+            ('delete', paused.pk, 'deactivated'),
+        ])
+        self.assertEqual(feed['changes'][0]['product']['name'], 'Kept')
+        self.assertEqual(self.feed(feed['next_since'])['changes'], [])
+
+    def test_pages_never_split_a_transaction(self):
+        products = [make_product(self.vendor, f'Item {i}') for i in range(5)]
+        # Rows written by one transaction share its sequence value
+        shared = Product.objects.get(pk=products[1].pk).change_seq
+        Product.objects.filter(pk__in=[p.pk for p in products[1:4]]).update(change_seq=shared)
+
+        first = self.feed(limit=2)
+        self.assertEqual([change['id'] for change in first['changes']], [p.pk for p in products[:4]])
+        self.assertTrue(first['has_more'])
+        second = self.feed(first['next_since'], limit=2)
+        self.assertEqual([change['id'] for change in second['changes']], [products[4].pk])
+        self.assertFalse(second['has_more'])
+
+    def test_changes_from_running_transactions_are_held_back(self):
+        settled = make_product(self.vendor, 'Settled')
+        running = make_product(self.vendor, 'Running')
+        settled.refresh_from_db()
+        running.refresh_from_db()
+        with mock.patch('products.changes.settle_horizon', return_value=running.change_seq):
+            feed = self.feed()
+        self.assertEqual([change['id'] for change in feed['changes']], [settled.pk])
+        self.assertEqual(feed['next_since'], settled.change_seq)
+        self.assertEqual([change['id'] for change in self.feed(feed['next_since'])['changes']], [running.pk])
+
+    def test_since_accepts_a_timestamp(self):
+        make_product(self.vendor, 'Old')
+        Product.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        new = make_product(self.vendor, 'New')
+        moment = (timezone.now() - timedelta(hours=1)).isoformat()
+        self.assertEqual([change['id'] for change in self.feed(moment)['changes']], [new.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', "transaction ids are PostgreSQL-only")
+    def test_changes_are_stamped_with_the_writing_transaction(self):
+        with transaction.atomic():
+            first = make_product(self.vendor, 'One')
+            second = make_product(self.vendor, 'Two')
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.change_seq, second.change_seq)
+
+
+class CommodityCapTests(TestCase):
+    """CommodityCap.track(): raise in place, recompute only when the holder of the cap shrinks or leaves."""
+
+    def setUp(self):
+        self.farm = Category.objects.create(name='Farm Products')
+        self.farmer = make_vendor('farmer', 'farmer')
+        self.big = make_product(self.farmer, 'Maize', stock=900, category=self.farm)
+        self.small = make_product(self.farmer, 'maize', stock=700, category=self.farm)
+
+    def cap(self, commodity='maize'):
+        return CommodityCap.objects.filter(commodity=commodity, vendor_type='farmer').values_list(
+            'max_quantity_kg', flat=True).first()
+
+    def recomputes(self):
+        return mock.patch.object(CommodityCap, 'refresh_many', wraps=CommodityCap.refresh_many)
+
+    def test_larger_listing_raises_the_cap_without_aggregating(self):
+        with self.recomputes() as refresh:
+            make_product(self.farmer, 'Maize', stock=1200, category=self.farm)
+            self.small.stock = 800
+            self.small.save()
+        refresh.assert_not_called()
+        self.assertEqual(self.cap(), 1200)
+
+    def test_shrinking_a_smaller_listing_keeps_the_cap(self):
+        with self.recomputes() as refresh:
+            self.small.stock = 650
+            self.small.save()
+        refresh.assert_not_called()
+        self.assertEqual(self.cap(), 900)
+
+    def test_shrinking_the_largest_listing_recomputes(self):
+        self.big.stock = 600
+        self.big.save()
+        self.assertEqual(self.cap(), 700)
+
+    def test_renaming_the_largest_listing_moves_it(self):
+        self.big.name = 'Beans'
+        self.big.save()
+        self.assertEqual((self.cap('maize'), self.cap('beans')), (700, 900))
+
+    def test_deleting_listings_recomputes_and_finally_drops_the_cap(self):
+        self.big.delete()
+        self.assertEqual(self.cap(), 700)
+        self.small.delete()
+        self.assertIsNone(self.cap())
+
+    def test_a_sale_of_the_largest_listing_lowers_the_cap(self):
+        from orders.reservations import _stock_changed
+        StockMovement.apply(self.big, 'sale', -250, 'order:1')
+        _stock_changed([(self.big, -250)])
+        self.assertEqual(self.cap(), 700)
+
+
+class RatingSummaryTests(TestCase):
+    """Ratings fold into ProductRatingSummary; responses never aggregate ratings."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_vendor('shop')
+        self.product = make_product(self.vendor)
+
+    def rate(self, rating, product=None):
+        product = product or self.product
+        return self.client.post(f'/api/products/{product.pk}/ratings/', {'rating': rating}, format='json')
+
+    def test_ratings_update_the_summary(self):
+        for rating in (5, 4, 4):
+            self.assertEqual(self.rate(rating).status_code, 201)
+        summary = ProductRatingSummary.objects.get(product=self.product)
+        self.assertEqual((summary.count, summary.total, summary.average), (3, 13, 4.3))
+        self.assertEqual(summary.histogram, {1: 0, 2: 0, 3: 0, 4: 2, 5: 1})
+
+        data = self.client.get(f'/api/products/{self.product.pk}/').data
+        self.assertEqual((data['avg_rating'], data['rating_count']), (4.3, 3))
+
+    def test_out_of_range_rating_is_rejected(self):
+        self.assertEqual(self.rate(6).status_code, 400)
+        self.assertFalse(ProductRatingSummary.objects.exists())
+        data = self.client.get(f'/api/products/{self.product.pk}/').data
+        self.assertEqual((data['avg_rating'], data['rating_count']), (None, 0))
+
+    def test_list_queries_do_not_grow_with_rated_products(self):
+        def list_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get('/api/products/').status_code, 200)
+            return len(queries)
+
+        self.rate(3)
+        few = list_queries()
+        for i in range(5):
+            self.rate(5, make_product(self.vendor, f'Item {i}'))
+        self.assertEqual(list_queries(), few)
+
+
+class SearchTests(TestCase):
+    """GET /api/products/search/?q= — ranked full-text search over the stored vector."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_vendor('shop')
+
+    def test_q_is_required(self):
+        self.assertEqual(self.client.get('/api/products/search/').status_code, 400)
+
+    @skipUnless(connection.vendor == 'postgresql', "full-text search is PostgreSQL-only")
+    def test_name_matches_rank_above_description_matches(self):
+        greens = Category.objects.create(name='Vegetables')
+        in_description = make_product(self.vendor, 'Fresh greens', category=greens)
+        in_description.description = 'Bundles of sukuma wiki'
+        in_description.save()
+        in_name = make_product(self.vendor, 'Sukuma wiki', category=greens)
+        make_product(self.vendor, 'Soap')
+
+        response = self.client.get('/api/products/search/', {'q': 'sukuma'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [in_name.pk, in_description.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', "full-text search is PostgreSQL-only")
+    def test_category_renames_reach_the_search_vector(self):
+        category = Category.objects.create(name='Household')
+        soap = make_product(self.vendor, 'Bar', category=category)
+        category.name = 'Detergents'
+        category.save()
+        response = self.client.get('/api/products/search/', {'q': 'detergents'})
+        self.assertEqual([row['id'] for row in response.data['results']], [soap.pk])
+
+
+class AutoImageTests(SimpleTestCase):
+    """auto_image_url(): the first table keyword found in the name wins, else a tagged fallback."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.table = os.path.join(tmp.name, 'auto_images.json')
+        with open(self.table, 'w', encoding='utf-8') as f:
+            json.dump([
+                {'keyword': 'watermelon', 'image': 'watermelon.jpg'},
+                {'keyword': 'melon', 'image': 'melon.jpg'},
+                {'keyword': 'tomato', 'image': 'tomato.jpg'},
+            ], f)
+        override = override_settings(PRODUCT_AUTO_IMAGE_TABLE=self.table)
+        override.enable()
+        self.addCleanup(override.disable)
+        auto_images.reload_table()
+        self.addCleanup(auto_images.reload_table)
+
+    def test_table_order_wins_over_position_in_name(self):
+        self.assertEqual(auto_images.auto_image_url('Tomato and watermelon mix'), 'watermelon.jpg')
+        self.assertEqual(auto_images.auto_image_url('Melon'), 'melon.jpg')
+
+    def test_matches_a_linear_scan_of_the_table(self):
+        entries = auto_images.load_table()
+        for name in ['sweet watermelon', 'cherry tomatoes', 'honeydew melon', 'kale']:
+            expected = next((e['image'] for e in entries if e['keyword'] in name), None)
+            self.assertEqual(auto_images.get_matcher().match(name), expected)
+
+    def test_name_is_normalised(self):
+        self.assertEqual(auto_images.auto_image_url('  RIPE   Tomatoes '), 'tomato.jpg')
+
+    def test_fallback_is_tagged_with_name_then_category(self):
+        self.assertEqual(auto_images.auto_image_url('Kale bunch'), 'https://loremflickr.com/400/400/kale+bunch')
+        self.assertEqual(auto_images.auto_image_url('', 'Leafy Greens'), 'https://loremflickr.com/400/400/leafy+greens')
+        self.assertEqual(auto_images.auto_image_url(''), 'https://loremflickr.com/400/400/product')
+
+    def test_reload_table_picks_up_edits(self):
+        self.assertEqual(auto_images.auto_image_url('Tomato'), 'tomato.jpg')
+        with open(self.table, 'w', encoding='utf-8') as f:
+            json.dump([{'keyword': 'tomato', 'image': 'tomato-v2.jpg'}], f)
+        auto_images.reload_table()
+        self.assertEqual(auto_images.auto_image_url('Tomato'), 'tomato-v2.jpg')
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified on product listings: 304 until a listed row changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_vendor('shop')
+        self.soap = make_product(self.vendor, 'Soap')
+        self.salt = make_product(self.vendor, 'Salt')
+
+    def etag(self, url='/api/products/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Authorization', response['Vary'])
+        return response['ETag']
+
+    def test_matching_etag_is_a_304(self):
+        etag = self.etag()
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_edit_changes_the_etag(self):
+        etag = self.etag()
+        self.soap.description = 'Lemon scented'
+        self.soap.save()
+        cache.clear()
+        self.assertNotEqual(self.etag(), etag)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_delete_changes_the_etag(self):
+        etag = self.etag()
+        self.salt.delete()
+        cache.clear()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_filters_and_pages_have_their_own_etags(self):
+        self.assertNotEqual(self.etag(), self.etag('/api/products/?page_size=1'))
+
+    def test_retrieve_is_conditional(self):
+        url = f'/api/products/{self.soap.pk}/'
+        etag = self.etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(etag, self.etag(f'/api/products/{self.salt.pk}/'))
+
+
+class CatalogCacheTests(TestCase):
+    """List pages are cached per visibility tier and dropped when a visible product changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_vendor('shop')
+        self.soap = make_product(self.vendor, 'Soap')
+
+    def names(self, url='/api/products/'):
+        return [row['name'] for row in self.client.get(url).data]
+
+    def test_hit_serves_without_queries(self):
+        self.names()
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/')
+        self.assertEqual([row['name'] for row in response.data], ['Soap'])
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_save_invalidates_on_commit(self):
+        self.names()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soap.name = 'Bar soap'
+            self.soap.save()
+        self.assertEqual(self.names(), ['Bar soap'])
+
+    def test_uncommitted_change_keeps_the_cached_page(self):
+        self.names()
+        Product.objects.filter(pk=self.soap.pk).update(name='Bar soap')
+        self.assertEqual(self.names(), ['Soap'])
+
+    def test_only_tiers_that_see_the_product_are_bumped(self):
+        from .cache import tier_version
+        before = {tier: tier_version(tier) for tier in ('public', 'retailer', 'wholesaler')}
+        # A retailer's product is listed for consumers (see Product.visible_to)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soap.save()
+        after = {tier: tier_version(tier) for tier in before}
+        self.assertGreater(after['public'], before['public'])
+        self.assertEqual(after['retailer'], before['retailer'])
+        self.assertEqual(after['wholesaler'], before['wholesaler'])
+
+    def test_vendors_are_not_cached(self):
+        self.client.force_authenticate(self.vendor)
+        self.names()
+        Product.objects.filter(pk=self.soap.pk).update(name='Bar soap')
+        self.assertEqual(self.names(), ['Bar soap'])
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= / ?omit= trim the product representation and the joins behind it."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_vendor('shop')
+        self.soap = make_product(self.vendor, 'Soap', category=Category.objects.create(name='Household'))
+
+    def test_fields_keeps_only_the_named_fields(self):
+        response = self.client.get('/api/products/', {'fields': 'id,name,nonsense'})
+        self.assertEqual(response.data, [{'id': self.soap.pk, 'name': 'Soap'}])
+
+    def test_omit_drops_the_named_fields(self):
+        row = self.client.get(f'/api/products/{self.soap.pk}/', {'omit': 'description,vendor_name'}).data
+        self.assertNotIn('description', row)
+        self.assertNotIn('vendor_name', row)
+        self.assertEqual(row['category_name'], 'Household')
+
+    def test_fields_and_omit_combine(self):
+        response = self.client.get('/api/products/', {'fields': 'id,name,price', 'omit': 'price'})
+        self.assertEqual(list(response.data[0]), ['id', 'name'])
+
+    def page_sql(self, params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/products/', params)
+        # The last query renders the page (the one before it is the ETag aggregate)
+        return queries[-1]['sql']
+
+    def test_only_rendered_relations_are_joined(self):
+        self.assertNotIn('JOIN', self.page_sql({'fields': 'id,name'}))
+        sql = self.page_sql({'fields': 'id,vendor_name'})
+        self.assertIn('users_customuser', sql)
+        self.assertNotIn('category_category', sql)
+
+    def test_writes_ignore_the_fieldset(self):
+        self.client.force_authenticate(self.vendor)
+        response = self.client.patch(
+            f'/api/products/{self.soap.pk}/?fields=id', {'description': 'Lemon'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['description'], 'Lemon')
+
+
+class BulkImportTests(TestCase):
+    """POST /api/products/bulk-import/ — row-level errors never block the rest of the file."""
+
+    def setUp(self):
+        self.vendor = make_vendor('shop')
+        Category.objects.create(name='Household')
+        self.client = APIClient()
+        self.client.force_authenticate(self.vendor)
+
+    def upload(self, name, content):
+        return self.client.post('/api/products/bulk-import/', {'file': SimpleUploadedFile(name, content)})
+
+    def test_csv_imports_valid_rows_and_reports_the_rest(self):
+        response = self.upload('products.csv', (
+            b'name,description,price,stock,category\n'
+            b'Soap,Bar,50,5,Household\n'
+            b'Salt,Fine,0,3,Household\n'
+            b'Sugar,White,80,2,Nowhere\n'
+            b'Candles,Wax,30,10,\n'
+        ))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        soap = Product.objects.get(name='Soap')
+        self.assertEqual((soap.retailer_price, soap.stock, soap.quantity_kg, soap.category.name), (50, 5, 5, 'Household'))
+        self.assertEqual(soap.visible_to, 'consumers')
+        self.assertEqual(
+            sorted(StockMovement.objects.values_list('product__name', 'kind', 'quantity', 'reference')),
+            [('Candles', 'receipt', 10, 'import'), ('Soap', 'receipt', 5, 'import')],
+        )
+
+    def test_json_lines_skip_bad_lines(self):
+        response = self.upload('products.jsonl', (
+            b'{"name": "Soap", "description": "Bar", "price": 50, "stock": 5}\n'
+            b'{not json\n'
+            b'\n'
+            b'{"name": "Caf\xe9", "description": "Latin-1", "price": 40, "stock": 1}\n'
+            b'{"name": "Salt", "description": "Fine", "price": 20, "stock": 3}\n'
+        ))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertIn("Not valid UTF-8", str(response.data['errors'][1]))
+
+    def test_csv_stops_at_undecodable_bytes_keeping_earlier_rows(self):
+        response = self.upload('products.csv', (
+            b'name,description,price,stock\n'
+            b'Soap,Bar,50,5\n'
+            b'Caf\xe9,Latin-1,40,1\n'
+            b'Salt,Fine,20,3\n'
+        ))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertIn("Rows from here on were not read", str(response.data['errors'][0]))
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Soap'])
+
+    def test_json_array(self):
+        response = self.upload('products.json', json.dumps([
+            {'name': 'Soap', 'description': 'Bar', 'price': 50, 'stock': 5},
+        ]).encode())
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 1)
+
+    def test_unreadable_uploads_are_a_400(self):
+        self.assertEqual(self.upload('products.txt', b'Soap').status_code, 400)
+        self.assertEqual(self.upload('products.json', b'{"name": "Soap"}').status_code, 400)
+
+    def test_admins_must_name_the_vendor(self):
+        admin = CustomUser.objects.create_user(
+            username='admin', email='admin@example.com', password='pw-12345678', role='admin'
+        )
+        self.client.force_authenticate(admin)
+        response = self.upload('products.csv', (
+            'name,description,price,stock,vendor\n'
+            'Soap,Bar,50,5,shop\n'
+            f'Salt,Fine,20,3,{self.vendor.pk}\n'
+            'Sugar,White,80,2,\n'
+        ).encode())
+        self.assertEqual(response.data['created'], 2)
+        self.assertIn("Vendor is required", str(response.data['errors']))
+        self.assertEqual(set(Product.objects.values_list('vendor', flat=True)), {self.vendor.pk})
+
+    def test_customers_cannot_import(self):
+        customer = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pw-12345678', role='customer'
+        )
+        self.client.force_authenticate(customer)
+        self.assertEqual(self.upload('products.csv', b'name\n').status_code, 403)
+
+
+def make_photo(name='photo.png', size=(400, 200)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageVariantTests(TestCase):
+    """Uploads are queued for the variants worker, which renders WebP/JPEG widths."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name, IMAGE_VARIANT_WIDTHS=(160, 320, 640))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.vendor = make_vendor('shop')
+        self.product = make_product(self.vendor, image=make_photo())
+
+    def test_new_upload_is_pending(self):
+        self.assertEqual(list(pending(Product)), [self.product])
+
+    def test_worker_renders_every_width_up_to_the_original(self):
+        variants = process_instance(Product, self.product.pk)
+        self.assertEqual(sorted(variants['files']['webp'], key=int), ['160', '320', '400'])
+        self.assertEqual(set(variants['files']), {'webp', 'jpeg'})
+        self.assertFalse(pending(Product).exists())
+
+        self.product.refresh_from_db()
+        urls = srcset(self.product.image_variants, image_field=self.product.image)
+        self.assertIn(' 160w, ', urls['webp'])
+        self.assertTrue(urls['jpeg'].endswith('.jpg 400w'))
+
+    def test_same_photo_reuses_the_files(self):
+        first = process_instance(Product, self.product.pk)
+        other = make_product(self.vendor, 'Salt', image=make_photo('copy.png'))
+        self.assertEqual(process_instance(Product, other.pk)['files'], first['files'])
+
+    def test_unreadable_image_is_marked_failed(self):
+        broken = make_product(self.vendor, 'Salt', image=SimpleUploadedFile('broken.png', b'not a png'))
+        self.assertIsNone(process_instance(Product, broken.pk))
+        broken.refresh_from_db()
+        self.assertTrue(broken.image_variants['failed'])
+        self.assertIsNone(srcset(broken.image_variants, image_field=broken.image))
+        self.assertNotIn(broken, pending(Product))
+
+    def test_replacing_the_image_queues_it_again(self):
+        process_instance(Product, self.product.pk)
+        self.product.refresh_from_db()
+        self.product.image = make_photo('new.png', (100, 100))
+        self.product.save()
+        self.assertEqual(list(pending(Product)), [self.product])
+
+    def test_backfill_command(self):
+        out = io.StringIO()
+        call_command('build_image_variants', '--model', 'products', stdout=out)
+        self.assertIn("products: 1 processed, 0 already up to date, 0 failed", out.getvalue())
+        out = io.StringIO()
+        call_command('build_image_variants', '--model', 'products', stdout=out)
+        self.assertIn("0 processed, 1 already up to date", out.getvalue())
+
+
+class FacetTests(TestCase):
+    """GET /api/products/facets/ — filtered results plus disjunctive counts per facet."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        household = Category.objects.create(name='Household')
+        drinks = Category.objects.create(name='Drinks')
+        shop = make_vendor('shop', city='Nakuru')
+        mill = make_vendor('mill', 'wholesaler', city='Nairobi')
+        make_product(shop, 'Soap', category=household, price=50)
+        make_product(shop, 'Juice', category=drinks, price=200)
+        make_product(mill, 'Flour', category=household, price=700)
+
+    def facets(self, **params):
+        response = self.client.get('/api/products/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        counts = {
+            dim: {row['label']: row['count'] for row in rows if row['count']}
+            for dim, rows in response.data['facets'].items()
+        }
+        return sorted(row['name'] for row in response.data['results']), counts
+
+    def test_counts_skip_their_own_selection(self):
+        names, counts = self.facets(vendor_type='retailer')
+        self.assertEqual(names, ['Juice', 'Soap'])
+        self.assertEqual(counts['vendor_type'], {'Retailer': 2, 'Wholesaler': 1})
+        self.assertEqual(counts['category'], {'Household': 1, 'Drinks': 1})
+        self.assertEqual(counts['price_band'], {'0-100': 1, '100-500': 1})
+        self.assertEqual(counts['county'], {'Nakuru': 2})
+
+    def test_values_of_one_facet_are_ored_and_facets_anded(self):
+        self.assertEqual(self.facets(price_band='0-100,500-1000', category='Household')[0], ['Flour', 'Soap'])
+        names, counts = self.facets(price_band='0-100,500-1000', county='Nairobi')
+        self.assertEqual(names, ['Flour'])
+        self.assertEqual(counts['county'], {'Nairobi': 1, 'Nakuru': 1})
+
+    def test_categories_match_by_id_or_name(self):
+        drinks = Category.objects.get(name='Drinks')
+        self.assertEqual(self.facets(category=f'{drinks.pk},Household')[0], ['Flour', 'Juice', 'Soap'])
+
+    def test_query_count_does_not_grow_with_facet_values(self):
+        def queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get('/api/products/facets/')
+            return len(captured)
+
+        before = queries()
+        vendor = make_vendor('kiosk', city='Kisumu')
+        for i in range(5):
+            make_product(vendor, f'Item {i}', category=Category.objects.create(name=f'Category {i}'))
+        self.assertEqual(queries(), before)
+
+
+class EffectivePriceTests(TestCase):
+    """effective_price: first non-zero tier price, stored so the catalog sorts and filters on it."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_vendor('shop')
+        self.cheap = make_product(self.vendor, 'Cheap', price=20)
+        self.mid = make_product(self.vendor, 'Mid', price=0, wholesaler_price=150)
+        self.dear = make_product(self.vendor, 'Dear', price=0, wholesaler_price=0, farmer_price=900)
+
+    def names(self, **params):
+        return [row['name'] for row in self.client.get('/api/products/', params).data]
+
+    def test_first_non_zero_tier_price_wins(self):
+        prices = dict(Product.objects.values_list('name', 'effective_price'))
+        self.assertEqual(prices, {'Cheap': 20, 'Mid': 150, 'Dear': 900})
+
+    def test_follows_price_edits(self):
+        self.mid.retailer_price = 120
+        self.mid.save()
+        self.assertEqual(Product.objects.get(pk=self.mid.pk).effective_price, 120)
+
+    def test_ordering_by_price(self):
+        self.assertEqual(self.names(ordering='price'), ['Cheap', 'Mid', 'Dear'])
+        self.assertEqual(self.names(ordering='-price'), ['Dear', 'Mid', 'Cheap'])
+
+    def test_price_range_filters(self):
+        self.assertEqual(self.names(min_price=100, ordering='price'), ['Mid', 'Dear'])
+        self.assertEqual(self.names(min_price=100, max_price=150), ['Mid'])
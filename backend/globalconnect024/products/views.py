@@ -2,94 +2,142 @@ from rest_framework.generics import ListCreateAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import api_view, action
 from django.conf import settings
-import requests
 from rest_framework.exceptions import PermissionDenied
-from .models import Product, ProductRating
-from .serializers import ProductSerializer, ProductRatingSerializer
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import transaction
+from django.db.models import F, FloatField, Sum
+from django.db.models.functions import Cast
+from .models import Product, ProductRating, ProductRatingSummary, SEARCH_CONFIG
+from .serializers import ProductSerializer, ProductRatingSerializer, StockMovementSerializer
 from rest_framework import viewsets
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from rest_framework.views import APIView
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import GuestCheckoutSerializer
+from .cache import cached_catalog_page
+from .bulk_import import BulkImportError, ProductImporter, iter_rows
+from .changes import DEFAULT_LIMIT as CHANGE_FEED_LIMIT, MAX_LIMIT as CHANGE_FEED_MAX_LIMIT, change_feed, parse_since
+from .facets import ProductFacets
+from .filters import ProductFilter, ProductOrderingFilter
+from globalconnect024.conditional import ConditionalListMixin
+from globalconnect024.http_clients import paystack
+from globalconnect024.pagination import KeysetPagination
 
 
 @api_view(['POST'])
 def initialize_paystack_payment(request):
     data = request.data
 
-    headers = {
-        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json",
-    }
-
     payload = {
         "email": data.get("email"),
         "amount": int(float(data.get("amount")) * 100),  # Convert to kobo
         "callback_url": settings.PAYSTACK_CALLBACK_URL
     }
     
-    response = requests.post("https://api.paystack.co/transaction/initialize", json=payload, headers=headers)
+    response = paystack.post("/transaction/initialize", json=payload)
     return Response(response.json())
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['stock', 'approved']  # ✅ Allows ?stock=... & ?approved=...
-    ordering_fields = ['price', 'stock', 'name']  # ✅ Allows ?ordering=price
+    filter_backends = [DjangoFilterBackend, ProductOrderingFilter]
+    filterset_class = ProductFilter  # ✅ Allows ?stock=... & ?approved=... & ?min_price=... & ?max_price=...
+    ordering_fields = ['price', 'stock', 'name']  # ✅ Allows ?ordering=price (sorts on effective_price)
+    pagination_class = KeysetPagination  # ✅ ?cursor=...&page_size=... keyed on (created_at, id), opt-in for list
+    # ✅ ETag / Last-Modified: edits and new ratings both invalidate cached listings
+    conditional_timestamp_fields = ('updated_at', 'rating_summary__updated_at')
 
     def get_permissions(self):
         """
-        - List/Retrieve/Ratings: Anyone can view (AllowAny)
+        - List/Retrieve/Ratings/Search/Facets/Changes: Anyone can view (AllowAny)
         - Create/Update/Delete/my_products: Only authenticated users
         """
-        if self.action in ['list', 'retrieve', 'ratings']:
+        if self.action in ['list', 'retrieve', 'ratings', 'search', 'facets', 'changes']:
             return [AllowAny()]
         return [IsAuthenticated()]
 
-    def get_queryset(self):
+    def get_visibility_tier(self):
         """
-        Returns products based on user role:
-        - Consumers/Unauthenticated: Consumer-visible products
-        - Affiliates: ALL approved & active products (to promote)
-        - Vendors: Only their own products
-        - Wholesalers/Retailers: Role-specific products
-        - Admins: All products
+        Catalog tier of the caller — every caller in a tier sees the same list,
+        so it doubles as the server-side cache partition. Vendors get None:
+        they only see their own products.
         """
         user = self.request.user
 
-        if self.action in ['update', 'partial_update', 'destroy', 'create']:
-            if user.is_authenticated:
-                return Product.objects.filter(vendor=user)
-            return Product.objects.none()
-
         # ✅ Admin or superuser sees everything
         if user.is_authenticated and (user.role == 'admin' or user.is_superuser):
-            return Product.objects.all()
+            return 'admin'
 
         # ✅ Vendors see only their own products
         if user.is_authenticated and user.role == 'vendor':
-            return Product.objects.filter(vendor=user)
+            return None
 
         # ✅ AFFILIATES see ALL products (active and approved) - THIS IS THE KEY FIX
         if user.is_authenticated and user.role == 'affiliate':
-            # Show all products that are active (don't filter by approved if it's causing issues)
-            return Product.objects.all()  # ✅ Show ALL products for promotion
+            return 'affiliate'
 
         # ✅ Wholesalers see wholesaler-specific products
         if user.is_authenticated and hasattr(user, 'vendor_type') and user.vendor_type == 'wholesaler':
-            return Product.objects.filter(visible_to='wholesaler')
+            return 'wholesaler'
 
         # ✅ Retailers see retailer-specific products
         if user.is_authenticated and hasattr(user, 'vendor_type') and user.vendor_type == 'retailer':
-            return Product.objects.filter(visible_to='retailer')
+            return 'retailer'
 
         # ✅ Consumers and unauthenticated users see consumer products
-        return Product.objects.all()  # ✅ Show all products publicly
-    
+        return 'public'
+
+    def get_queryset(self):
+        """
+        Returns products based on user role:
+        - Consumers/Unauthenticated: Consumer-visible products
+        - Affiliates: ALL approved & active products (to promote)
+        - Vendors: Only their own products
+        - Wholesalers/Retailers: Role-specific products
+        - Admins: All products
+        """
+        user = self.request.user
+        # Every relation the rendered fields touch is joined in, so a page is a single query
+        products = ProductSerializer.with_related(Product.objects.defer('search_vector'), self.request)
+
+        if self.action in ['update', 'partial_update', 'destroy', 'create']:
+            if user.is_authenticated:
+                return products.filter(vendor=user)
+            return Product.objects.none()
+
+        tier = self.get_visibility_tier()
+        if tier is None:
+            return products.filter(vendor=user)
+        if tier in ('wholesaler', 'retailer'):
+            return products.filter(visible_to=tier)
+        # Admins, affiliates and the public see every product
+        return products.all()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and not queryset.query.order_by:
+            # Same order as the keyset pages, paged or not
+            queryset = queryset.order_by(*KeysetPagination.ordering)
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        # The plain list stays the default (current clients read every product from one
+        # response); it pages once the client asks with ?cursor= or ?page_size=
+        if self.action == 'list' and not {'cursor', 'page_size'} & set(self.request.query_params):
+            return None
+        return super().paginate_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        tier = self.get_visibility_tier()
+        if tier is None:
+            return super().list(request, *args, **kwargs)
+        # ✅ Same page for everyone in the tier — serve it from the catalog cache
+        return cached_catalog_page(request, tier, lambda: super(ProductViewSet, self).list(request, *args, **kwargs))
+
     def destroy(self, request, *args, **kwargs):
         """
         Only vendors can delete their own products
@@ -143,10 +191,138 @@ class ProductViewSet(viewsets.ModelViewSet):
         # POST: submit a new rating
         serializer = ProductRatingSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(product=product)
+            with transaction.atomic():
+                rating = serializer.save(product=product)
+                ProductRatingSummary.record(product, rating.rating)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    # ✅ Ranked full-text search: /api/products/search/?q=sukuma+wiki
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def search(self, request):
+        """
+        Matches `q` against the stored search vector (name, category, description)
+        using the GIN index, ranks by relevance and paginates like the list.
+        """
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response({"error": "Query parameter 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        query = SearchQuery(q, search_type='websearch', config=SEARCH_CONFIG)
+        products = (
+            self.get_queryset()
+            .filter(search_vector=query)
+            # Cast to double precision so the rank round-trips exactly through the cursor
+            .annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+            .order_by('-rank', '-id')
+        )
+        products = self.filter_queryset(products)
+
+        page = self.paginate_queryset(products)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    # ✅ Faceted browsing: /api/products/facets/?category=3&vendor_type=farmer&price_band=100-500
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def facets(self, request):
+        """
+        Filtered, paginated products plus counts for every facet
+        (category, vendor_type, visible_to, price_band, county).
+        """
+        def render():
+            products = self.filter_queryset(self.get_queryset())
+            facets = ProductFacets(request.query_params)
+            counts = facets.counts(products)
+
+            page = self.paginate_queryset(facets.apply(products))
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+            response.data['facets'] = counts
+            return response
+
+        tier = self.get_visibility_tier()
+        if tier is None:
+            return render()
+        return cached_catalog_page(request, tier, render)
+
+    # ✅ Change feed for local replicas: /api/products/changes/?since=<seq>
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def changes(self, request):
+        """
+        Products created, updated, deactivated or deleted after `since`
+        (a sequence number from `next_since`, or an ISO timestamp), oldest first.
+        """
+        since = parse_since(request.query_params.get('since'))
+        if since is None:
+            return Response({"error": "'since' must be a sequence number or an ISO timestamp."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', CHANGE_FEED_LIMIT))
+        except ValueError:
+            limit = CHANGE_FEED_LIMIT
+        limit = max(1, min(limit, CHANGE_FEED_MAX_LIMIT))
+
+        feed = change_feed(
+            since, limit, self.get_queryset(),
+            lambda products: self.get_serializer(products, many=True).data,
+        )
+        return Response(feed)
+
+    # ✅ Bulk import: vendors upload their listings, admins upload for any vendor
+    @action(detail=False, methods=['post'], url_path='bulk-import',
+            parser_classes=[MultiPartParser, FormParser], permission_classes=[IsAuthenticated])
+    def bulk_import(self, request):
+        """
+        Endpoint: /api/products/bulk-import/
+        Multipart upload of a CSV / JSON / JSON Lines file under `file`.
+        Returns created / failed counts and per-row errors.
+        """
+        user = request.user
+        if user.role not in ('vendor', 'admin') and not user.is_superuser:
+            return Response(
+                {"error": "Only vendors and admins can import products"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"error": "Upload a file under 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = ProductImporter(user).run(iter_rows(upload))
+        except BulkImportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        print(f"[IMPORT] Bulk import by {user.username}: {result['created']} created, {result['failed']} failed")
+        code = status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=code)
+
+    # ✅ Inventory ledger of one product: vendor owner and admins only
+    @action(detail=True, methods=['get'], url_path='stock-history', permission_classes=[IsAuthenticated])
+    def stock_history(self, request, pk=None):
+        """
+        Endpoint: /api/products/<id>/stock-history/
+        Stock movements newest first (?cursor= / ?page_size= pages), the
+        current balance, and the net quantity per movement kind.
+        """
+        product = self.get_object()
+        user = request.user
+        if product.vendor_id != user.id and user.role != 'admin' and not user.is_superuser:
+            return Response(
+                {"error": "You can only view the stock history of your own products"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        movements = product.stock_movements.all()
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(movements, request, view=self)
+        response = paginator.get_paginated_response(StockMovementSerializer(page, many=True).data)
+        response.data['balance'] = product.stock
+        response.data['totals'] = dict(
+            movements.order_by().values_list('kind').annotate(total=Sum('quantity'))
+        )
+        return response
+
     # ✅ Custom action for vendors to get only their products
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_products(self, request):
@@ -160,7 +336,7 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        products = Product.objects.filter(vendor=request.user)
+        products = ProductSerializer.with_related(Product.objects.filter(vendor=request.user), request)
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
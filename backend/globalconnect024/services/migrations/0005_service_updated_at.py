@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:49
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    # Existing rows haven't changed since creation as far as we know
+    Service = apps.get_model('services', 'Service')
+    Service.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_add_county_to_service'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
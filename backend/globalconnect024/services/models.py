@@ -2,6 +2,7 @@ from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from globalconnect024.image_variants import queue_variants
 
 User = get_user_model()
 
@@ -140,12 +141,15 @@ class Service(models.Model):
     county = models.CharField(max_length=100, blank=True, null=True, help_text="County/area where this service operates (for transporters)")
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, default=0)
     image = models.ImageField(upload_to='services/', blank=True, null=True)
+    # Resized WebP/JPEG renditions of `image` (globalconnect024/image_variants.py)
+    image_variants = models.JSONField(null=True, blank=True, editable=False)
     duration = models.CharField(max_length=100, blank=True, null=True)
     category = models.CharField(max_length=100, blank=True, null=True)
     availability = models.BooleanField(default=True)
 
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def clean(self):
         if self.provider.role != 'service_provider':
@@ -154,6 +158,7 @@ class Service(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+        queue_variants(self)
 
     def __str__(self):
         return f"{self.title} ({self.service_type})"
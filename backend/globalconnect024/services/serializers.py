@@ -1,23 +1,34 @@
 from rest_framework import serializers
+from globalconnect024.fieldsets import SparseFieldsetsMixin
+from globalconnect024.image_variants import srcset
 from .models import Service, ServiceBooking
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     provider_name = serializers.SerializerMethodField(read_only=True)
     provider_phone = serializers.SerializerMethodField(read_only=True)
     provider_type = serializers.SerializerMethodField(read_only=True)
 
     provider_city = serializers.SerializerMethodField(read_only=True)
+    image_srcset = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Service
         fields = [
             'id', 'title', 'description', 'service_type', 'county',
-            'availability', 'provider', 'image',
+            'availability', 'provider', 'image', 'image_srcset',
             'provider_name', 'provider_phone', 'provider_type',
             'provider_city', 'is_active', 'created_at'
         ]
-        read_only_fields = ['id', 'provider', 'provider_name', 'provider_phone', 'provider_type', 'provider_city', 'created_at']
+        read_only_fields = ['id', 'provider', 'provider_name', 'provider_phone', 'provider_type', 'provider_city', 'image_srcset', 'created_at']
+
+    # Relations each field reads — only joined when the field is rendered (?fields= / ?omit=)
+    sparse_related = {
+        'provider_name': ('provider',),
+        'provider_phone': ('provider',),
+        'provider_type': ('provider',),
+        'provider_city': ('provider',),
+    }
 
     def get_provider_name(self, obj):
         return obj.provider.get_full_name() or obj.provider.username
@@ -31,6 +42,9 @@ class ServiceSerializer(serializers.ModelSerializer):
     def get_provider_city(self, obj):
         return getattr(obj.provider, 'city', '') or ''
 
+    def get_image_srcset(self, obj):
+        return srcset(obj.image_variants, self.context.get('request'), obj.image) if obj.image else None
+
     def validate(self, data):
         user = self.context['request'].user
         if user.role != 'service_provider':
@@ -15,6 +15,7 @@ from products.models import Product
 from .models import Service
 from.models import ServiceBooking
 from .serializers import ServiceBookingSerializer, ServiceSerializer
+from globalconnect024.conditional import ConditionalListMixin, conditional_get
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 import math
@@ -182,14 +183,19 @@ def transport_near_vendor(request):
             transport_qs = nearby
 
     from .serializers import ServiceSerializer
-    serializer = ServiceSerializer(transport_qs, many=True, context={'request': request})
-    return Response({
-        'vendor_city': vendor_city or '',
-        'results': serializer.data,
-    })
+
+    def render():
+        serializer = ServiceSerializer(transport_qs, many=True, context={'request': request})
+        return Response({
+            'vendor_city': vendor_city or '',
+            'results': serializer.data,
+        })
+
+    # ✅ 304 when the matched transport services haven't changed since the client's copy
+    return conditional_get(request, transport_qs, render)
 
 
-class ServiceViewSet(ModelViewSet):
+class ServiceViewSet(ConditionalListMixin, ModelViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -215,18 +221,20 @@ class ServiceViewSet(ModelViewSet):
         - Others: Only active services
         """
         user = self.request.user
+        # Join the provider only when a provider_* field is rendered
+        services = ServiceSerializer.with_related(Service.objects.all(), self.request)
 
         #admin
         if user.is_authenticated and (user.role == 'admin' or user.is_superuser):
-            return Service.objects.all()
+            return services.all()
         #affiliates
         if user.is_authenticated and user.role == 'affiliate':
-            return Service.objects.all()
+            return services.all()
         #service providers
         if user.is_authenticated and user.role == 'service_provider':
-            return Service.objects.filter(provider=user)
+            return services.filter(provider=user)
         #others
-        return Service.objects.filter(is_active=True)
+        return services.filter(is_active=True)
 
 
     def perform_create(self, serializer):
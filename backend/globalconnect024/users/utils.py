@@ -1,86 +1,24 @@
 # globalconnect024/users/utils.py
 
-import threading
-import requests as http_requests
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.template.loader import render_to_string
 from django.contrib.sites.shortcuts import get_current_site
 from django.conf import settings
+from orders.outbox import queue_template_email
 from .tokens import account_activation_token
 
 
-def send_sms(phone, message):
-    """Send an SMS via Africa's Talking in a background thread (non-blocking)."""
-    def _send():
-        try:
-            api_key = getattr(settings, 'AFRICASTALKING_API_KEY', '')
-            username = getattr(settings, 'AFRICASTALKING_USERNAME', 'sandbox')
-            if not api_key:
-                print('[SMS] AFRICASTALKING_API_KEY not set — skipping SMS')
-                return
-            if not phone:
-                print('[SMS] No phone number provided — skipping SMS')
-                return
-            # Normalize phone to +254 format
-            normalized = phone.strip().replace(' ', '')
-            if normalized.startswith('0'):
-                normalized = '+254' + normalized[1:]
-            elif not normalized.startswith('+'):
-                normalized = '+254' + normalized
-            print(f'[SMS] Sending to {normalized} via username={username}')
-            resp = http_requests.post(
-                'https://api.africastalking.com/version1/messaging',
-                headers={
-                    'apiKey': api_key,
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                    'Accept': 'application/json',
-                },
-                data={
-                    'username': username,
-                    'to': normalized,
-                    'message': message,
-                },
-                timeout=10,
-            )
-            print(f'[SMS] Response {resp.status_code}: {resp.text}')
-        except Exception as e:
-            print(f'[SMS] Error: {e}')
-    threading.Thread(target=_send, daemon=True).start()
-
-
 def send_verification_code_email(user, code, agent):
     """
-    Send the newly-issued 024-XXX-NNNN verification code to the user's email.
+    Queue the newly-issued 024-XXX-NNNN verification code to the user's email.
     Called after an agent has physically verified the farmer.
     """
-    def _send():
-        try:
-            subject = "Your 024 Global Connect Verification Code"
-            agent_name = (agent.first_name or agent.username) if agent else "an agent"
-            body = (
-                f"Hi {user.first_name or user.username},\n\n"
-                f"You have been successfully verified by {agent_name} on 024 Global Connect.\n\n"
-                f"Your unique verification code is:\n\n"
-                f"    {code}\n\n"
-                f"Use this code to authenticate on our WhatsApp bot (+254 700 024 024) or USSD (*024#).\n\n"
-                f"IMPORTANT — keep this code private:\n"
-                f"  - It is personal to you and cannot be shared.\n"
-                f"  - After 5 wrong attempts your account will be locked for 24 hours.\n"
-                f"  - If you forget it, contact us at 0700 024 024.\n\n"
-                f"Welcome to the network!\n"
-                f"— 024 Global Connect"
-            )
-            email = EmailMultiAlternatives(
-                subject, body, settings.DEFAULT_FROM_EMAIL, [user.email]
-            )
-            email.send(fail_silently=True)
-            print(f"✅ Verification code sent to {user.email}")
-        except Exception as e:
-            print(f"[VERIFICATION EMAIL] Error: {e}")
-    threading.Thread(target=_send, daemon=True).start()
+    queue_template_email(user.email, 'emails/verification_code', {
+        'user': user,
+        'code': code,
+        'agent_name': (agent.first_name or agent.username) if agent else "an agent",
+    })
 
 
 def send_activation_email(request, user):
@@ -94,24 +32,7 @@ def send_activation_email(request, user):
      # ✅ Print to terminal for dev use
     print("🔗 Activation link:", activation_link)
 
-    # Render email content
-    html_message = render_to_string('activation_email.html', {
+    queue_template_email(user.email, 'emails/activation', {
         'user': user,
         'activation_link': activation_link,
     })
-
-    text_message = f"Hi {user.username},\n\nPlease activate your account:\n{activation_link}"
-
-    subject = 'Activate Your 024Global Account'
-    from_email = settings.DEFAULT_FROM_EMAIL  # MUST match EMAIL_HOST_USER in .env
-    to_email = [user.email]
-
-    # Create and send the email
-    email = EmailMultiAlternatives(subject, text_message, from_email, to_email)
-    email.attach_alternative(html_message, "text/html")
-
-    try:
-        email.send(fail_silently=True)
-        print("✅ Activation email sent to:", user.email)
-    except Exception as e:
-        print("Failed to send activation email:", str(e))
@@ -1,9 +1,9 @@
 import traceback
-import threading
-from users.utils import send_sms
+from orders.outbox import queue_sms, queue_template_email
 
 from django.db.models import Sum, Q, Count
 from orders.models import Referral, Order
+from orders.webhooks import enqueue, parse_payload, paystack_event_id
 from products.models import Product
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import generics, status, serializers
@@ -11,8 +11,7 @@ from rest_framework.response import Response
 from django.db import transaction
 from django.utils import timezone
 from django.http import JsonResponse
-import requests
-import json
+from globalconnect024.http_clients import paystack
 import hashlib
 import hmac
 from datetime import datetime
@@ -27,7 +26,6 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from django.utils.dateparse import parse_date
 from django.utils.http import urlsafe_base64_decode
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.shortcuts import redirect
 from django.conf import settings
@@ -66,28 +64,10 @@ class RegisterView(generics.CreateAPIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        user = serializer.save(is_active=False)
-
-        # Send "pending admin approval" email in background thread so it never blocks the response
-        def _send_registration_email():
-            try:
-                send_mail(
-                    subject="Registration Received — Pending Admin Approval",
-                    message=(
-                        f"Hi {user.first_name or user.username},\n\n"
-                        f"Thank you for registering with 024GlobalConnect!\n\n"
-                        f"Your registration has been received successfully.\n"
-                        f"Your account is currently pending approval by our admin team.\n\n"
-                        f"You will receive another email once your account is activated and you can log in.\n\n"
-                        f"Thank you for joining 024GlobalConnect!"
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=True,
-                )
-            except Exception:
-                pass
-        threading.Thread(target=_send_registration_email, daemon=True).start()
+        with transaction.atomic():
+            user = serializer.save(is_active=False)
+            # "Pending admin approval" email — queued with the new account, delivered by the outbox worker
+            queue_template_email(user.email, 'emails/registration_received', {'user': user})
 
         return Response({
             "message": "Registration received. Your account is pending admin approval. You will be notified by email once activated."
@@ -346,16 +326,7 @@ def initiate_vendor_payment(request):
                 "subaccounts": [{"subaccount": affiliate_subaccount, "share": 50}]
             }
 
-        headers = {
-            "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
-        response = requests.post(
-            "https://api.paystack.co/transaction/initialize",
-            json=paystack_payload,
-            headers=headers,
-            timeout=10  # don't hang forever
-        )
+        response = paystack.post("/transaction/initialize", json=paystack_payload)
         res_data = response.json()
 
         if not res_data.get('status'):
@@ -447,11 +418,7 @@ def initiate_service_provider_payment(request):
                 "subaccounts": [{"subaccount": affiliate_subaccount, "share": 50}]
             }
 
-        headers = {"Authorization": f"Bearer {PAYSTACK_SECRET_KEY}", "Content-Type": "application/json"}
-        response = requests.post(
-            "https://api.paystack.co/transaction/initialize",
-            json=paystack_payload, headers=headers, timeout=10
-        )
+        response = paystack.post("/transaction/initialize", json=paystack_payload)
         res_data = response.json()
 
         if not res_data.get('status'):
@@ -482,13 +449,60 @@ def initiate_service_provider_payment(request):
         return Response({'error': str(e)}, status=500)
 
 
+def process_paystack_registration_event(event):
+    """
+    Worker handler (orders/webhooks.py) for a queued registration payment:
+    marks the vendor's registration paid. Runs inside the worker's
+    transaction, so the queued confirmation email and SMS commit with it.
+    """
+    if event.get('event') != 'charge.success':
+        return
+
+    reference = event['data'].get('reference')
+    paystack_transaction_id = event['data'].get('id')
+
+    # Look up vendor registration by Paystack reference
+    try:
+        vendor_reg = VendorRegistration.objects.select_related('vendor').get(paystack_reference=reference)
+    except VendorRegistration.DoesNotExist:
+        return
+
+    user = vendor_reg.vendor
+    # Mark payment as received — do NOT activate; admin must do that
+    user.registration_paid = True
+    user.save()
+
+    vendor_reg.payment_status = 'completed'
+    vendor_reg.paystack_transaction_id = str(paystack_transaction_id)
+    vendor_reg.paid_at = timezone.now()
+    vendor_reg.save()
+
+    notify_registration_paid(user)
+
+
+def notify_registration_paid(user):
+    """Queue the email / SMS telling the vendor their registration payment arrived."""
+    role_label = 'vendor' if user.role == 'vendor' else 'service provider'
+    queue_template_email(user.email, 'emails/registration_paid', {'user': user, 'role_label': role_label})
+
+    # SMS confirmation to user's phone
+    user_phone = getattr(user, 'phone', None)
+    if user_phone:
+        queue_sms(
+            user_phone,
+            f"Hi {user.first_name or user.username}, your 024Global registration payment of KES 200 was received. "
+            f"Your {role_label} account is pending admin activation. We will notify you once activated. - 024Global"
+        )
+
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def paystack_webhook(request):
     """
     Paystack calls this endpoint after a successful payment.
-    Verifies the signature, then activates the vendor account.
+    Verifies the signature and queues the event — `manage.py
+    process_webhook_events` records the payment and emails the vendor.
     """
     paystack_signature = request.headers.get('x-paystack-signature')
     payload = request.body
@@ -503,59 +517,12 @@ def paystack_webhook(request):
     if paystack_signature != expected_signature:
         return Response({'error': 'Invalid signature'}, status=400)
 
-    event = json.loads(payload)
-
-    if event.get('event') == 'charge.success':
-        reference = event['data'].get('reference')
-        paystack_transaction_id = event['data'].get('id')
-
-        # Look up vendor registration by Paystack reference
-        try:
-            vendor_reg = VendorRegistration.objects.get(paystack_reference=reference)
-        except VendorRegistration.DoesNotExist:
-            return Response({'status': 'ok'}, status=200)
-
-        user = vendor_reg.vendor
-        # Mark payment as received — do NOT activate; admin must do that
-        user.registration_paid = True
-        user.save()
-
-        vendor_reg.payment_status = 'completed'
-        vendor_reg.paystack_transaction_id = str(paystack_transaction_id)
-        vendor_reg.paid_at = timezone.now()
-        vendor_reg.save()
-
-        # Send confirmation email in background thread — never block the webhook
-        role_label = 'vendor' if user.role == 'vendor' else 'service provider'
-        def _send_payment_confirmed_email():
-            try:
-                send_mail(
-                    subject="Payment Received — Account Pending Admin Activation",
-                    message=(
-                        f"Hi {user.first_name or user.username},\n\n"
-                        f"Thank you for your registration payment of KES 200.\n"
-                        f"Your payment has been received successfully.\n\n"
-                        f"Your {role_label} account is currently pending activation by our admin team.\n"
-                        f"You will receive another email once your account is activated.\n\n"
-                        f"Thank you for joining 024GlobalConnect!"
-                    ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=True,
-                )
-            except Exception:
-                pass
-        threading.Thread(target=_send_payment_confirmed_email, daemon=True).start()
-
-        # SMS confirmation to user's phone
-        user_phone = getattr(user, 'phone', None)
-        if user_phone:
-            send_sms(
-                user_phone,
-                f"Hi {user.first_name or user.username}, your 024Global registration payment of KES 200 was received. "
-                f"Your {role_label} account is pending admin activation. We will notify you once activated. - 024Global"
-            )
+    event = parse_payload(payload)
+    if event is None:
+        return Response({'error': 'Invalid payload'}, status=400)
 
+    # Paystack redelivers slow-to-acknowledge events: enqueue() ignores the repeats
+    enqueue('paystack_registration', event, paystack_event_id(event, payload))
     return Response({'status': 'ok'}, status=200)
 
 
@@ -586,16 +553,7 @@ def create_affiliate_subaccount(request):
         "description": f"Affiliate subaccount for {affiliate.username}",
     }
 
-    headers = {
-        "Authorization": f"Bearer {PAYSTACK_SECRET_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    response = requests.post(
-        "https://api.paystack.co/subaccount",
-        json=payload,
-        headers=headers
-    )
+    response = paystack.post("/subaccount", json=payload)
 
     res_data = response.json()
 
@@ -1100,12 +1058,12 @@ def verify_farmer(request):
     except RuntimeError as e:
         return Response({'error': str(e)}, status=500)
 
-    # Send code to farmer's email (background thread — never blocks)
+    # Send code to farmer's email (queued in the outbox — never blocks)
     send_verification_code_email(farmer, code, agent=request.user)
 
     # Best-effort SMS notification too
     if farmer.phone:
-        send_sms(
+        queue_sms(
             farmer.phone,
             f"024Global: You have been verified. Your code is {code}. Keep it private — 5 wrong tries locks your account."
         )